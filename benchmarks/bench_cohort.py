@@ -0,0 +1,52 @@
+"""
+Замер сводки по классу: разбор выгрузок учеников в пуле и группировка по предметам.
+
+Генерируется `--unique` разных синтетических выгрузок, остальные файлы до
+`--students` - их копии (разбираются так же, но генерация не занимает минуты).
+Отдельно замеряются разбор (`batch.run_batch`) и сводка (`cohort.aggregate`).
+
+Запуск из корня проекта:
+    python ./benchmarks/bench_cohort.py [--students 1000] [--unique 40] [--workers N]
+"""
+import argparse, os, shutil, sys, tempfile, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import batch
+import cohort
+from synthetic import generate_diary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замер сводки по классу")
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--unique", type=int, default=40, help="сколько разных выгрузок сгенерировать")
+    parser.add_argument("--subjects", type=int, default=15)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for idx in range(args.students):
+            path = os.path.join(tmp, f"student_{idx:05}.xlsx")
+            if idx < args.unique:
+                generate_diary(path, args.subjects, args.days, period="I полугодие", student=f"Ученик {idx}", seed=idx)
+            else:
+                shutil.copyfile(os.path.join(tmp, f"student_{idx % args.unique:05}.xlsx"), path)
+        files = batch.collect_files(tmp)
+
+        started = time.perf_counter()
+        results = batch.run_batch(files, args.workers, chunksize=8)
+        parsed = time.perf_counter() - started
+        started = time.perf_counter()
+        report = cohort.aggregate(results)
+        aggregated = time.perf_counter() - started
+
+    print(f"Учеников: {len(report.students)}, предметов: {len(report.subjects)}")
+    print(f"    разбор выгрузок   {parsed:8.2f} с   ({len(files) / parsed:.0f} файлов/с)")
+    print(f"    сводка            {aggregated * 1e3:8.1f} мс")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
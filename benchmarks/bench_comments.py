@@ -0,0 +1,79 @@
+"""
+Микробенчмарк разбора комментариев к отметкам: стоимость одной ячейки.
+
+Сравнивает прежний внутренний цикл `extract_marks` (`re.split` + `split(" - ")` +
+`coeffs[work_type]`) с `CommentTokenizer.tokenize`.
+
+Запуск из корня проекта:
+    python ./benchmarks/bench_comments.py [--cells 20000] [--repeat 5]
+"""
+import argparse, os, random, re, sys, timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import data_processing as d
+from comment_tokenizer import CommentTokenizer
+
+
+def legacy_tokenize(marks, text):
+    '''Внутренний цикл `extract_marks` до появления `CommentTokenizer`'''
+    result = []
+    comments = re.split(r';\s*(?=\S+ - )', text.strip())
+    for mark, comment in zip(marks, comments):
+        if not mark.isdigit():
+            continue
+        comment = comment.strip()
+        if comment:
+            _, work_type, _ = comment.split(" - ")
+            mark_data = (int(mark), work_type, d.coeffs[work_type])
+        result.append(mark_data)
+    return result
+
+
+def make_cells(count, seed=0):
+    '''Ячейки как в выгрузке: в основном по одной отметке, иногда две-три или "Н"'''
+    rnd = random.Random(seed)
+    work_types = list(d.coeffs)
+    cells = []
+    for _ in range(count):
+        marks = rnd.choice(["5", "4", "3", "5", "4", "Н", "54", "45", "543"])
+        date = f"{rnd.randint(1, 28):02}.11.2024"
+        text = "; ".join(f"{mark} - {rnd.choice(work_types)} - {date}" for mark in marks)
+        cells.append((marks, text))
+    return cells
+
+
+def measure(functions, cells, repeat):
+    """
+    Лучшее время на одну ячейку в наносекундах для каждой функции
+
+    Важно:
+        Функции запускаются поочерёдно в каждом повторе, чтобы фоновая нагрузка влияла на них одинаково
+    """
+    best = [float("inf")] * len(functions)
+    for _ in range(repeat):
+        for idx, function in enumerate(functions):
+            started = timeit.default_timer()
+            for marks, text in cells:
+                function(marks, text)
+            best[idx] = min(best[idx], timeit.default_timer() - started)
+    return [value / len(cells) * 1e9 for value in best]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Микробенчмарк разбора комментариев")
+    parser.add_argument("--cells", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    for name, cells in [("все ячейки", make_cells(args.cells)),
+                        ("одна отметка", [cell for cell in make_cells(args.cells) if len(cell[0]) == 1]),
+                        ("несколько отметок", [cell for cell in make_cells(args.cells) if len(cell[0]) > 1])]:
+        tokenizer = CommentTokenizer(d.coeffs)
+        assert [tokenizer.tokenize(*cell) for cell in cells] == [legacy_tokenize(*cell) for cell in cells]
+        legacy, current = measure([legacy_tokenize, tokenizer.tokenize], cells, args.repeat)
+        print(f"{name:<18} было {legacy:8.0f} нс/ячейка   стало {current:8.0f} нс/ячейка   x{legacy / current:.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+"""
+Замер каждого этапа обработки выгрузки на синтетических книгах разного размера.
+
+Этапы: `getWorksheet` (оба способа чтения), `scan_sheet` (всё за один проход),
+`load_archive` (та же выгрузка из архива `.marks`, отображённого в память),
+`extract_subjects`, `extract_marks`, `countMean`, `extractScoreMass` и `process_grades`
+по всем предметам, `drawGraph` и `sparkline` (тот же график без matplotlib) для одного
+предмета, `dashboard` (все предметы плитками в одной картинке). Для каждого этапа записывается лучшее и медианное время
+и пик выделенной памяти (tracemalloc, отдельным прогоном). Результаты
+сохраняются в JSON, и их можно сравнить с прошлым запуском.
+
+Запуск из корня проекта:
+    python ./benchmarks/bench_stages.py [--sizes 8x30,15x90,20x180] [--repeat 5] [--output файл] [--compare прошлый.json]
+"""
+import argparse, json, os, platform, statistics, subprocess, sys, tempfile, time, tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import matplotlib
+matplotlib.use("Agg")
+from matplotlib import pyplot as plt
+# drawGraph в конце вызывает plt.show(), окно при замере не нужно
+plt.show = lambda *args, **kwargs: None
+
+import data_processing as d
+import main as m
+import sparkline
+import visualization as v
+from synthetic import generate_diary
+
+results_root = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def stages(path: str, graph_path: str) -> list:
+    """
+    Этапы обработки одного файла в порядке выполнения
+
+    Возвращает:
+        Список `(название, функция)`; функции без аргументов, каждая берёт результат предыдущих из общего словаря
+    """
+    state = {}
+
+    def get_worksheet(engine):
+        def run():
+            state["worksheet"] = m.getWorksheet(path, engine)
+        return run
+
+    def scan_sheet():
+        info, subjects, table = d.scan_sheet(state["worksheet"])
+        if "archive" not in state:
+            state["archive"] = os.path.splitext(graph_path)[0] + d.ARCHIVE_SUFFIX
+            d.save_archive(state["archive"], info, subjects, table)
+
+    def load_archive():
+        d.load_archive(state["archive"])
+
+    def extract_subjects():
+        state["subjects"] = d.extract_subjects(state["worksheet"])
+
+    def extract_marks():
+        state["marks"] = d.extract_marks(state["worksheet"], state["subjects"])
+
+    def count_mean():
+        period = str(d.extract_info(state["worksheet"]).get("Период") or "")
+        for subject in state["subjects"].values():
+            v.countMean(subject, state["marks"], period)
+
+    def extract_score_mass():
+        state["scores"] = {subject: v.extractScoreMass(subject, state["marks"]) for subject in state["subjects"].values()}
+
+    def process_grades():
+        state["series"] = {subject: m.process_grades(state["scores"][subject], d.refactor_marks(state["marks"], subject)[0])
+                           for subject in state["subjects"].values()}
+
+    def draw_graph():
+        subject = max(state["series"], key=lambda name: len(state["series"][name][0]))
+        scores, dates = state["series"][subject]
+        v.drawGraph(subject, scores, dates, graph_path)
+        plt.close("all")
+
+    def draw_sparkline():
+        subject = max(state["series"], key=lambda name: len(state["series"][name][0]))
+        scores, dates = state["series"][subject]
+        sparkline.render_sparkline(subject, scores, dates, fmt="png")
+
+    def dashboard():
+        sparkline.dashboard(state["marks"])
+
+    return [("getWorksheet[xml]", get_worksheet("xml")), ("getWorksheet[openpyxl]", get_worksheet("openpyxl")),
+            ("scan_sheet", scan_sheet), ("load_archive", load_archive), ("extract_subjects", extract_subjects), ("extract_marks", extract_marks), ("countMean", count_mean),
+            ("extractScoreMass", extract_score_mass), ("process_grades", process_grades), ("drawGraph", draw_graph),
+            ("sparkline", draw_sparkline), ("dashboard", dashboard)]
+
+
+def measure(function, repeat: int) -> dict:
+    '''Время (лучшее и медиана, мс) и пик памяти (КБ) одного этапа'''
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - started) * 1e3)
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"best_ms": round(min(times), 3), "median_ms": round(statistics.median(times), 3),
+            "peak_kb": round(peak / 1024, 1)}
+
+
+def run_suite(sizes: list, repeat: int = 5, seed: int = 0) -> list:
+    """
+    Прогоняет все этапы на книгах каждого размера
+
+    Аргументы:
+        `sizes`: Список `(предметов, дней)`
+        `repeat`: Сколько раз замерять каждый этап (default: 5)
+        `seed`: Зерно генератора книг (default: 0)
+
+    Возвращает:
+        Список словарей `{"size", "subjects", "days", "marks", "stage", "best_ms", "median_ms", "peak_kb"}`
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for subjects, days in sizes:
+            path = os.path.join(tmp, f"diary_{subjects}x{days}.xlsx")
+            generate_diary(path, subjects=subjects, days=days, seed=seed)
+            # Количество отметок - чтобы сравнивать размеры между собой
+            worksheet = d.read_excel(path, "xml").active
+            marks = sum(len(x) for x in d.extract_marks(worksheet, d.extract_subjects(worksheet)).values())
+            stage_list = stages(path, os.path.join(tmp, "graph.png"))
+            for name, function in stage_list:
+                row = {"size": f"{subjects}x{days}", "subjects": subjects, "days": days, "marks": marks, "stage": name}
+                row.update(measure(function, repeat))
+                results.append(row)
+            print(f"{subjects}x{days}: {marks} отметок")
+            for row in results[-len(stage_list):]:
+                print(f"    {row['stage']:<24} {row['best_ms']:10.2f} мс   медиана {row['median_ms']:10.2f} мс   "
+                      f"память {row['peak_kb']:10.1f} КБ")
+    return results
+
+
+def compare(results: list, baseline: list, threshold: float = 1.2) -> list:
+    """
+    Сравнивает результаты с прошлым запуском
+
+    Возвращает:
+        Список `(size, stage, было_мс, стало_мс)` для этапов, замедлившихся больше чем в `threshold` раз
+    """
+    previous = {(row["size"], row["stage"]): row for row in baseline}
+    regressions = []
+    for row in results:
+        old = previous.get((row["size"], row["stage"]))
+        if old is None:
+            continue
+        ratio = row["best_ms"] / old["best_ms"] if old["best_ms"] else float("inf")
+        mark = "  <-- медленнее" if ratio > threshold else ""
+        print(f"{row['size']:>8} {row['stage']:<24} {old['best_ms']:10.2f} -> {row['best_ms']:10.2f} мс  x{ratio:.2f}{mark}")
+        if ratio > threshold:
+            regressions.append((row["size"], row["stage"], old["best_ms"], row["best_ms"]))
+    return regressions
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замер этапов обработки выгрузки")
+    parser.add_argument("--sizes", default="8x30,15x90,20x180", help="размеры книг: предметов x дней через запятую")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="куда сохранить JSON (по умолчанию benchmarks/results/stages-<время>.json)")
+    parser.add_argument("--compare", default=None, help="JSON прошлого запуска для сравнения")
+    parser.add_argument("--threshold", type=float, default=1.2, help="во сколько раз замедление считается регрессией")
+    args = parser.parse_args(argv)
+
+    sizes = [tuple(int(x) for x in size.split("x")) for size in args.sizes.split(",")]
+    results = run_suite(sizes, args.repeat, args.seed)
+    output = args.output or os.path.join(results_root, f"stages-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump({"python": platform.python_version(), "platform": platform.platform(), "commit": _git_commit(),
+                   "created": time.strftime("%Y-%m-%d %H:%M:%S"), "repeat": args.repeat, "results": results},
+                  file, ensure_ascii=False, indent=2)
+    print(f"Результаты сохранены: {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{'\033[31m'}Замедлились этапов: {len(regressions)}{'\033[0m'}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,91 @@
+"""
+Замер времени запуска `main.py` через `python -X importtime`.
+
+Считается время импорта `main` (по строке importtime) и полное время вызова
+`main.py <файл> --format json --no-graph` - "просто средние баллы" - вместе с
+запуском интерпретатора. Отдельно проверяется, что тяжёлые модули (openpyxl,
+matplotlib, NumPy, datetime) при таком вызове не импортируются. Если импорт `main`
+дольше бюджета или тяжёлый модуль всё же подгрузился, скрипт завершается с кодом 1.
+
+Запуск из корня проекта:
+    python ./benchmarks/bench_startup.py [--repeat 5] [--budget 150]
+"""
+import argparse, os, statistics, subprocess, sys, tempfile, time
+
+src_root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, src_root)
+
+from synthetic import generate_diary
+
+# Модули, которые при выводе средних баллов импортироваться не должны
+HEAVY_MODULES = ("openpyxl", "matplotlib", "numpy", "datetime")
+
+
+def parse_importtime(stderr: str) -> dict:
+    '''Разбирает вывод `-X importtime`: `{модуль: суммарное время, мкс}`'''
+    result = {}
+    for line in stderr.splitlines():
+        # "import time:       307 |       9421 |     numpy.linalg"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        result[name.strip()] = int(cumulative)
+    return result
+
+
+def import_time(repeat: int) -> tuple[list, dict]:
+    '''Время импорта `main` (мс) в `repeat` свежих интерпретаторах и модули последнего запуска'''
+    times, modules = [], {}
+    for _ in range(repeat):
+        run = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=src_root,
+                             capture_output=True, text=True, check=True)
+        modules = parse_importtime(run.stderr)
+        times.append(modules["main"] / 1e3)
+    return times, modules
+
+
+def call_time(args: list, repeat: int) -> list:
+    '''Полное время вызова интерпретатора с аргументами `args`, мс'''
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, *args], cwd=src_root, capture_output=True, check=True)
+        times.append((time.perf_counter() - started) * 1e3)
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замер времени запуска main.py")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=150, help="бюджет на импорт main, мс (default: 150)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "Отметки.xlsx")
+        generate_diary(path, subjects=15, days=90)
+        imports, modules = import_time(args.repeat)
+        interpreter = call_time(["-c", "pass"], args.repeat)
+        means = call_time(["main.py", path, "--format", "json", "--no-graph"], args.repeat)
+        run = subprocess.run([sys.executable, "-X", "importtime", "main.py", path, "--format", "json", "--no-graph"],
+                             cwd=src_root, capture_output=True, text=True, check=True)
+    loaded = sorted(name for name in parse_importtime(run.stderr) if name.split(".")[0] in HEAVY_MODULES)
+
+    print(f"import main:               {min(imports):8.1f} мс   медиана {statistics.median(imports):8.1f} мс   бюджет {args.budget:.0f} мс")
+    print(f"python -c pass:            {min(interpreter):8.1f} мс")
+    print(f"main.py --format json:     {min(means):8.1f} мс")
+    print("Самые долгие импорты:")
+    for name, cumulative in sorted(modules.items(), key=lambda item: -item[1])[1:8]:
+        print(f"    {name:<28} {cumulative / 1e3:8.1f} мс")
+
+    failed = False
+    if min(imports) > args.budget:
+        print(f"{'\033[31m'}Импорт main дольше бюджета{'\033[0m'}")
+        failed = True
+    if loaded:
+        print(f"{'\033[31m'}Импортированы тяжёлые модули: {', '.join(loaded)}{'\033[0m'}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
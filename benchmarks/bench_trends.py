@@ -0,0 +1,55 @@
+"""
+Замер трендов и предупреждений по школе.
+
+Генерируется `--unique` разных синтетических выгрузок, они разбираются, а их
+таблицы повторяются до `--students` учеников (разбор замеряет `bench_cohort`).
+Для сравнения замеряется цикл, который строит только ряды среднего балла -
+`extractScoreMass` для каждого предмета каждого ученика.
+
+Запуск из корня проекта:
+    python ./benchmarks/bench_trends.py [--students 2000] [--unique 20] [--subjects 15] [--days 90]
+"""
+import argparse, os, sys, tempfile, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import data_processing as d
+import trends
+from synthetic import generate_diary
+from visualization import extractScoreMass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замер трендов по школе")
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--unique", type=int, default=20, help="сколько разных выгрузок сгенерировать")
+    parser.add_argument("--subjects", type=int, default=15)
+    parser.add_argument("--days", type=int, default=90)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        unique = []
+        for idx in range(args.unique):
+            path = os.path.join(tmp, f"student_{idx:05}.xlsx")
+            generate_diary(path, args.subjects, args.days, period="I полугодие", student=f"Ученик {idx}", seed=idx)
+            unique.append(d.parse_workbook(path, "xml")[2])
+    tables = [unique[idx % args.unique] for idx in range(args.students)]
+
+    started = time.perf_counter()
+    result = trends.scan(tables)
+    ranked = trends.rank(result)
+    scanned = time.perf_counter() - started
+    started = time.perf_counter()
+    for table in tables:
+        for subject in table.subjects:
+            extractScoreMass(subject, table)
+    looped = time.perf_counter() - started
+
+    print(f"Учеников: {len(tables)}, предметов: {len(result)}, предупреждений: {len(ranked)}")
+    print(f"    trends.scan               {scanned:8.2f} с")
+    print(f"    цикл extractScoreMass     {looped:8.2f} с")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,69 @@
+"""
+Замер хранилища отметок: загрузка выгрузок всей школы в SQLite и запросы к базе.
+
+Генерируется `--unique` разных синтетических выгрузок, остальные файлы до
+`--students` - их копии с другим учеником в шапке (разбираются и загружаются так
+же, но генерация не занимает минуты). Отдельно замеряются разбор в пуле и
+вставка в базу одной транзакцией, затем запросы средних баллов.
+
+Запуск из корня проекта:
+    python ./benchmarks/bench_warehouse.py [--students 1000] [--unique 40] [--workers N]
+"""
+import argparse, os, sys, tempfile, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import data_processing as d
+from synthetic import generate_diary
+from warehouse import Warehouse
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замер хранилища отметок в SQLite")
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--unique", type=int, default=40, help="сколько разных выгрузок сгенерировать")
+    parser.add_argument("--subjects", type=int, default=15)
+    parser.add_argument("--days", type=int, default=60)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [os.path.join(tmp, f"student_{idx:05}.xlsx") for idx in range(args.unique)]
+        for idx, path in enumerate(paths):
+            generate_diary(path, args.subjects, args.days, period="II четверть", student=f"Ученик {idx}", seed=idx)
+        started = time.perf_counter()
+        parsed = [d.parse_workbook(path, "xml") for path in paths]
+        parse_time = (time.perf_counter() - started) / len(paths)
+
+        with Warehouse(os.path.join(tmp, "marks.sqlite")) as warehouse:
+            started = time.perf_counter()
+            with warehouse.conn:
+                for idx in range(args.students):
+                    info, subjects, table = parsed[idx % len(parsed)]
+                    warehouse._insert(dict(info, Обучающийся=f"Ученик {idx}"), subjects, table)
+            inserted = time.perf_counter() - started
+            counts = warehouse.counts()
+
+            started = time.perf_counter()
+            warehouse.subject_means()
+            all_means = time.perf_counter() - started
+            started = time.perf_counter()
+            for idx in range(100):
+                warehouse.subject_means(student=f"Ученик {idx}")
+            one_student = (time.perf_counter() - started) / 100
+            subject = parsed[0][2].subjects[0]
+            started = time.perf_counter()
+            for idx in range(100):
+                warehouse.running_means(f"Ученик {idx}", subject)
+            running = (time.perf_counter() - started) / 100
+
+    print(f"Учеников: {counts['students']}, отметок: {counts['marks']}")
+    print(f"    разбор одной выгрузки      {parse_time * 1e3:8.1f} мс   (вся школа в один процесс ~{parse_time * args.students:.1f} с)")
+    print(f"    вставка в базу             {inserted:8.2f} с   ({counts['marks'] / inserted:.0f} отметок/с)")
+    print(f"    средние всех учеников      {all_means * 1e3:8.1f} мс")
+    print(f"    средние одного ученика     {one_student * 1e3:8.2f} мс")
+    print(f"    ряд среднего балла         {running * 1e3:8.2f} мс")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,96 @@
+"""
+Реентерабельный API анализа: лист Excel на входе, типизированный отчёт на выходе.
+
+В отличие от `visualization.countMean`, который копит распределение оценок в
+глобальном `totalEst`, здесь всё состояние живёт в возвращаемом `Report`,
+поэтому несколько анализов можно выполнять одновременно в разных потоках.
+Вывод в консоль - `visualization.formatReport`.
+"""
+from dataclasses import dataclass
+
+import data_processing as d
+from marks_table import MarksTable
+
+
+@dataclass(slots=True, frozen=True)
+class SubjectResult:
+    '''Итог по одному предмету'''
+    name: str
+    count: int              # количество отметок
+    mean: float | None      # средний балл, округлённый до сотых (None, если отметок нет)
+    grade: int | None       # округлённая оценка (None, если отметок нет)
+    missing: int            # сколько отметок не хватает до минимума периода
+
+
+@dataclass(slots=True, frozen=True)
+class Report:
+    '''Отчёт по одной выгрузке'''
+    info: dict
+    subjects: tuple[SubjectResult, ...]
+    histogram: tuple[int, ...]   # [пятёрки, четвёрки, тройки, двойки, единицы]
+    total_score: float | None    # среднее по всем отметкам
+    min_marks: int               # минимум отметок для периода
+
+    @property
+    def incomplete(self) -> int:
+        '''Количество предметов, по которым оценку выставить нельзя (нет отметок или их не хватает)'''
+        return len(self.subjects) - sum(self.histogram)
+
+    def subject(self, name: str) -> SubjectResult:
+        for result in self.subjects:
+            if result.name == name:
+                return result
+        raise KeyError(name)
+
+
+def analyze_marks(info: dict, marks: MarksTable) -> Report:
+    """
+    Строит отчёт по уже извлечённым данным (например, из `parse_workbook` или кэша)
+
+    Аргументы:
+        `info`: Информация об ученике из `extract_info`
+        `marks`: Таблица отметок
+
+    Возвращает:
+        `Report`
+    """
+    # stats тянет NumPy, а `Report` нужен и потоковому подсчёту без него (`streaming.build_report`)
+    from stats import compute_stats
+    period = str(info.get('Период') or '')
+    stats = compute_stats(marks, period)
+    subjects = []
+    for idx, name in enumerate(marks.subjects):
+        count = int(stats.counts[idx])
+        subjects.append(SubjectResult(
+            name=name,
+            count=count,
+            mean=float(stats.means[idx]) if count else None,
+            grade=int(stats.grades[idx]) if count else None,
+            missing=int(stats.missing[idx]),
+        ))
+    return Report(
+        info=dict(info),
+        subjects=tuple(subjects),
+        histogram=tuple(int(x) for x in stats.histogram),
+        total_score=stats.total_score if len(marks) else None,
+        min_marks=d.min_marks(period),
+    )
+
+
+def analyze(worksheet) -> Report:
+    """
+    Анализирует лист выгрузки
+
+    Аргументы:
+        `worksheet`: Лист Excel (openpyxl или `xlsx_reader`)
+
+    Возвращает:
+        `Report`
+
+    Важно:
+        Если у отметок нет комментариев, выбрасывается `ValueError`
+    """
+    info, subjects, marks = d.scan_sheet(worksheet)
+    if marks == "":
+        raise ValueError("В файле отсутствуют комментарии к отметкам")
+    return analyze_marks(info, marks)
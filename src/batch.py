@@ -0,0 +1,204 @@
+"""
+Пакетная обработка: анализ сразу многих выгрузок .xlsx в пуле процессов.
+
+Запуск:
+    python ./src/batch.py <папка или маска> [--workers N] [--chunksize N] [--json файл] [--csv файл] [--state [папка]] [--tolerant]
+
+Относительные пути и маски ищутся в папке `data`. Каждый файл обрабатывается
+в отдельном процессе (`extract_info`, `extract_subjects`, отметки и средние баллы),
+результаты всех файлов собираются в один JSON и/или CSV со статусом по каждому файлу.
+С ключом `--tolerant` ячейки без комментария и другие проблемы не делают файл
+ошибочным: для каждого файла записываются список проблем и качество разбора.
+"""
+import argparse, csv, glob, json, os, time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from dataclasses import asdict
+
+import data_processing as d
+from analysis import analyze_marks
+from diagnostics import Diagnostics
+from incremental import IncrementalAnalyzer, resolve_state
+
+CSV_FIELDS = ["Файл", "Статус", "Ошибка", "Обучающийся", "Класс", "Период",
+              "Предмет", "Отметок", "Средний балл", "Оценка", "Не хватает", "Качество"]
+# Сколько проблем на файл хранить подробно в мягком режиме
+DIAGNOSTICS_LIMIT = 50
+
+
+def collect_files(source: str, base_folder: str = None) -> list:
+    """
+    Собирает список файлов для обработки
+
+    Аргументы:
+        `source`: Папка или glob-маска; относительные пути считаются от `base_folder`
+        `base_folder`: Папка с выгрузками (default: папка `data`)
+
+    Возвращает:
+        Отсортированный список путей к файлам .xlsx
+    """
+    base_folder = d.folder_root if base_folder is None else base_folder
+    path = source if os.path.isabs(source) else os.path.join(base_folder, source)
+    if os.path.isdir(path):
+        path = os.path.join(path, "*.xlsx")
+    return sorted(p for p in glob.glob(path, recursive=True) if p.endswith(".xlsx") and os.path.isfile(p))
+
+
+def _plain_info(info: dict) -> dict:
+    return {key: str(value) if value is not None else None for key, value in info.items()}
+
+
+def analyze_file(file_path: str, engine: str = "xml", cache_folder: str = None, state_folder: str = None,
+                 tolerant: bool = False) -> dict:
+    """
+    Обрабатывает один файл. Выполняется в процессе пула
+
+    Аргументы:
+        `file_path`: Путь к выгрузке
+        `engine`: Способ чтения книги, как в `read_excel` (default: "xml")
+        `cache_folder`: Папка `WorkbookCache`; если не задана, кэш не используется (default: None)
+        `state_folder`: Папка состояний `IncrementalAnalyzer`; если задана, из повторной выгрузки
+            ученика разбираются только новые и изменённые столбцы; не совмещается с `tolerant` (default: None)
+        `tolerant`: Мягкий режим `parse_workbook`: проблемы записываются в `diagnostics`, а файл
+            считается ошибочным, только если он не открылся (default: False)
+
+    Возвращает:
+        Словарь с ключами `file`, `status` ("ok" или "error"), `error`, `info`, `subjects`, `total_score`,
+        `quality`, `elapsed`, а в мягком режиме ещё `diagnostics` (`Diagnostics.to_dict`)
+    """
+    started = time.perf_counter()
+    result = {"file": file_path, "status": "ok", "error": None, "info": {}, "subjects": [], "total_score": None,
+              "quality": None}
+    try:
+        if tolerant:
+            diagnostics = Diagnostics(DIAGNOSTICS_LIMIT)
+            cache = d.WorkbookCache(cache_folder) if cache_folder else None
+            info, subjects, table = d.parse_workbook(file_path, engine, cache, diagnostics)
+            result["info"], result["quality"], result["diagnostics"] = _plain_info(info), diagnostics.quality, diagnostics.to_dict()
+            if not subjects and not diagnostics.complete:
+                raise ValueError(diagnostics.problems[-1].detail)
+            report = analyze_marks(info, table)
+        elif state_folder:
+            with closing(d.open_workbook(file_path, engine)) as workbook:
+                worksheet = workbook.active
+                result["info"] = _plain_info(d.extract_info(worksheet))
+                report = IncrementalAnalyzer(state_folder).update(worksheet).report
+        else:
+            cache = d.WorkbookCache(cache_folder) if cache_folder else None
+            info, subjects, table = d.parse_workbook(file_path, engine, cache)
+            result["info"] = _plain_info(info)
+            if table == "":
+                raise ValueError("В файле отсутствуют комментарии к отметкам")
+            report = analyze_marks(info, table)
+        result["subjects"] = [asdict(subject) for subject in report.subjects]
+        result["total_score"] = report.total_score
+        if result["quality"] is None:
+            result["quality"] = 1.0
+    except Exception as e:
+        result["status"], result["error"] = "error", f"{type(e).__name__}: {e}"
+    result["elapsed"] = round(time.perf_counter() - started, 4)
+    return result
+
+
+def run_batch(files: list, workers: int = None, chunksize: int = 1, engine: str = "xml", cache_folder: str = None,
+              state_folder: str = None, tolerant: bool = False) -> list:
+    """
+    Раздаёт файлы процессам пула
+
+    Аргументы:
+        `files`: Список путей к файлам
+        `workers`: Количество процессов (default: количество ядер)
+        `chunksize`: Сколько файлов отдаётся процессу за раз (default: 1)
+        `engine`: Способ чтения книги (default: "xml")
+        `cache_folder`: Папка общего для всех процессов кэша разобранных книг (default: None)
+        `state_folder`: Папка состояний для инкрементального анализа (default: None)
+        `tolerant`: Мягкий режим разбора, см. `analyze_file` (default: False)
+
+    Возвращает:
+        Список результатов `analyze_file` в порядке `files`
+
+    Важно:
+        Инкрементальный анализ не поддерживает мягкий режим, поэтому `state_folder` вместе
+        с `tolerant` даёт `ValueError`
+    """
+    if tolerant and state_folder:
+        raise ValueError("Инкрементальный режим (--state) нельзя совместить с мягким (--tolerant)")
+    if workers == 1:
+        return [analyze_file(path, engine, cache_folder, state_folder, tolerant) for path in files]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(analyze_file, files, [engine] * len(files), [cache_folder] * len(files),
+                             [state_folder] * len(files), [tolerant] * len(files), chunksize=max(chunksize, 1)))
+
+
+def summarize(results: list, elapsed: float) -> dict:
+    '''Сводка по пакету: количество файлов, ошибок и пропускная способность'''
+    ok = sum(r["status"] == "ok" for r in results)
+    qualities = [r["quality"] for r in results if r["status"] == "ok"]
+    return {
+        "total": len(results),
+        "ok": ok,
+        "failed": len(results) - ok,
+        "with_problems": sum(quality < 1 for quality in qualities),
+        "mean_quality": round(sum(qualities) / len(qualities), 4) if qualities else None,
+        "elapsed": round(elapsed, 4),
+        "files_per_second": round(len(results) / elapsed, 2) if elapsed else None,
+    }
+
+
+def write_json(results: list, summary: dict, path: str):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump({"summary": summary, "files": results}, file, ensure_ascii=False, indent=2)
+
+
+def write_csv(results: list, path: str):
+    '''Пишет результаты в CSV: строка на каждый предмет, для файлов с ошибкой - одна строка'''
+    with open(path, "w", encoding="utf-8-sig", newline="") as file:
+        writer = csv.writer(file, delimiter=";")
+        writer.writerow(CSV_FIELDS)
+        for r in results:
+            head = [os.path.basename(r["file"]), r["status"], r["error"] or "",
+                    r["info"].get("Обучающийся"), r["info"].get("Класс"), r["info"].get("Период")]
+            quality = r["quality"] if r["quality"] is not None else ""
+            if not r["subjects"]:
+                writer.writerow(head + [""] * 5 + [quality])
+            for s in r["subjects"]:
+                writer.writerow(head + [s["name"], s["count"], s["mean"], s["grade"], s["missing"], quality])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетный анализ выгрузок электронного дневника")
+    parser.add_argument("source", help="папка или маска файлов (относительно папки data)")
+    parser.add_argument("--workers", type=int, default=None, help="количество процессов (по умолчанию - число ядер)")
+    parser.add_argument("--chunksize", type=int, default=1, help="сколько файлов отдавать процессу за раз")
+    parser.add_argument("--engine", choices=["xml", "openpyxl"], default="xml", help="способ чтения книги")
+    parser.add_argument("--json", default=os.path.join(d.folder_root, "batch_results.json"), help="куда сохранить JSON")
+    parser.add_argument("--csv", default=None, help="куда сохранить CSV")
+    parser.add_argument("--cache", nargs="?", const=True, default=None,
+                        help="использовать кэш разобранных книг (можно указать папку)")
+    parser.add_argument("--state", nargs="?", const=True, default=None,
+                        help="инкрементальный режим: хранить состояние по ученикам и разбирать только новые даты (можно указать папку)")
+    parser.add_argument("--tolerant", action="store_true",
+                        help="мягкий режим: записывать проблемы ячеек и качество разбора, а не отбрасывать файл")
+    args = parser.parse_args(argv)
+    if args.state and args.tolerant:
+        parser.error("ключ --state нельзя совместить с --tolerant")
+
+    files = collect_files(args.source)
+    if not files:
+        print(f'{'\033[31m'}По запросу "{args.source}" не найдено ни одного файла .xlsx{'\033[0m'}')
+        return 1
+    started = time.perf_counter()
+    results = run_batch(files, args.workers, args.chunksize, args.engine, d.resolve_cache(args.cache),
+                        resolve_state(args.state), args.tolerant)
+    summary = summarize(results, time.perf_counter() - started)
+    if args.json:
+        write_json(results, summary, args.json)
+    if args.csv:
+        write_csv(results, args.csv)
+    print(f'Обработано файлов: {summary["total"]}, с ошибками: {summary["failed"]}, с проблемами: {summary["with_problems"]}, '
+          f'время: {summary["elapsed"]} с ({summary["files_per_second"]} файлов/с)')
+    return 0 if not summary["failed"] else 2
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
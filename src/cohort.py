@@ -0,0 +1,239 @@
+"""
+Сводка по классу или школе: много выгрузок учеников - одна статистика.
+
+Выгрузки разбираются пакетно (`batch.run_batch`, пул процессов), затем итоги
+учеников по предметам раскладываются в плоские массивы NumPy (строка на пару
+ученик-предмет) и сводятся группировкой по предмету без циклов по ученикам:
+распределение итоговых оценок, процентили средних баллов, доля учеников, которым
+не хватает отметок до минимума периода (как в `countMean`), и места учеников -
+в классе по общему среднему и внутри каждого предмета.
+
+Запуск:
+    python ./src/cohort.py <папка или маска> [--workers N] [--cache [папка]] [--json файл] [--csv файл]
+"""
+import argparse, csv, json, os, time
+from dataclasses import asdict, dataclass
+
+import numpy as np
+
+import batch
+import data_processing as d
+
+# Процентили средних баллов по предмету
+PERCENTILES = (10, 25, 50, 75, 90)
+
+
+@dataclass(slots=True, frozen=True)
+class SubjectSummary:
+    '''Итог по одному предмету по всем ученикам'''
+    name: str
+    students: int                    # у скольких учеников есть отметки по предмету
+    mean: float | None               # среднее средних баллов учеников, до сотых
+    percentiles: tuple[float, ...]   # средние баллы на уровнях `PERCENTILES` (линейная интерполяция)
+    histogram: tuple[int, ...]       # итоговые оценки [пятёрки, четвёрки, тройки, двойки, единицы] без нехватки
+    missing_share: float             # доля учеников с предметом в выгрузке, которым не хватает отметок
+
+
+@dataclass(slots=True, frozen=True)
+class StudentSummary:
+    '''Место одного ученика в классе'''
+    name: str
+    file: str
+    total_score: float | None
+    rank: int | None                 # место по общему среднему (1 - лучший, равные делят место)
+    subject_ranks: dict              # `{предмет: место по среднему баллу предмета}`
+
+
+@dataclass(slots=True, frozen=True)
+class CohortReport:
+    '''Сводка по классу'''
+    subjects: tuple[SubjectSummary, ...]
+    students: tuple[StudentSummary, ...]
+    percentiles: tuple[int, ...]
+
+    def subject(self, name: str) -> SubjectSummary:
+        for result in self.subjects:
+            if result.name == name:
+                return result
+        raise KeyError(name)
+
+
+def _ranks(values: np.ndarray, groups: np.ndarray, group_count: int) -> np.ndarray:
+    """
+    Места внутри групп по убыванию значения, равные значения делят место (1, 2, 2, 4)
+
+    Аргументы:
+        `values`: Значения без nan
+        `groups`: Номер группы каждого значения
+        `group_count`: Количество групп
+
+    Важно:
+        Группа и значение сводятся к одному ключу `группа * 16 + значение` - средние баллы лежат
+        в [0, 10), так что порядок внутри группы и равенство значений сохраняются
+    """
+    keys = groups * 16.0 + values
+    ordered = np.sort(keys)
+    ends = np.cumsum(np.bincount(groups, minlength=group_count))
+    return ends[groups] - np.searchsorted(ordered, keys, side="right") + 1
+
+
+def _percentiles(values: np.ndarray, groups: np.ndarray, group_count: int, levels) -> np.ndarray:
+    '''Процентили значений в каждой группе (как `np.percentile`), строка на группу; у пустой группы - nan'''
+    order = np.lexsort((values, groups))
+    ordered = values[order]
+    counts = np.bincount(groups, minlength=group_count)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    position = (np.maximum(counts, 1) - 1)[:, None] * (np.asarray(levels, dtype=np.float64) / 100)[None, :]
+    low = np.floor(position).astype(np.int64)
+    high = np.ceil(position).astype(np.int64)
+    if not len(ordered):
+        return np.full((group_count, len(levels)), np.nan)
+    low_values = ordered[np.minimum(starts[:, None] + low, len(ordered) - 1)]
+    high_values = ordered[np.minimum(starts[:, None] + high, len(ordered) - 1)]
+    result = low_values + (high_values - low_values) * (position - low)
+    result[counts == 0] = np.nan
+    return result
+
+
+def aggregate(results: list, percentiles=PERCENTILES) -> CohortReport:
+    """
+    Сводит итоги учеников в статистику по классу
+
+    Аргументы:
+        `results`: Результаты `batch.analyze_file` (файлы со статусом, отличным от "ok", пропускаются)
+        `percentiles`: Уровни процентилей (default: `PERCENTILES`)
+
+    Возвращает:
+        `CohortReport`; предметы идут в порядке первого появления в выгрузках
+    """
+    results = [r for r in results if r["status"] == "ok"]
+    subject_index, student_ids, subject_ids = {}, [], []
+    means, counts, grades, missing = [], [], [], []
+    for student, result in enumerate(results):
+        for subject in result["subjects"]:
+            student_ids.append(student)
+            subject_ids.append(subject_index.setdefault(subject["name"], len(subject_index)))
+            counts.append(subject["count"])
+            means.append(subject["mean"] if subject["count"] else np.nan)
+            grades.append(subject["grade"] or 0)
+            missing.append(subject["missing"])
+    names = list(subject_index)
+    group_count = len(names)
+    student_ids = np.asarray(student_ids, dtype=np.int64)
+    subject_ids = np.asarray(subject_ids, dtype=np.int64)
+    means = np.asarray(means, dtype=np.float64)
+    counts, grades, missing = (np.asarray(x, dtype=np.int64) for x in (counts, grades, missing))
+
+    has_marks = counts > 0
+    marked = subject_ids[has_marks]
+    marked_means = means[has_marks]
+    students = np.bincount(marked, minlength=group_count)
+    listed = np.bincount(subject_ids, minlength=group_count)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        subject_means = np.bincount(marked, weights=marked_means, minlength=group_count) / students
+        missing_share = np.bincount(subject_ids, weights=missing > 0, minlength=group_count) / listed
+    levels = _percentiles(marked_means, marked, group_count, percentiles)
+    enough = has_marks & (missing == 0) & (grades >= 1) & (grades <= 5)
+    histogram = np.bincount(subject_ids[enough] * 5 + (5 - grades[enough]), minlength=group_count * 5)
+    histogram = histogram.reshape(group_count, 5)
+
+    subject_ranks = np.zeros(len(means), dtype=np.int64)
+    subject_ranks[has_marks] = _ranks(marked_means, marked, group_count)
+    totals = np.asarray([r["total_score"] if r["total_score"] is not None else np.nan for r in results], dtype=np.float64)
+    ranked = ~np.isnan(totals)
+    total_ranks = np.zeros(len(results), dtype=np.int64)
+    total_ranks[ranked] = _ranks(totals[ranked], np.zeros(int(ranked.sum()), dtype=np.int64), 1)
+
+    per_student = [{} for _ in results]
+    for student, subject, rank in zip(student_ids[has_marks].tolist(), marked.tolist(), subject_ranks[has_marks].tolist()):
+        per_student[student][names[subject]] = rank
+
+    subjects = tuple(SubjectSummary(
+        name=name,
+        students=int(students[idx]),
+        mean=round(float(subject_means[idx]), 2) if students[idx] else None,
+        percentiles=tuple(round(float(x), 2) for x in levels[idx]) if students[idx] else (),
+        histogram=tuple(int(x) for x in histogram[idx]),
+        missing_share=round(float(missing_share[idx]), 4),
+    ) for idx, name in enumerate(names))
+    summaries = tuple(StudentSummary(
+        name=str(result["info"].get("Обучающийся") or os.path.basename(result["file"])),
+        file=result["file"],
+        total_score=result["total_score"],
+        rank=int(total_ranks[idx]) if ranked[idx] else None,
+        subject_ranks=per_student[idx],
+    ) for idx, result in enumerate(results))
+    return CohortReport(subjects=subjects, students=summaries, percentiles=tuple(percentiles))
+
+
+def analyze_cohort(files: list, workers: int = None, chunksize: int = 4, engine: str = "xml",
+                   cache_folder: str = None) -> tuple[CohortReport, list]:
+    """
+    Разбирает выгрузки учеников в пуле процессов и сводит их
+
+    Возвращает:
+        Кортеж `(CohortReport, results)`, где `results` - результаты `batch.analyze_file` по каждому файлу
+    """
+    results = batch.run_batch(files, workers, chunksize, engine, cache_folder)
+    return aggregate(results), results
+
+
+def format_cohort(report: CohortReport) -> str:
+    '''Сводка по предметам для вывода в консоль'''
+    header = " ".join(f"p{level:<5}" for level in report.percentiles)
+    lines = [f'{"Предмет":<40} {"Учеников":>8} {"Средний":>8}  {header}  Нехватка  5/4/3/2/1']
+    for s in report.subjects:
+        values = " ".join(f"{x:<6.2f}" for x in s.percentiles) if s.percentiles else " ".join("-     " for _ in report.percentiles)
+        mean = f"{s.mean:.2f}" if s.mean is not None else "-"
+        lines.append(f'{s.name:<40} {s.students:>8} {mean:>8}  {values}  {s.missing_share:>7.0%}  '
+                     f'{"/".join(str(x) for x in s.histogram)}')
+    ranked = sorted((s for s in report.students if s.rank is not None), key=lambda s: s.rank)
+    lines.append("\nЛучшие по общему среднему:")
+    lines += [f"{s.rank:>4}. {s.name} - {s.total_score}" for s in ranked[:10]]
+    return "\n".join(lines)
+
+
+def write_csv(report: CohortReport, path: str):
+    '''Пишет места учеников в CSV: строка на ученика, столбец на предмет'''
+    names = [s.name for s in report.subjects]
+    with open(path, "w", encoding="utf-8-sig", newline="") as file:
+        writer = csv.writer(file, delimiter=";")
+        writer.writerow(["Обучающийся", "Файл", "Общий средний", "Место"] + names)
+        for s in report.students:
+            writer.writerow([s.name, os.path.basename(s.file), s.total_score, s.rank]
+                            + [s.subject_ranks.get(name, "") for name in names])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сводка по классу по выгрузкам учеников")
+    parser.add_argument("source", help="папка или маска файлов (относительно папки data)")
+    parser.add_argument("--workers", type=int, default=None, help="количество процессов (по умолчанию - число ядер)")
+    parser.add_argument("--chunksize", type=int, default=4, help="сколько файлов отдавать процессу за раз")
+    parser.add_argument("--engine", choices=["xml", "openpyxl"], default="xml", help="способ чтения книги")
+    parser.add_argument("--cache", nargs="?", const=True, default=None,
+                        help="использовать кэш разобранных книг (можно указать папку)")
+    parser.add_argument("--json", default=None, help="куда сохранить сводку в JSON")
+    parser.add_argument("--csv", default=None, help="куда сохранить места учеников в CSV")
+    args = parser.parse_args(argv)
+
+    files = batch.collect_files(args.source)
+    if not files:
+        print(f'{'\033[31m'}По запросу "{args.source}" не найдено ни одного файла .xlsx{'\033[0m'}')
+        return 1
+    started = time.perf_counter()
+    report, results = analyze_cohort(files, args.workers, args.chunksize, args.engine, d.resolve_cache(args.cache))
+    elapsed = time.perf_counter() - started
+    print(format_cohort(report))
+    failed = [r for r in results if r["status"] != "ok"]
+    print(f'\nУчеников: {len(report.students)}, файлов с ошибками: {len(failed)}, время: {elapsed:.2f} с')
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump({"cohort": asdict(report), "errors": [{"file": r["file"], "error": r["error"]} for r in failed]},
+                      file, ensure_ascii=False, indent=2)
+    if args.csv:
+        write_csv(report, args.csv)
+    return 0 if not failed else 2
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
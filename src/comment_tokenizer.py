@@ -0,0 +1,111 @@
+"""
+Разбор комментариев к отметкам электронного дневника.
+
+В комментарии к ячейке на каждую отметку приходится своя запись:
+    "5 - Работа на уроке - 06.11.2024; 4 - Контрольная работа - 06.11.2024"
+Записи сопоставляются с символами ячейки по порядку. `CommentTokenizer` делит
+комментарий на записи одним проходом (ячейки с одной отметкой обходятся без
+регулярного выражения), а тип работы и коэффициент достаёт одним поиском в
+заранее собранном словаре. Строки типов работ интернированы, поэтому тысячи
+отметок одного типа ссылаются на одну и ту же строку.
+
+Неизвестный тип работы не прерывает разбор: отметка получает коэффициент по
+умолчанию, а тип попадает в счётчик `unknown`.
+"""
+import re, sys
+from collections import Counter
+
+# Граница записей: ";", за которой начинается следующая запись ("<отметка> - ")
+_SEPARATOR = re.compile(r';\s*(?=\S+ - )')
+_MARKS = {str(mark): mark for mark in range(10)}
+
+
+class CommentTokenizer:
+    """
+    Разборщик комментариев с накоплением предупреждений
+
+    Аргументы:
+        `coeffs`: Словарь `{тип работы: коэффициент}`
+        `default_coeff`: Коэффициент для неизвестного типа работы и для отметки без записи в комментарии (default: 1)
+
+    Атрибуты:
+        `unknown`: `Counter` неизвестных типов работ
+        `missing`: Сколько отметок не нашли своей записи в комментарии
+        `extra`: Сколько записей в комментариях остались без отметки
+    """
+    __slots__ = ("default_coeff", "unknown", "missing", "extra", "_lookup")
+
+    def __init__(self, coeffs: dict, default_coeff: float = 1):
+        self.default_coeff = default_coeff
+        self._lookup = {}
+        for work_type, coeff in coeffs.items():
+            work_type = sys.intern(work_type)
+            self._lookup[work_type] = (work_type, coeff)
+        self.unknown = Counter()
+        self.missing = 0
+        self.extra = 0
+
+    @property
+    def warnings(self) -> int:
+        '''Общее количество предупреждений'''
+        return sum(self.unknown.values()) + self.missing + self.extra
+
+    def work_type(self, entry: str) -> tuple[str, float]:
+        """
+        Тип работы и коэффициент из одной записи "отметка - тип работы - дата"
+
+        Важно:
+            Тип работы может сам содержать " - ": отрезаются только отметка слева и дата справа
+        """
+        parts = entry.split(" - ")
+        if len(parts) == 3:
+            work_type = parts[1]
+        else:
+            _, _, rest = entry.partition(" - ")
+            work_type, sep, _ = rest.rpartition(" - ")
+            if not sep:
+                work_type = rest
+        found = self._lookup.get(work_type)
+        if found is not None:
+            return found
+        work_type = sys.intern(work_type.strip())
+        found = self._lookup.get(work_type)
+        if found is not None:
+            return found
+        self.unknown[work_type] += 1
+        return work_type, self.default_coeff
+
+    def tokenize(self, marks: str, text: str) -> list:
+        """
+        Разбирает одну ячейку
+
+        Аргументы:
+            `marks`: Значение ячейки - отметки подряд, например "54" или "Н"
+            `text`: Текст комментария к ячейке
+
+        Возвращает:
+            Список `(mark, work_type, coeff)` для каждой цифры в `marks`; остальные символы пропускаются,
+            но свою запись в комментарии занимают
+
+        Важно:
+            Если записей меньше, чем отметок, оставшиеся отметки получают пустой тип работы и коэффициент
+            по умолчанию (счётчик `missing`); лишние записи учитываются в `extra`
+        """
+        text = text.strip()
+        entries = _SEPARATOR.split(text) if ";" in text else (text,)
+        count = len(entries)
+        result = []
+        for idx, char in enumerate(marks):
+            mark = _MARKS.get(char)
+            if mark is None:
+                continue
+            entry = entries[idx].strip() if idx < count else ""
+            if entry:
+                work_type, coeff = self.work_type(entry)
+            else:
+                self.missing += 1
+                work_type, coeff = "", self.default_coeff
+            result.append((mark, work_type, coeff))
+        if count > len(marks) and text:
+            self.extra += count - len(marks)
+        return result
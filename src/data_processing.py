@@ -1,9 +1,22 @@
-import os, re
+import hashlib, json, os, pickle, struct, tempfile, time
+from collections import namedtuple
+from contextlib import closing, contextmanager
 
-from openpyxl import load_workbook, Workbook
+# NumPy и datetime здесь импортируются только в функциях архива: разбор листа и потоковые отметки без них обходятся
+import profiling
+import xlsx_reader
+from comment_tokenizer import CommentTokenizer
+from diagnostics import Diagnostics
+from marks_table import MarksTable, date_to_ordinal
 
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 folder_root = os.path.join(project_root, 'data')
+# Версия разборщика: при изменении логики извлечения старые записи кэша перестают находиться
+PARSER_VERSION = 2
+# Архив разобранной выгрузки: сигнатура, версия формата и расширение файла
+ARCHIVE_MAGIC = b"SCOREARC"
+ARCHIVE_VERSION = 1
+ARCHIVE_SUFFIX = ".marks"
 coeffs = {
     "Административная контрольная работа": 1.5,     "Аудирование": 1.4,
     "Ведение тетради": 1,                           "Дистанционное занятие": 1,
@@ -21,24 +34,93 @@ coeffs = {
     "Срезовая работа": 1.3,                         "Тест": 1,
     "Чтение наизусть": 1,                           "Электронное обучение": 1,
 }
+# Коэффициент для типов работ, которых нет в `coeffs`
+default_coeff = 1
+# Одна отметка из `stream_marks`
+MarkRecord = namedtuple("MarkRecord", ["subject", "date", "mark", "work_type", "coeff"])
+
+class MissingCommentError(ValueError):
+    '''У отметки нет комментария (`stream_marks(..., strict=True)`)'''
+
+def min_marks(period: str) -> int:
+    '''Минимальное количество отметок для выставления оценки за период (как в `countMean`)'''
+    if 'четверть' in period:
+        return 3
+    elif 'полугодие' in period:
+        return 6
+    elif period == 'Год':
+        return 12
+    return 0
 
 def get_file_path(file_name: str, base_folder: str) -> str:
-    '''Возвращает полный путь к файлу, если он существует в указанной папке'''
+    '''Возвращает полный путь к файлу, если он существует в указанной папке, иначе выбрасывает `FileNotFoundError`'''
     file_path = os.path.join(folder_root, file_name)
     if not os.path.exists(file_path):
-        print(f'{'\033[31m'}Файл "{file_name}" не найден в папке "{base_folder}"{'\033[0m'}')
-        exit()
+        raise FileNotFoundError(f'Файл "{file_name}" не найден в папке "{base_folder}"')
     return file_path
 
-def read_excel(file_path: str) -> Workbook:
-    '''Читает Excel-файл и возвращает его содержимое как `openpyxl.Workbook`, не Worksheet!'''
+@contextmanager
+def atomic_write(path: str):
+    """
+    Открывает файл на запись так, что читатели видят либо старое, либо полностью записанное содержимое
+
+    Аргументы:
+        `path`: Путь к файлу
+
+    Возвращает:
+        Контекстный менеджер с временным файлом рядом с `path`, открытым как "wb". При выходе без ошибки
+        временный файл атомарно заменяет `path`, при ошибке удаляется
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            yield file
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+@profiling.timed("load_workbook")
+def open_workbook(file_path: str, engine: str = "openpyxl"):
+    '''
+    Открывает книгу Excel выбранным способом, ошибки чтения не перехватываются
+
+    Аргументы:
+        `file_path`: Путь к файлу (или файловый объект)
+        `engine`: Способ чтения: "openpyxl" - полная загрузка книги,
+            "xml" - потоковое чтение XML через `xlsx_reader` (default: "openpyxl")
+
+    Важно:
+        Книга `xlsx_reader` держит файл открытым, пока её не закроют. У обоих способов есть `close`,
+        поэтому книгу открывают как `with closing(open_workbook(path, engine)) as workbook`
+    '''
+    if engine == "xml":
+        return xlsx_reader.load_workbook(file_path)
+    elif engine == "openpyxl":
+        # openpyxl импортируется только здесь: сам импорт дольше, чем разбор выгрузки через xlsx_reader
+        from openpyxl import load_workbook
+        return load_workbook(file_path)
+    raise ValueError(f'Неизвестный способ чтения "{engine}"')
+
+def read_excel(file_path: str, engine: str = "openpyxl") -> "Workbook":
+    '''
+    Читает Excel-файл и возвращает его содержимое как `openpyxl.Workbook`, не Worksheet!
+
+    Аргументы:
+        `file_path`: Путь к файлу
+        `engine`: Способ чтения, см. `open_workbook` (default: "openpyxl")
+
+    Важно:
+        Любая ошибка чтения выбрасывается как `ValueError`, исходная ошибка - в `__cause__`
+    '''
     try:
-        data = load_workbook(file_path)
+        data = open_workbook(file_path, engine)
         return data
     except Exception as e:
-        print(f"{'\033[31m'}Ошибка при чтении файла: {e}{'\033[0m'}")
-        exit()
-    
+        raise ValueError(f"Ошибка при чтении файла: {e}") from e
+
+@profiling.timed("extract_info")
 def extract_info(worksheet, start_row=1, step=2, max_rows=7) -> dict:
     '''
     Извлекаем информацию об ученике из открытого листа Excel
@@ -66,6 +148,7 @@ def extract_info(worksheet, start_row=1, step=2, max_rows=7) -> dict:
             info[key] = value
     return info
 
+@profiling.timed("extract_subjects")
 def extract_subjects(worksheet, start_row=11, column_index=0) -> dict:
     """
     Выделяем список предметов из открытого листа Excel
@@ -84,9 +167,11 @@ def extract_subjects(worksheet, start_row=11, column_index=0) -> dict:
         if row[column_index].value is None:
             break
         subjects[idx + 1] = row[column_index].value
+    profiling.count("subjects", len(subjects))
     return subjects
 
-def extract_marks(worksheet, subjects: dict, start_row=10, start_column=2) -> dict:
+@profiling.timed("extract_marks")
+def extract_marks(worksheet, subjects: dict, start_row=10, start_column=2, tokenizer=None) -> dict:
     """
     Получаем список оценок для каждого предмета из листа Excel.
     
@@ -95,6 +180,7 @@ def extract_marks(worksheet, subjects: dict, start_row=10, start_column=2) -> di
         `subjects`: Словарь предметов, получаемый в результате работы функции `extract_subjects`
         `start_row`: Строка, с которой начинается изъятие (default: 10)
         `start_column`: Столбец, с которого начинает осмотр оценок (default: 2)
+        `tokenizer`: `CommentTokenizer`, в котором накопятся предупреждения о неизвестных типах работ (default: новый)
     
     Возвращает:
         Словарь вида `{subj: [{"дата": date, "отметка": mark, "Тип работы": type, "Коэффициент": coeff}]}`, где subj - название предмета,
@@ -105,50 +191,325 @@ def extract_marks(worksheet, subjects: dict, start_row=10, start_column=2) -> di
     """
     # Создаём словарь из предметов
     marks = {subj: [] for subj in subjects.values()}
+    try:
+        for subj_id, (date, mark, work_type, coeff) in _iter_marks(worksheet, subjects, start_row, start_column, tokenizer):
+            marks[subjects[subj_id]].append({
+                "Дата": date,
+                "Отметка": mark,
+                "Тип работы": work_type,
+                "Коэффициент": coeff
+            })
+    except AttributeError:
+        return ""
+    profiling.count("marks", sum(len(subject_marks) for subject_marks in marks.values()))
+    return marks
+
+@profiling.timed("extract_marks_table")
+def extract_marks_table(worksheet, subjects: dict, start_row=10, start_column=2, tokenizer=None) -> MarksTable:
+    """
+    Получаем отметки из листа Excel сразу в колоночном виде, минуя словари.
 
+    Аргументы:
+        `worksheet`: Лист Excel
+        `subjects`: Словарь предметов, получаемый в результате работы функции `extract_subjects`
+        `start_row`: Строка, с которой начинается изъятие (default: 10)
+        `start_column`: Столбец, с которого начинает осмотр оценок (default: 2)
+        `tokenizer`: `CommentTokenizer`, как в `extract_marks` (default: новый)
+
+    Возвращает:
+        `MarksTable` или "", если у отметки нет комментария (как и `extract_marks`)
+    """
+    try:
+        table = MarksTable.build(list(subjects.values()), _iter_marks(worksheet, subjects, start_row, start_column, tokenizer))
+    except AttributeError:
+        return ""
+    profiling.count("marks", len(table))
+    return table
+
+def _iter_marks(worksheet, subjects: dict, start_row=10, start_column=2, tokenizer=None):
+    """
+    Проходит по столбцам-датам листа и выдаёт отметки в порядке их следования.
+
+    Возвращает:
+        Генератор пар `(subj_id, (date, mark, work_type, coeff))`, где `subj_id` - номер предмета из `subjects`
+
+    Важно:
+        Если у ячейки нет комментария, выбрасывается `AttributeError`
+    """
     # Указываем параметры
     start_row = 10
     start_column = 2
+    if tokenizer is None:
+        tokenizer = CommentTokenizer(coeffs, default_coeff)
+    tokenize = tokenizer.tokenize
+    columns = cells = 0
+    warnings = tokenizer.warnings
 
-    for value in worksheet.iter_cols(min_row=start_row, max_row=start_row+len(subjects), min_col=start_column):
-        # Забираем дату из первой строки
-        date = value[0].value
-        if date == "Итог:": break
-        # Проходимся по остальным строкам
-        for subj_id, cell in enumerate(value[1:]):
-            # Если ячейка пустая - пропускаем
-            if cell is None or not cell.value:
-                continue
+    try:
+        for value in worksheet.iter_cols(min_row=start_row, max_row=start_row+len(subjects), min_col=start_column):
+            # Забираем дату из первой строки
+            date = value[0].value
+            if date == "Итог:": break
+            columns += 1
+            # Проходимся по остальным строкам
+            for subj_id, cell in enumerate(value[1:]):
+                # Если ячейка пустая - пропускаем
+                if cell is None or not cell.value:
+                    continue
+                cells += 1
+                # Отметки и записи комментария сопоставляются по порядку, не-цифры пропускаются
+                for mark, work_type, coeff in tokenize(cell.value, cell.comment.text):
+                    yield subj_id + 1, (date, mark, work_type, coeff)
+    finally:
+        profiling.count("date_columns", columns)
+        profiling.count("cells", cells)
+        profiling.count("comment_warnings", tokenizer.warnings - warnings)
+
+def _coordinate(cell) -> str:
+    '''Адрес ячейки вида "D12" (у ячеек openpyxl и `xlsx_reader` есть номера строки и столбца)'''
+    column, letters = cell.column, ""
+    while column > 0:
+        column, rest = divmod(column - 1, 26)
+        letters = chr(ord("A") + rest) + letters
+    return f"{letters}{cell.row}"
+
+def _tolerant_marks(tokenizer, diagnostics, subject: str, date, cell) -> list:
+    """
+    Разбирает ячейку в мягком режиме: проблемы записываются в `diagnostics`, разбор не прерывается
+
+    Возвращает:
+        Список `(mark, work_type, coeff)`, как `CommentTokenizer.tokenize`; у ячейки без комментария -
+        отметки с пустым типом работы и коэффициентом по умолчанию; у ячейки, которую не удалось
+        разобрать, - пустой список (проблема `bad_cell`)
+    """
+    comment = cell.comment
+    coordinate = _coordinate(cell)
+    missing, extra, unknown = tokenizer.missing, tokenizer.extra, tokenizer.warnings - tokenizer.missing - tokenizer.extra
+    # Число в ячейке (например, 5 вместо "5") разбирается как строка
+    value = cell.value if isinstance(cell.value, str) else str(cell.value)
+    try:
+        result = tokenizer.tokenize(value, comment.text if comment is not None else "")
+    except Exception as e:
+        diagnostics.add("bad_cell", subject, date, cell.value, f"{type(e).__name__}: {e}", coordinate)
+        diagnostics.checked(True)
+        return []
+    bad = False
+    if comment is None:
+        bad = True
+        diagnostics.add("missing_comment", subject, date, cell.value, f'У отметки "{cell.value}" нет комментария', coordinate)
+    elif tokenizer.missing != missing:
+        bad = True
+        diagnostics.add("mismatch", subject, date, cell.value, f"Отметок без записи в комментарии: {tokenizer.missing - missing}",
+                        coordinate)
+    if tokenizer.extra != extra:
+        bad = True
+        diagnostics.add("mismatch", subject, date, cell.value, f"Записей в комментарии без отметки: {tokenizer.extra - extra}",
+                        coordinate)
+    if tokenizer.warnings - tokenizer.missing - tokenizer.extra != unknown:
+        bad = True
+        for work_type in dict.fromkeys(work_type for _, work_type, _ in result if work_type in tokenizer.unknown):
+            diagnostics.add("unknown_work_type", subject, date, cell.value, f'Неизвестный тип работы "{work_type}"', coordinate)
+    diagnostics.checked(bad)
+    return result
+
+def _walk_sheet(worksheet, info: dict, subjects: dict, dates: list, info_row=1, info_step=2, info_rows=7,
+                subjects_row=11, subject_column=0, dates_row=10, marks_column=2):
+    """
+    Проходит лист один раз, строка за строкой, и по ходу заполняет `info`, `subjects` и `dates`
+
+    Возвращает:
+        Генератор троек `(subj_id, date, cell)` для каждой непустой ячейки с отметками, в порядке строк
+
+    Важно:
+        Строки читаются через `iter_rows` по одной, весь лист в память не собирается. Отметки предмета
+        берутся из его же строки, поэтому строка дат должна быть выше списка предметов.
+        Чтение заканчивается на первой пустой ячейке в столбце предметов
+    """
+    if dates_row >= subjects_row:
+        raise ValueError("Строка дат должна быть выше списка предметов")
+    key_rows = range(info_row, info_rows + info_row, info_step)
+    first_row = min(info_row, dates_row)
+    first_mark = marks_column - 1
+    key = None
+    for row_number, row in enumerate(worksheet.iter_rows(min_row=first_row), start=first_row):
+        if row_number >= subjects_row:
+            subject = row[subject_column].value if subject_column < len(row) else None
+            if subject is None:
+                break
+            subj_id = len(subjects) + 1
+            subjects[subj_id] = subject
+            for date, cell in zip(dates, row[first_mark:]):
+                # Если ячейка пустая - пропускаем
+                if cell is not None and cell.value:
+                    yield subj_id, date, cell
+            continue
+        # Значение шапки лежит в строке под ключом
+        value = row[0].value if row else None
+        if key and row_number - 1 in key_rows:
+            info[key] = value
+            key = None
+        if row_number in key_rows:
+            key = value[:-1] if value and isinstance(value, str) else None
+        if row_number == dates_row:
+            for cell in row[first_mark:]:
+                if cell.value == "Итог:":
+                    break
+                dates.append(cell.value)
+    # Ключ шапки в последней прочитанной строке остаётся без значения, как пустая ячейка у extract_info
+    if key:
+        info[key] = None
+
+@profiling.timed("scan_sheet")
+def scan_sheet(worksheet, info_row=1, info_step=2, info_rows=7, subjects_row=11, subject_column=0,
+               dates_row=10, marks_column=2, tokenizer=None, table=True, diagnostics=None) -> tuple:
+    """
+    Проходит лист один раз, строка за строкой, и собирает сразу информацию об ученике, предметы и отметки
+
+    Аргументы:
+        `worksheet`: Лист Excel
+        `info_row`, `info_step`, `info_rows`: Как `start_row`, `step` и `max_rows` у `extract_info` (default: 1, 2, 7)
+        `subjects_row`, `subject_column`: Как `start_row` и `column_index` у `extract_subjects` (default: 11, 0)
+        `dates_row`, `marks_column`: Как `start_row` и `start_column` у `extract_marks` (default: 10, 2)
+        `tokenizer`: `CommentTokenizer`, как в `extract_marks` (default: новый)
+        `table`: Вернуть отметки как `MarksTable` (True) или словарь `extract_marks` (False) (default: True)
+        `diagnostics`: `Diagnostics` - мягкий режим: проблемы ячеек и ошибка чтения листа
+            записываются в него, а разбор продолжается (default: None)
+
+    Возвращает:
+        Кортеж `(info, subjects, marks)` - то же, что дают `extract_info`, `extract_subjects`
+        и `extract_marks_table` (или `extract_marks`); `marks` - "", если у отметки нет комментария.
+        В мягком режиме `marks` никогда не "": возвращается всё, что удалось разобрать
+
+    Важно:
+        Порядок чтения и ограничения - как у `stream_marks`. Столбцы, подпись которых в строке дат
+        не является датой, в `MarksTable` не попадают (в мягком режиме они ещё и записываются как "bad_date")
+    """
+    if tokenizer is None:
+        tokenizer = CommentTokenizer(coeffs, default_coeff)
+    tokenize = tokenizer.tokenize
+    warnings = tokenizer.warnings
+    info, subjects, dates = {}, {}, []
+    cells, missing_comment = 0, False
+    walk = _walk_sheet(worksheet, info, subjects, dates, info_row, info_step, info_rows,
+                       subjects_row, subject_column, dates_row, marks_column)
+
+    valid_dates = {}
+
+    def is_date(date) -> bool:
+        valid = valid_dates.get(date)
+        if valid is None:
             try:
-                comment_part = cell.comment.text.strip()
-                comments = re.split(r';\s*(?=\S+ - )', comment_part)
-                # Проходимся по всем отметкам и комментариям одновременно
-                for mark, comment in zip(cell.value, comments):
-                    # Если символ не числа - пропускаем
-                    if not mark.isdigit():
-                        continue
-                    # Выделяем комментарии
-                    comment = comment.strip()
-                    # Получаем тип отметки и саму отметку
-                    if comment:
-                        _, work_type, _ = comment.split(" - ")
-                        mark_data = {
-                            "Дата": date, 
-                            "Отметка": int(mark),
-                            "Тип работы": work_type,
-                            "Коэффициент": coeffs[work_type]
-                        }
-                    marks[subjects[subj_id+1]].append(mark_data)
-            except AttributeError:
-                return ""
-    return marks
+                date_to_ordinal(date)
+                valid = valid_dates[date] = True
+            except (TypeError, ValueError, AttributeError):
+                valid = valid_dates[date] = False
+        return valid
+
+    def records():
+        nonlocal cells, missing_comment
+        for subj_id, date, cell in walk:
+            cells += 1
+            # Без комментария отметки не разобрать, но предметы дочитываются до конца
+            if missing_comment or cell.comment is None:
+                missing_comment = True
+                continue
+            # В таблице дата хранится порядковым номером дня, поэтому столбец с подписью-не-датой
+            # пропускается, а не обрывает разбор; в словаре подпись остаётся как есть, как у `extract_marks`
+            if table and not is_date(date):
+                continue
+            for mark, work_type, coeff in tokenize(cell.value, cell.comment.text):
+                yield subj_id, (date, mark, work_type, coeff)
+
+    def tolerant_records():
+        nonlocal cells
+        try:
+            for subj_id, date, cell in walk:
+                cells += 1
+                if not is_date(date):
+                    diagnostics.add("bad_date", subjects[subj_id], date, cell.value, f'Дата столбца "{date}" не разбирается',
+                                    _coordinate(cell))
+                    diagnostics.checked(True)
+                    continue
+                # Ошибка в одной ячейке записывается в `_tolerant_marks` и не прерывает разбор листа
+                for mark, work_type, coeff in _tolerant_marks(tokenizer, diagnostics, subjects[subj_id], date, cell):
+                    yield subj_id, (date, mark, work_type, coeff)
+        except Exception as e:
+            # Лист не дочитан (ошибка чтения, а не ячейки): отметки, разобранные до ошибки, остаются в результате
+            diagnostics.fail(e)
+
+    if diagnostics is not None:
+        records = tolerant_records
+
+    if table:
+        # `subjects` заполняется по ходу чтения, а build обращается к нему только после того, как records() исчерпан
+        marks = MarksTable.build(subjects.values(), records())
+        count = len(marks)
+    else:
+        collected = {}
+        for subj_id, (date, mark, work_type, coeff) in records():
+            collected.setdefault(subjects[subj_id], []).append({
+                "Дата": date,
+                "Отметка": mark,
+                "Тип работы": work_type,
+                "Коэффициент": coeff
+            })
+        marks = {subject: collected.get(subject, []) for subject in subjects.values()}
+        count = sum(len(subject_marks) for subject_marks in marks.values())
+
+    profiling.count("subjects", len(subjects))
+    profiling.count("date_columns", len(dates))
+    profiling.count("cells", cells)
+    profiling.count("comment_warnings", tokenizer.warnings - warnings)
+    if missing_comment:
+        return info, subjects, ""
+    profiling.count("marks", count)
+    return info, subjects, marks
+
+def stream_marks(worksheet, info: dict = None, subjects: dict = None, info_row=1, info_step=2, info_rows=7,
+                 subjects_row=11, subject_column=0, dates_row=10, marks_column=2, tokenizer=None, strict=False):
+    """
+    Выдаёт отметки листа по одной, не собирая ни словаря, ни таблицы
+
+    Аргументы:
+        `worksheet`: Лист Excel
+        `info`, `subjects`: Словари, которые заполняются по ходу чтения тем же, что возвращают
+            `extract_info` и `extract_subjects`; предмет без отметок виден только в `subjects` (default: None)
+        Расположение данных (`info_row`, ..., `marks_column`): как у `scan_sheet`
+        `tokenizer`: `CommentTokenizer`, как в `extract_marks` (default: новый)
+        `strict`: Выбрасывать `MissingCommentError` (подкласс `ValueError`) на ячейке без комментария; иначе её отметки выдаются с пустым
+            типом работы и коэффициентом по умолчанию, а в `tokenizer.missing` они учитываются (default: False)
+
+    Возвращает:
+        Генератор `MarkRecord(subject, date, mark, work_type, coeff)` в порядке строк листа:
+        все отметки предмета подряд, внутри предмета - по датам
+
+    Важно:
+        Сам генератор хранит только текущую строку, строку дат и словарь предметов. Лист при этом
+        держит в памяти способ чтения книги (openpyxl или `xlsx_reader`)
+    """
+    if tokenizer is None:
+        tokenizer = CommentTokenizer(coeffs, default_coeff)
+    tokenize = tokenizer.tokenize
+    subjects = {} if subjects is None else subjects
+    walk = _walk_sheet(worksheet, {} if info is None else info, subjects, [], info_row, info_step, info_rows,
+                       subjects_row, subject_column, dates_row, marks_column)
+    for subj_id, date, cell in walk:
+        subject = subjects[subj_id]
+        if cell.comment is None:
+            if strict:
+                raise MissingCommentError(f'У отметки "{cell.value}" нет комментария ({subject}, {date})')
+            text = ""
+        else:
+            text = cell.comment.text
+        for mark, work_type, coeff in tokenize(cell.value, text):
+            yield MarkRecord(subject, date, mark, work_type, coeff)
 
 def refactor_marks(marks: dict, subject: str) -> tuple[list, list]:
     """
     Выделяем из словаря отметок массив дат и массив оценок
     
     Аргументы:
-        `marks`: Словарь отметок, получаемый в результате выполнения функции `refactor_marks`
+        `marks`: Словарь отметок, получаемый в результате выполнения функции `extract_marks`, или `MarksTable`
         `subject`: Строка - название получаемого предмета
     
     Возвращает:
@@ -157,6 +518,8 @@ def refactor_marks(marks: dict, subject: str) -> tuple[list, list]:
     Важно:
         Если в один день по одному предмету больше 1 отметки, то записывается каждая из отметок и каждая дата
     """
+    if isinstance(marks, MarksTable):
+        return marks.refactor(subject)
     dates, grades, coeffs = [], [], []
     for info in marks[subject]:
         dates.append(info["Дата"])
@@ -164,6 +527,313 @@ def refactor_marks(marks: dict, subject: str) -> tuple[list, list]:
         coeffs.append(info["Коэффициент"])
     return dates, grades, coeffs
 
+@profiling.timed("parse_workbook")
+def parse_workbook(file_path: str, engine: str = "openpyxl", cache=None, diagnostics=None) -> tuple[dict, dict, MarksTable]:
+    """
+    Читает файл и извлекает из него информацию об ученике, предметы и отметки
+
+    Аргументы:
+        `file_path`: Путь к файлу
+        `engine`: Способ чтения книги, как в `read_excel` (default: "openpyxl")
+        `cache`: `WorkbookCache`; если файл уже разбирался, результат берётся из кэша (default: None)
+        `diagnostics`: `Diagnostics` - мягкий режим, как в `scan_sheet`; файл, который не
+            открылся, тоже записывается в него, а не выбрасывает ошибку (default: None)
+
+    Возвращает:
+        Кортеж `(info, subjects, marks)`, где `marks` - `MarksTable` (или "", если у отметок нет комментариев).
+        В мягком режиме для неоткрывшегося файла - пустые `info`, `subjects` и `MarksTable`
+
+    Важно:
+        В мягком режиме в кэше хранится и результат, и его проблемы, отдельно от обычного режима
+    """
+    if diagnostics is not None:
+        return _parse_tolerant(file_path, engine, cache, diagnostics)
+    key = None
+    if cache is not None:
+        key = cache.key(file_path)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    with closing(open_workbook(file_path, engine)) as workbook:
+        result = scan_sheet(workbook.active)
+    if cache is not None:
+        cache.put(key, result)
+    return result
+
+def _parse_tolerant(file_path: str, engine: str, cache, diagnostics: Diagnostics) -> tuple:
+    '''`parse_workbook` в мягком режиме: в кэше лежит пара `(result, Diagnostics)` под отдельным ключом'''
+    found = Diagnostics(diagnostics.limit)
+    key = None
+    try:
+        if cache is not None:
+            key = cache.key(file_path) + "-tolerant"
+            cached = cache.get(key)
+            if cached is not None:
+                result, found = cached
+                diagnostics.update(found)
+                return result
+        with closing(open_workbook(file_path, engine)) as workbook:
+            result = scan_sheet(workbook.active, diagnostics=found)
+    except Exception as e:
+        found.fail(e)
+        result = {}, {}, MarksTable.build([], ())
+    # Недочитанный файл не кэшируется: ошибка может быть временной
+    if key is not None and found.complete:
+        cache.put(key, (result, found))
+    diagnostics.update(found)
+    return result
+
+# Колонки `MarksTable` в архиве и их типы; каждая колонка выровнена по 64 байтам.
+# Коэффициентов в выгрузке единицы, поэтому вместо float64 хранится номер значения из заголовка
+_ARCHIVE_COLUMNS = (("subject_id", "<i2"), ("date", "<i4"), ("mark", "i1"), ("work_type_id", "<i2"), ("coeff", "u1"))
+_ARCHIVE_ALIGN = 64
+_ARCHIVE_PREFIX = struct.Struct("<8sII")
+
+def _format_ordinal(ordinal: int) -> str:
+    from datetime import date as Date
+    day = Date.fromordinal(ordinal)
+    return f"{day.day:02}.{day.month:02}.{day.year}"
+
+def save_archive(archive_path: str, info: dict, subjects: dict, marks) -> int:
+    """
+    Сохраняет разобранную выгрузку в компактный колоночный архив
+
+    Аргументы:
+        `archive_path`: Путь к файлу архива (обычно с расширением `ARCHIVE_SUFFIX`)
+        `info`: Информация об ученике (`extract_info`)
+        `subjects`: Словарь предметов (`extract_subjects`)
+        `marks`: `MarksTable` или словарь из `extract_marks`
+
+    Возвращает:
+        Размер архива в байтах
+
+    Важно:
+        Формат: сигнатура `ARCHIVE_MAGIC`, версия, длина заголовка, заголовок в JSON (шапка, предметы,
+        типы работ, подписи дат, смещения колонок), затем колонки таблицы подряд без сжатия.
+        Значения шапки, которые не являются строкой или числом, сохраняются строкой.
+        Файл пишется во временный и атомарно переименовывается
+    """
+    import numpy as np
+    table = marks if isinstance(marks, MarksTable) else MarksTable.from_marks(marks)
+    coeff_values, coeff_codes = np.unique(table.coeff, return_inverse=True)
+    if len(coeff_values) > 256:
+        raise ValueError("В архиве может быть не больше 256 различных коэффициентов")
+    data = {name: getattr(table, name) for name, _ in _ARCHIVE_COLUMNS}
+    data["coeff"] = coeff_codes.reshape(-1)
+    columns, offset = [], 0
+    for name, dtype in _ARCHIVE_COLUMNS:
+        data[name] = data[name].astype(dtype, copy=False).tobytes()
+        columns.append({"name": name, "dtype": dtype, "offset": offset, "length": len(table)})
+        offset += -(-len(data[name]) // _ARCHIVE_ALIGN) * _ARCHIVE_ALIGN
+    header = json.dumps({
+        "info": {key: value if value is None or isinstance(value, (str, int, float)) else str(value)
+                 for key, value in info.items()},
+        "subjects": [[subj_id, name] for subj_id, name in subjects.items()],
+        "table_subjects": table.subjects,
+        "work_types": table.work_types,
+        "coeffs": coeff_values.tolist(),
+        # Подписи дат хранятся, только если отличаются от "dd.mm.yyyy", которое восстанавливает `date_label`
+        "date_labels": [[ordinal, str(label)] for ordinal, label in table._date_labels.items()
+                        if str(label) != _format_ordinal(ordinal)],
+        "columns": columns,
+    }, ensure_ascii=False).encode("utf-8")
+    data_start = -(-(_ARCHIVE_PREFIX.size + len(header)) // _ARCHIVE_ALIGN) * _ARCHIVE_ALIGN
+
+    with atomic_write(archive_path) as file:
+        file.write(_ARCHIVE_PREFIX.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, len(header)))
+        file.write(header)
+        for column in columns:
+            file.seek(data_start + column["offset"])
+            file.write(data[column["name"]])
+        file.truncate(data_start + offset)
+    return data_start + offset
+
+@profiling.timed("load_archive")
+def load_archive(archive_path: str, mmap: bool = True) -> tuple[dict, dict, MarksTable]:
+    """
+    Загружает архив, сохранённый `save_archive`
+
+    Аргументы:
+        `archive_path`: Путь к файлу архива
+        `mmap`: Отобразить файл в память: колонки становятся представлениями без копирования,
+            с диска читаются только те страницы, к которым обращаются; коэффициенты восстанавливаются
+            из номеров отдельным небольшим массивом (default: True)
+
+    Возвращает:
+        Кортеж `(info, subjects, marks)`, как у `parse_workbook`; колонки `marks` при `mmap=True` только для чтения
+
+    Важно:
+        Если файл не является архивом или записан другой версией формата, вызывается `ValueError`
+    """
+    import numpy as np
+    with open(archive_path, "rb") as file:
+        prefix = file.read(_ARCHIVE_PREFIX.size)
+        if len(prefix) < _ARCHIVE_PREFIX.size:
+            raise ValueError(f'Файл "{archive_path}" не является архивом отметок')
+        magic, version, header_size = _ARCHIVE_PREFIX.unpack(prefix)
+        if magic != ARCHIVE_MAGIC:
+            raise ValueError(f'Файл "{archive_path}" не является архивом отметок')
+        if version != ARCHIVE_VERSION:
+            raise ValueError(f'Архив "{archive_path}" записан в версии формата {version}, ожидается {ARCHIVE_VERSION}')
+        header = json.loads(file.read(header_size).decode("utf-8"))
+        if not mmap:
+            content = file.read()
+    data_start = -(-(_ARCHIVE_PREFIX.size + header_size) // _ARCHIVE_ALIGN) * _ARCHIVE_ALIGN
+    if mmap:
+        buffer = np.memmap(archive_path, dtype=np.uint8, mode="r").view(np.ndarray)[data_start:]
+    else:
+        buffer = np.frombuffer(content, dtype=np.uint8, offset=data_start - _ARCHIVE_PREFIX.size - header_size)
+    columns = {}
+    for column in header["columns"]:
+        dtype = np.dtype(column["dtype"])
+        start = column["offset"]
+        columns[column["name"]] = buffer[start:start + column["length"] * dtype.itemsize].view(dtype)
+    columns["coeff"] = np.asarray(header["coeffs"], dtype=np.float64)[columns["coeff"]]
+    table = MarksTable(header["table_subjects"], header["work_types"], *(columns[name] for name, _ in _ARCHIVE_COLUMNS),
+                       date_labels={ordinal: label for ordinal, label in header["date_labels"]})
+    subjects = {subj_id: name for subj_id, name in header["subjects"]}
+    return header["info"], subjects, table
+
+class _FileLock:
+    '''Межпроцессная блокировка на файле, создаваемом с `O_EXCL` (работает и в Windows)'''
+    def __init__(self, path: str, timeout: float = 10, stale: float = 60):
+        self.path, self.timeout, self.stale = path, timeout, stale
+
+    def __enter__(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                os.close(os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return self
+            except FileExistsError:
+                # Блокировка, брошенная упавшим процессом, снимается по возрасту
+                try:
+                    if time.time() - os.path.getmtime(self.path) > self.stale:
+                        os.remove(self.path)
+                        continue
+                except FileNotFoundError:
+                    continue
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f'Не удалось получить блокировку "{self.path}"')
+                time.sleep(0.005)
+
+    def __exit__(self, *exc):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+class WorkbookCache:
+    """
+    Кэш разобранных книг на диске с вытеснением давно не использованных записей (LRU).
+
+    Ключ записи - хэш содержимого файла и версии разборщика `PARSER_VERSION`, поэтому
+    повторно загруженная та же выгрузка находится независимо от имени файла.
+    Значение - `(info, subjects, marks)` в pickle.
+
+    Аргументы:
+        `folder`: Папка кэша (default: `.cache` в папке `folder_root`, определяется при создании кэша)
+        `max_bytes`: Максимальный суммарный размер записей (default: 256 МБ)
+        `max_entries`: Максимальное количество записей (default: 1000)
+
+    Важно:
+        Записи пишутся во временный файл и атомарно переименовываются, а вытеснение идёт под
+        файловой блокировкой, поэтому кэшем могут одновременно пользоваться несколько процессов.
+        Время последнего обращения хранится в mtime файла записи.
+    """
+    def __init__(self, folder: str = None, max_bytes: int = 256 * 2**20, max_entries: int = 1000):
+        # Папка по умолчанию берётся из `folder_root` в момент создания, а не импорта модуля
+        folder = folder if folder is not None else os.path.join(folder_root, '.cache')
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(folder, exist_ok=True)
+        self._lock_path = os.path.join(folder, ".lock")
+
+    @staticmethod
+    def key(file_path: str) -> str:
+        '''Ключ записи: sha256 от версии разборщика и содержимого файла'''
+        digest = hashlib.sha256(f"parser-v{PARSER_VERSION}:".encode())
+        with open(file_path, "rb") as file:
+            for chunk in iter(lambda: file.read(2**20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.folder, f"{key}.pkl")
+
+    def get(self, key: str):
+        '''Возвращает сохранённое значение или None, если записи нет'''
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                value = pickle.load(file)
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            profiling.count("cache_misses")
+            return None
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            # Повреждённая или устаревшая запись - считаем промахом и удаляем
+            self.misses += 1
+            profiling.count("cache_misses")
+            self.remove(key)
+            return None
+        self.hits += 1
+        profiling.count("cache_hits")
+        return value
+
+    def put(self, key: str, value):
+        '''Сохраняет значение и при необходимости вытесняет старые записи'''
+        with atomic_write(self._path(key)) as file:
+            pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.evict()
+
+    def remove(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def entries(self) -> list:
+        '''Записи кэша в виде `(mtime, size, path)`, от давно использованных к недавним'''
+        entries = []
+        with os.scandir(self.folder) as it:
+            for entry in it:
+                if entry.name.endswith(".pkl"):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        return sorted(entries)
+
+    def evict(self):
+        '''Удаляет давно использованные записи, пока кэш не уложится в ограничения'''
+        with _FileLock(self._lock_path):
+            entries = self.entries()
+            count, total = len(entries), sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if count <= self.max_entries and total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                count, total = count - 1, total - size
+
+    def stats(self) -> dict:
+        '''Счётчики попаданий и промахов этого экземпляра и текущий размер кэша'''
+        entries = self.entries()
+        return {"hits": self.hits, "misses": self.misses,
+                "entries": len(entries), "bytes": sum(size for _, size, _ in entries)}
+
+def resolve_cache(value) -> str | None:
+    '''Папка кэша по ключу `--cache`: None - без кэша, True (ключ без папки) - папка по умолчанию `WorkbookCache`'''
+    return WorkbookCache().folder if value is True else value
+
 # def main():
 #     # Проверяем существование папки
 #     if not os.path.exists(folder_root):
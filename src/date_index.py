@@ -0,0 +1,142 @@
+"""
+Индекс по датам для среднего балла за произвольный период.
+
+`countMean` считает средний балл только за весь период из шапки листа и каждый
+раз заново. `DateIndex` один раз сортирует отметки каждого предмета по дате и
+хранит накопленные суммы `отметка * коэффициент` и коэффициентов. После этого
+«средний балл с A по B» или «средний балл на дату D» - это два двоичных поиска
+по датам и разность двух накопленных сумм, то есть O(log n) на запрос.
+
+Предметы лежат подряд в одном массиве, отсортированном по ключу
+`номер предмета * _SPAN + дата`, поэтому запрос сразу по всем предметам
+(`means`) - это один `np.searchsorted` на массив ключей. Для запросов по всем
+отметкам вместе есть отдельный массив, отсортированный только по дате.
+
+Средний балл округляется как в `countMean`: значения на середине между сотыми
+пересчитываются встроенным `sum` (`stats.round_mean`).
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from marks_table import MarksTable, date_to_ordinal
+from stats import _exact_mean, _round2, round_mean
+
+# Больше любого порядкового номера дня (31.12.9999 - 3652059)
+_SPAN = 1 << 22
+
+# Итог за период: количество отметок, средний балл до сотых и оценка (None, если отметок нет)
+PeriodResult = namedtuple("PeriodResult", ["count", "mean", "grade"])
+
+
+def _ordinal(value, default: int) -> int:
+    '''Граница периода в виде порядкового номера дня; None - без ограничения'''
+    if value is None:
+        return default
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    return date_to_ordinal(value)
+
+
+class DateIndex:
+    """
+    Накопленные суммы отметок по датам для каждого предмета и для всех предметов вместе
+
+    Аргументы:
+        `table`: Таблица отметок `MarksTable`
+
+    Важно:
+        Границы периода (`start`, `end`) включаются в период и задаются как "dd.mm.yyyy",
+        `date` или порядковый номер дня; None - без ограничения с этой стороны
+    """
+    __slots__ = ("subjects", "_index", "_keys", "_products", "_coeffs", "_cum_products", "_cum_coeffs",
+                 "_dates", "_all_products", "_all_coeffs", "_all_cum_products", "_all_cum_coeffs")
+
+    def __init__(self, table: MarksTable):
+        self.subjects = list(table.subjects)
+        self._index = {name: idx for idx, name in enumerate(self.subjects)}
+        subject_id = table.subject_id.astype(np.int64)
+        dates = table.date.astype(np.int64)
+        products = table.mark * table.coeff
+        coeffs = np.asarray(table.coeff, dtype=np.float64)
+
+        # По предмету, внутри предмета - по дате; отметки одного дня остаются в исходном порядке
+        keys = subject_id * _SPAN + dates
+        order = np.argsort(keys, kind="stable")
+        self._keys = keys[order]
+        self._products, self._coeffs = products[order], coeffs[order]
+        self._cum_products = np.concatenate(([0.0], np.cumsum(self._products)))
+        self._cum_coeffs = np.concatenate(([0.0], np.cumsum(self._coeffs)))
+
+        order = np.argsort(dates, kind="stable")
+        self._dates = dates[order]
+        self._all_products, self._all_coeffs = products[order], coeffs[order]
+        self._all_cum_products = np.concatenate(([0.0], np.cumsum(self._all_products)))
+        self._all_cum_coeffs = np.concatenate(([0.0], np.cumsum(self._all_coeffs)))
+
+    @classmethod
+    def from_marks(cls, marks) -> "DateIndex":
+        '''Строит индекс по словарю из `extract_marks` или по `MarksTable`'''
+        return cls(marks if isinstance(marks, MarksTable) else MarksTable.from_marks(marks))
+
+    def _bounds(self, subject, start, end) -> tuple[int, int]:
+        '''Отметки предмета (или всех предметов, если `subject` - None) за период: `[lo, hi)`'''
+        first, last = _ordinal(start, 0), _ordinal(end, _SPAN - 1)
+        if subject is None:
+            lo = int(np.searchsorted(self._dates, first, side="left"))
+            hi = int(np.searchsorted(self._dates, last, side="right"))
+        else:
+            base = self._index[subject] * _SPAN
+            lo = int(np.searchsorted(self._keys, base + first, side="left"))
+            hi = int(np.searchsorted(self._keys, base + last, side="right"))
+        return lo, max(lo, hi)
+
+    def query(self, subject: str = None, start=None, end=None) -> PeriodResult:
+        """
+        Итог предмета за период
+
+        Аргументы:
+            `subject`: Название предмета; None - все отметки всех предметов (default: None)
+            `start`, `end`: Первый и последний день периода (default: без ограничения)
+
+        Возвращает:
+            `PeriodResult(count, mean, grade)`; `mean` и `grade` - None, если за период нет отметок
+        """
+        lo, hi = self._bounds(subject, start, end)
+        if subject is None:
+            cum_products, cum_coeffs = self._all_cum_products, self._all_cum_coeffs
+            products, coeffs = self._all_products, self._all_coeffs
+        else:
+            cum_products, cum_coeffs = self._cum_products, self._cum_coeffs
+            products, coeffs = self._products, self._coeffs
+        if lo == hi:
+            return PeriodResult(0, None, None)
+        value = (cum_products[hi] - cum_products[lo]) / (cum_coeffs[hi] - cum_coeffs[lo])
+        mean = round_mean(float(value), lambda: _exact_mean(products[lo:hi], coeffs[lo:hi]))
+        return PeriodResult(hi - lo, mean, round(mean + 0.01))
+
+    def mean(self, subject: str = None, start=None, end=None) -> float | None:
+        '''Средний балл за период, округлённый до сотых (None, если отметок нет)'''
+        return self.query(subject, start, end).mean
+
+    def as_of(self, day, subject: str = None) -> float | None:
+        '''Средний балл по всем отметкам до дня `day` включительно'''
+        return self.query(subject, None, day).mean
+
+    def means(self, start=None, end=None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Средний балл всех предметов за период одним поиском по массиву ключей
+
+        Возвращает:
+            Кортеж `(counts, means)` в порядке `subjects`; у предметов без отметок за период среднее - nan
+        """
+        first, last = _ordinal(start, 0), _ordinal(end, _SPAN - 1)
+        base = np.arange(len(self.subjects), dtype=np.int64) * _SPAN
+        lo = np.searchsorted(self._keys, base + first, side="left")
+        hi = np.maximum(np.searchsorted(self._keys, base + last, side="right"), lo)
+        counts = hi - lo
+        with np.errstate(invalid="ignore", divide="ignore"):
+            values = (self._cum_products[hi] - self._cum_products[lo]) / (self._cum_coeffs[hi] - self._cum_coeffs[lo])
+        values[counts == 0] = np.nan
+        means = _round2(values, lambda i: _exact_mean(self._products[lo[i]:hi[i]], self._coeffs[lo[i]:hi[i]]))
+        return counts, means
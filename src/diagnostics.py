@@ -0,0 +1,116 @@
+"""
+Проблемы разбора выгрузки: мягкий режим вместо `exit()` и пустой строки.
+
+В обычном режиме первая ячейка без комментария превращает все отметки в ""
+(`extract_marks`, `scan_sheet`), а ошибка чтения файла прерывает обработку.
+Если передать в `scan_sheet` или `parse_workbook` объект `Diagnostics`, разбор
+продолжается: проблемы каждой ячейки и файла записываются в него, а
+возвращаются отметки, которые удалось разобрать.
+
+Виды проблем (`KINDS`):
+- `missing_comment` - у ячейки с отметками нет комментария; отметки берутся
+  с пустым типом работы и коэффициентом по умолчанию, как в `stream_marks`;
+- `unknown_work_type` - типа работы нет в `data_processing.coeffs`;
+- `mismatch` - число отметок в ячейке и записей в комментарии не совпадает;
+- `bad_date` - дату столбца не разобрать; его отметки пропускаются;
+- `bad_cell` - при разборе ячейки возникла ошибка; её отметки пропускаются,
+  разбор продолжается со следующей ячейки;
+- `file` - файл не открылся или не дочитался до конца.
+
+У проблем ячеек записывается и адрес ячейки (`cell`, например "D12").
+
+`quality` - доля ячеек с отметками, разобранных без проблем (от 0 до 1). Если
+файл не дочитан, `quality` равно 0: отметки до места ошибки возвращаются, но
+полноте такого результата верить нельзя.
+"""
+from collections import Counter, namedtuple
+
+KINDS = ("missing_comment", "unknown_work_type", "mismatch", "bad_date", "bad_cell", "file")
+
+# Одна проблема: вид, предмет, дата (столбец), значение ячейки, пояснение и адрес ячейки
+Problem = namedtuple("Problem", ["kind", "subject", "date", "value", "detail", "cell"], defaults=(None,))
+
+
+class Diagnostics:
+    """
+    Накопитель проблем разбора одного или нескольких файлов
+
+    Аргументы:
+        `limit`: Сколько проблем хранить подробно; сверх этого растут только счётчики `counts` (default: 1000)
+
+    Атрибуты:
+        `problems`: Список `Problem` (не больше `limit`)
+        `counts`: `Counter` проблем по видам, без ограничения
+        `cells`: Сколько ячеек с отметками разобрано
+        `bad_cells`: Сколько из них с проблемами
+        `complete`: Файл дочитан до конца
+    """
+    __slots__ = ("limit", "problems", "counts", "cells", "bad_cells", "complete")
+
+    def __init__(self, limit: int = 1000):
+        self.limit = limit
+        self.problems = []
+        self.counts = Counter()
+        self.cells = 0
+        self.bad_cells = 0
+        self.complete = True
+
+    def add(self, kind: str, subject=None, date=None, value=None, detail: str = "", cell: str = None):
+        '''Записывает проблему'''
+        self.counts[kind] += 1
+        if len(self.problems) < self.limit:
+            self.problems.append(Problem(kind, subject, date, value, detail, cell))
+
+    def checked(self, bad: bool):
+        '''Учитывает разобранную ячейку: `bad` - были ли у неё проблемы'''
+        self.cells += 1
+        self.bad_cells += bad
+
+    def fail(self, error: BaseException):
+        '''Записывает ошибку, из-за которой файл не дочитан'''
+        self.complete = False
+        self.add("file", detail=f"{type(error).__name__}: {error}")
+
+    def update(self, other: "Diagnostics"):
+        '''Добавляет проблемы и счётчики другого накопителя (например, из кэша)'''
+        self.counts.update(other.counts)
+        self.problems.extend(other.problems[:max(self.limit - len(self.problems), 0)])
+        self.cells += other.cells
+        self.bad_cells += other.bad_cells
+        self.complete = self.complete and other.complete
+
+    @property
+    def ok(self) -> bool:
+        '''Проблем нет'''
+        return not self.counts
+
+    @property
+    def quality(self) -> float:
+        '''Доля ячеек без проблем, 0 - если файл не дочитан, 1 - если ячеек с отметками нет'''
+        if not self.complete:
+            return 0.0
+        if not self.cells:
+            return 1.0
+        return round((self.cells - self.bad_cells) / self.cells, 4)
+
+    def to_dict(self) -> dict:
+        '''Сводка для JSON'''
+        return {
+            "quality": self.quality,
+            "complete": self.complete,
+            "cells": self.cells,
+            "bad_cells": self.bad_cells,
+            "counts": dict(self.counts),
+            "problems": [problem._asdict() for problem in self.problems],
+        }
+
+    def format(self, problems: int = 10) -> str:
+        '''Строки для вывода в консоль: оценка качества и не больше `problems` первых проблем'''
+        lines = [f'Качество разбора: {self.quality:.0%} ({self.bad_cells} из {self.cells} ячеек с проблемами)']
+        for problem in self.problems[:problems]:
+            where = ", ".join(str(part) for part in (problem.subject, problem.date, problem.cell) if part is not None)
+            lines.append(f'  {problem.kind}{f" ({where})" if where else ""}: {problem.detail}')
+        hidden = sum(self.counts.values()) - min(len(self.problems), problems)
+        if hidden > 0:
+            lines.append(f'  ... и ещё {hidden}')
+        return "\n".join(lines)
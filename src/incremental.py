@@ -0,0 +1,303 @@
+"""
+Инкрементальный анализ повторных выгрузок одного ученика.
+
+Ученик выгружает дневник раз в несколько дней, и новая выгрузка почти целиком
+повторяет прошлую. `IncrementalAnalyzer` хранит для каждого ученика (ключ -
+шапка листа из `extract_info`) состояние прошлого разбора: отпечаток каждого
+столбца-даты, разобранные отметки столбцов и накопленные суммы по предметам.
+
+При новой выгрузке отпечатки столбцов считаются заново, а разбираются только
+столбцы с незнакомым отпечатком. Накопленные суммы и ряды среднего балла
+пересчитываются начиная с первого изменившегося столбца: если добавились
+только новые даты в конце, работа пропорциональна количеству новых отметок.
+"""
+import hashlib, json, os, pickle
+from collections import namedtuple
+
+import numpy as np
+
+import data_processing as d
+from analysis import Report, SubjectResult
+from comment_tokenizer import CommentTokenizer
+from stats import _exact_mean, min_marks, round_mean
+
+# Версия формата состояния: при изменении старые состояния не используются
+STATE_VERSION = 1
+
+# Результат обновления: отчёт и сколько работы пришлось сделать
+Update = namedtuple("Update", [
+    "report",       # analysis.Report по всей выгрузке
+    "columns",      # количество столбцов-дат в выгрузке
+    "parsed",       # сколько столбцов разобрано заново
+    "recomputed",   # для скольких отметок пересчитаны накопленные суммы
+])
+
+
+class SubjectState:
+    '''Отметки одного предмета в порядке следования и накопленные по ним суммы'''
+    __slots__ = ("dates", "marks", "work_types", "coeffs", "products", "cum_products", "cum_coeffs", "running")
+
+    def __init__(self):
+        self.dates, self.marks, self.work_types, self.coeffs = [], [], [], []
+        self.products, self.cum_products, self.cum_coeffs, self.running = [], [], [], []
+
+    def __len__(self):
+        return len(self.marks)
+
+    def __getstate__(self):
+        return [getattr(self, name) for name in self.__slots__]
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+    def truncate(self, size: int):
+        '''Отбрасывает отметки начиная с `size`-й'''
+        for name in self.__slots__:
+            del getattr(self, name)[size:]
+
+    def _exact(self, stop: int) -> float:
+        return _exact_mean(np.array(self.products[:stop]), np.array(self.coeffs[:stop], dtype=np.float64))
+
+    def append(self, date, mark: int, work_type: str, coeff: float):
+        '''Добавляет отметку и продлевает накопленные суммы и ряд среднего балла'''
+        product = float(mark * coeff)
+        cum_products = (self.cum_products[-1] if self.cum_products else 0.0) + product
+        cum_coeffs = (self.cum_coeffs[-1] if self.cum_coeffs else 0.0) + coeff
+        self.dates.append(date)
+        self.marks.append(mark)
+        self.work_types.append(work_type)
+        self.coeffs.append(coeff)
+        self.products.append(product)
+        self.cum_products.append(cum_products)
+        self.cum_coeffs.append(cum_coeffs)
+        stop = len(self.marks)
+        self.running.append(round_mean(cum_products / cum_coeffs, lambda: self._exact(stop)))
+
+    @property
+    def mean(self) -> float | None:
+        '''Средний балл, округлённый до сотых (None, если отметок нет)'''
+        return self.running[-1] if self.running else None
+
+
+class StudentState:
+    """
+    Состояние разбора выгрузки одного ученика
+
+    Атрибуты:
+        `subjects`: Список предметов
+        `fingerprints`: Отпечатки столбцов-дат в порядке следования
+        `offsets`: Для каждого столбца - количество отметок каждого предмета до этого столбца
+        `columns`: Разобранные столбцы `{отпечаток: [(subj_idx, date, mark, work_type, coeff), ...]}`
+        `subject_states`: `SubjectState` каждого предмета
+    """
+    __slots__ = ("version", "subjects", "fingerprints", "offsets", "columns", "subject_states")
+
+    def __init__(self, subjects: list):
+        self.version = STATE_VERSION
+        self.subjects = list(subjects)
+        self.fingerprints, self.offsets, self.columns = [], [], {}
+        self.subject_states = [SubjectState() for _ in self.subjects]
+
+    def __getstate__(self):
+        return [getattr(self, name) for name in self.__slots__]
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+    def series(self, subject: str) -> tuple[list, list]:
+        '''Даты и ряд изменения среднего балла предмета (как `refactor_marks(...)[0]` и `extractScoreMass`)'''
+        state = self.subject_states[self.subjects.index(subject)]
+        return list(state.dates), list(state.running)
+
+    def report(self, info: dict) -> Report:
+        '''Отчёт по текущему состоянию, такой же, как `analysis.analyze_marks` по всей выгрузке'''
+        period = str(info.get('Период') or '')
+        required = min_marks(period)
+        results, histogram = [], [0, 0, 0, 0, 0]
+        products, coeffs = [], []
+        for name, state in zip(self.subjects, self.subject_states):
+            count = len(state)
+            mean = state.mean
+            grade = round(mean + 0.01) if count else None
+            missing = max(required - count, 0)
+            if count and not missing:
+                histogram[5 - grade] += 1
+            results.append(SubjectResult(name=name, count=count, mean=mean, grade=grade, missing=missing))
+            products += state.products
+            coeffs += state.coeffs
+        total_score = None
+        if products:
+            products, coeffs = np.array(products), np.array(coeffs, dtype=np.float64)
+            total_score = round_mean(products.sum() / coeffs.sum(), lambda: _exact_mean(products, coeffs))
+        return Report(info=dict(info), subjects=tuple(results), histogram=tuple(histogram),
+                      total_score=total_score, min_marks=required)
+
+
+def column_fingerprint(column) -> str:
+    '''Отпечаток столбца-даты: хэш даты, значений ячеек и текстов комментариев'''
+    digest = hashlib.blake2b(digest_size=16)
+    for cell in column:
+        if cell is None or not cell.value:
+            digest.update(b"\x00")
+            continue
+        comment = cell.comment.text if cell.comment is not None else ""
+        digest.update(f"{cell.value}\x01{comment}\x00".encode())
+    return digest.hexdigest()
+
+
+def _parse_column(column, tokenizer: CommentTokenizer) -> list:
+    '''Разбирает один столбец-дату так же, как `data_processing._iter_marks`'''
+    date = column[0].value
+    records = []
+    for subj_idx, cell in enumerate(column[1:]):
+        if cell is None or not cell.value:
+            continue
+        if cell.comment is None:
+            raise ValueError("В файле отсутствуют комментарии к отметкам")
+        for mark, work_type, coeff in tokenizer.tokenize(cell.value, cell.comment.text):
+            records.append((subj_idx, date, mark, work_type, coeff))
+    return records
+
+
+def _same_subjects(worksheet, subjects: list, start_row=11, column_index=0) -> bool:
+    '''Проверяет, что в листе тот же список предметов, не перебирая все строки, как `extract_subjects`'''
+    for idx, subject in enumerate(subjects):
+        if worksheet.cell(start_row + idx, column_index + 1).value != subject:
+            return False
+    return worksheet.cell(start_row + len(subjects), column_index + 1).value is None
+
+
+class StateStore:
+    """
+    Состояния учеников на диске: по одному файлу `<ключ>.pkl` на ученика.
+
+    В отличие от `WorkbookCache`, записи не вытесняются: состояние нужно каждому
+    ученику, который ещё пришлёт выгрузку, сколько бы их ни было.
+
+    Аргументы:
+        `folder`: Папка состояний (default: `.state` в папке `folder_root`, определяется при создании)
+    """
+    def __init__(self, folder: str = None):
+        folder = folder if folder is not None else os.path.join(d.folder_root, '.state')
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.folder, f"{key}.pkl")
+
+    def get(self, key: str):
+        '''Возвращает сохранённое состояние или None, если его нет или файл повреждён'''
+        try:
+            with open(self._path(key), "rb") as file:
+                return pickle.load(file)
+        except (FileNotFoundError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return None
+
+    def put(self, key: str, state):
+        '''Сохраняет состояние атомарно'''
+        with d.atomic_write(self._path(key)) as file:
+            pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def resolve_state(value) -> str | None:
+    '''Папка состояний по ключу `--state`: None - только в памяти, True (ключ без папки) - `.state` в папке `folder_root`'''
+    return StateStore().folder if value is True else value
+
+
+class IncrementalAnalyzer:
+    """
+    Анализ выгрузок с сохранением состояния по ученикам
+
+    Аргументы:
+        `folder`: Папка для состояний; если не задана, состояния живут только в памяти (default: None)
+        `tokenizer`: `CommentTokenizer` для разбора новых столбцов (default: новый)
+
+    Важно:
+        Состояния на диске хранятся в `StateStore` и не вытесняются
+    """
+    def __init__(self, folder: str = None, tokenizer: CommentTokenizer = None):
+        self.store = StateStore(folder) if folder else None
+        self.tokenizer = tokenizer or CommentTokenizer(d.coeffs, d.default_coeff)
+        self._states = {}
+
+    @staticmethod
+    def key(info: dict) -> str:
+        '''Ключ ученика: хэш шапки листа (организация, ученик, класс, период)'''
+        text = json.dumps(info, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(f"state-v{STATE_VERSION}:{text}".encode()).hexdigest()
+
+    def load(self, key: str) -> StudentState | None:
+        state = self._states.get(key)
+        if state is None and self.store is not None:
+            state = self.store.get(key)
+        return state if isinstance(state, StudentState) and state.version == STATE_VERSION else None
+
+    def save(self, key: str, state: StudentState):
+        self._states[key] = state
+        if self.store is not None:
+            self.store.put(key, state)
+
+    def update(self, worksheet, start_row=10, start_column=2) -> Update:
+        """
+        Анализирует выгрузку, используя состояние прошлого разбора этого ученика
+
+        Аргументы:
+            `worksheet`: Лист Excel (openpyxl или `xlsx_reader`)
+            `start_row`: Строка с датами (default: 10)
+            `start_column`: Первый столбец-дата (default: 2)
+
+        Возвращает:
+            `Update`
+
+        Важно:
+            Если у отметки нет комментария, выбрасывается `ValueError`, а состояние не меняется
+        """
+        info = d.extract_info(worksheet)
+        key = self.key(info)
+        state = self.load(key)
+        # Список предметов обычно не меняется: сверяем его с сохранённым по ячейкам,
+        # а весь лист перебираем, только если он изменился
+        if state is None or not _same_subjects(worksheet, state.subjects, start_row + 1):
+            state = StudentState(d.extract_subjects(worksheet, start_row + 1).values())
+        subjects = state.subjects
+
+        # Отпечатки всех столбцов; столбцы с незнакомым отпечатком разбираются
+        fingerprints, fresh = [], {}
+        for column in worksheet.iter_cols(min_row=start_row, max_row=start_row + len(subjects), min_col=start_column):
+            if column[0].value == "Итог:":
+                break
+            fingerprint = column_fingerprint(column)
+            fingerprints.append(fingerprint)
+            if fingerprint not in state.columns and fingerprint not in fresh:
+                fresh[fingerprint] = _parse_column(column, self.tokenizer)
+
+        # Всё до первого отличающегося столбца остаётся как было
+        first = 0
+        while first < min(len(fingerprints), len(state.fingerprints)) and fingerprints[first] == state.fingerprints[first]:
+            first += 1
+        if first < len(state.offsets):
+            sizes = state.offsets[first]
+        else:
+            sizes = [len(subject) for subject in state.subject_states]
+        for subject, size in zip(state.subject_states, sizes):
+            subject.truncate(size)
+
+        columns = {fingerprint: state.columns[fingerprint] if fingerprint in state.columns else fresh[fingerprint]
+                   for fingerprint in fingerprints}
+        offsets = state.offsets[:first]
+        recomputed = 0
+        for fingerprint in fingerprints[first:]:
+            offsets.append([len(subject) for subject in state.subject_states])
+            for subj_idx, date, mark, work_type, coeff in columns[fingerprint]:
+                state.subject_states[subj_idx].append(date, mark, work_type, coeff)
+            recomputed += len(columns[fingerprint])
+        state.fingerprints, state.offsets, state.columns = fingerprints, offsets, columns
+
+        self.save(key, state)
+        return Update(state.report(info), len(fingerprints), len(fresh), recomputed)
+
+    def state(self, info: dict) -> StudentState | None:
+        '''Сохранённое состояние ученика по шапке листа'''
+        return self.load(self.key(info))
@@ -1,73 +1,271 @@
+# openpyxl, matplotlib, NumPy и datetime здесь не импортируются: они подгружаются только там,
+# где нужны (чтение книги через openpyxl, таблица отметок, рисование графика, разбор даты),
+# поэтому вывод одних средних баллов обходится без них
+import argparse, json, os, sys
+from contextlib import closing
+import analysis as a
 import data_processing as d
-import visualization as v
-from openpyxl import load_workbook
-from collections import defaultdict
+import profiling
+import streaming
+from diagnostics import Diagnostics
+from marks_table import date_to_ordinal
+from dataclasses import asdict
 
-def getWorksheet(fileName):
+# Периоды точек графика, как `resample.FREQUENCIES` (resample тянет NumPy, поэтому здесь не импортируется)
+PERIODS = ("day", "week", "month", "quarter")
+
+def getWorksheet(fileName, engine='openpyxl'):
     filePath = d.get_file_path(fileName, d.folder_root)
-    data = load_workbook(filePath)
-    worksheet = data.active
+    # Лист уже прочитан целиком, поэтому книгу можно сразу закрыть
+    with closing(d.read_excel(filePath, engine)) as data:
+        worksheet = data.active
     return worksheet
 
-def printInfo(worksheet, subjects, allMarks):
-    means = []
-    info = d.extract_info(worksheet)
-    print('\n')
-    for i in info:
-        print(f'{i}: {info[i]}')
-    print('\nСредний балл по всем предметам:\n')
-
-    for i in subjects:
-        subject = subjects[i]
-        period = info['Период']
-        estInf = v.countMean(subject, allMarks, period)
-        try:
-            means.append(float(estInf[estInf.index('-') + 1:estInf.index('~')]))
-        except:
-            pass
-        print(estInf)
-    totalScore = v.countTotalScore(allMarks)
-    print(f'___________________________\nСреднее всех средних баллов - {v.setColorOfScore(totalScore)}{totalScore}{'\033[0m'}')
-    print(f'Итого: {v.totalEst[0]} пятёрок; {v.totalEst[1]} четверок; {v.totalEst[2]} троек; {v.totalEst[3]} двоек; {v.totalEst[4]} единиц; не хватает оценок у {len(subjects) - sum(v.totalEst)} предметов')
+def loadWorkbook(fileName, engine='openpyxl'):
+    # Повторно загруженная выгрузка берётся из кэша, без разбора книги
+    filePath = d.get_file_path(fileName, d.folder_root)
+    return d.parse_workbook(filePath, engine, cache=d.WorkbookCache())
+
+# В отличие от прежней версии, принимает уже разобранную шапку (`info`), а не лист:
+# выгрузка может прийти из кэша, где листа нет
+def printInfo(info, subjects, allMarks):
+    import visualization as v
+    with profiling.stage("statistics"):
+        report = a.analyze_marks(info, allMarks)
+    print(v.formatReport(report))
 
+@profiling.timed("process_grades")
 def process_grades(grades, dates):
-    # Группируем оценки по датам
-    date_to_grades = defaultdict(list)
-    for date, grade in zip(dates, grades):
-        date_to_grades[date].append(grade)
-
-    # Сохраняем уникальные даты в порядке их первого появления
-    unique_dates = []
-    seen_dates = set()
-    for date in dates:
-        if date not in seen_dates:
-            unique_dates.append(date)
-            seen_dates.add(date)
-
-    # Вычисляем средние оценки для каждой даты
-    avg_grades = []
-    for date in unique_dates:
-        grades_list = date_to_grades[date]
-        average = sum(grades_list) / len(grades_list)
-        avg_grades.append(average)
-
-    return avg_grades, unique_dates
+    import numpy as np, resample
+    # Средние по дням считает resample: даты один раз переводятся в порядковые номера,
+    # группы - по границам в отсортированном массиве
+    ordinals = resample.to_ordinals(dates)
+    series = resample.resample(ordinals, grades)
+    # Даты возвращаются как в исходных данных: в порядке первого появления и в исходном виде
+    _, first = np.unique(ordinals, return_index=True)
+    order = np.argsort(first, kind="stable")
+    return series.values[order].tolist(), [dates[i] for i in first[order].tolist()]
 
 def drawGraph(subForGraph, subjects, allMarks):
+    import resample, visualization as v
     if subForGraph in subjects.values():
-        scores = v.extractScoreMass(subForGraph, allMarks)
-        dates = d.refactor_marks(allMarks, subForGraph)[0]
-        scores, dates = process_grades(scores, dates)
+        scores, dates = resample.graph_series(allMarks, subForGraph)
         if len(scores) <= 1:
             print(f'{'\033[31m'}Слишком мало оценок для отрисовки графика{'\033[0m'}')
-            exit()
         else:
             v.drawGraph(subForGraph, scores, dates)
     elif subForGraph != '':
         print(f'{'\033[31m'}Указан несуществующий предмет{'\033[0m'}')
 
 
-def main():
+def resolvePath(fileName):
+    # Существующий путь берётся как есть, иначе файл ищется в папке data
+    if os.path.isfile(fileName):
+        return fileName
+    return d.get_file_path(fileName, d.folder_root)
+
+def saveGraphs(subjectNames, allMarks, folder, period='day'):
+    # Графики рисуются без окна (Agg), matplotlib импортируется только здесь
+    import render, resample
+    graphs = {}
+    for subject in subjectNames:
+        scores, dates = resample.graph_series(allMarks, subject, period)
+        if len(scores) <= 1:
+            graphs[subject] = None
+            continue
+        path = os.path.join(folder, f'graph_{subject}.png')
+        with profiling.stage("draw_graph"), open(path, 'wb') as file:
+            file.write(render.render_graph(subject, scores, dates))
+        graphs[subject] = path
+    return graphs
+
+def saveDashboard(path, subjectNames, allMarks, period='day'):
+    # Все предметы плитками в одной картинке, без matplotlib: .svg - строка SVG, иначе PNG через Pillow
+    import sparkline
+    fmt = 'svg' if path.lower().endswith('.svg') else 'png'
+    with profiling.stage("dashboard"):
+        image = sparkline.dashboard(allMarks, subjectNames, fmt=fmt, freq=period)
+    with open(path, 'w', encoding='utf-8') if fmt == 'svg' else open(path, 'wb') as file:
+        file.write(image)
+    return path
+
+def periodResults(allMarks, subjectNames, start, end):
+    # Средний балл за произвольный период по индексу дат: два двоичных поиска на предмет
+    from date_index import DateIndex
+    index = DateIndex.from_marks(allMarks)
+    results = []
+    for name in subjectNames:
+        result = index.query(name, start, end)
+        results.append(a.SubjectResult(name=name, count=result.count, mean=result.mean, grade=result.grade, missing=0))
+    return results, index.query(None, start, end).mean
+
+def streamReport(filePath, engine='xml'):
+    # Только средние баллы: один потоковый проход по листу без таблицы отметок, поэтому NumPy не нужен.
+    # Вместо отчёта None, если у отметки нет комментария (как "" у parse_workbook)
+    info, subjects = {}, {}
+    try:
+        with closing(d.open_workbook(filePath, engine)) as workbook, profiling.stage("statistics"):
+            means, = streaming.consume(d.stream_marks(workbook.active, info, subjects, strict=True), streaming.Means())
+    except d.MissingCommentError:
+        return info, subjects, None
+    return info, subjects, streaming.build_report(info, subjects, means)
+
+def reportToDict(filePath, report, subjectNames, graphs, targets=None):
+    data = {
+        'file': filePath,
+        'info': {key: str(value) if value is not None else None for key, value in report.info.items()},
+        'subjects': [asdict(report.subject(name)) for name in subjectNames],
+        'total_score': report.total_score,
+        'histogram': list(report.histogram),
+        'min_marks': report.min_marks,
+        'incomplete': report.incomplete,
+        'graphs': graphs,
+    }
+    if targets is not None:
+        import target as t
+        data['targets'] = [t.target_to_dict(result) for result in targets]
+    return data
+
+def analyzeFile(args):
+    """
+    Неинтерактивный запуск: файл, предметы и формат вывода берутся из аргументов
+
+    Возвращает:
+        Код завершения: 0 - успешно, 1 - в файле нет комментариев к отметкам, файл не найден или не читается,
+        2 - указан несуществующий предмет
+    """
+    def fail(error):
+        print(json.dumps({'file': filePath, 'error': error}, ensure_ascii=False) if args.format == 'json'
+              else f'\033[1;91m{error}\033[0m')
+        return 1
+
+    filePath = args.file
+    diagnostics = Diagnostics() if args.tolerant else None
+    # Если нужны только средние баллы, таблица отметок не строится и кэш не читается:
+    # потоковый проход по одной выгрузке быстрее, чем импорт NumPy ради таблицы из кэша
+    streamed = not (args.tolerant or args.archive or args.target or args.start or args.end or args.dashboard
+                    or args.subject and not args.no_graph)
+    report = None
+    try:
+        filePath = resolvePath(args.file)
+        if filePath.endswith(d.ARCHIVE_SUFFIX):
+            info, subjects, allMarks = d.load_archive(filePath)
+        elif streamed:
+            info, subjects, report = streamReport(filePath, args.engine)
+            allMarks = "" if report is None else None
+        else:
+            info, subjects, allMarks = d.parse_workbook(filePath, args.engine, cache=None if args.no_cache else d.WorkbookCache(),
+                                                        diagnostics=diagnostics)
+    except FileNotFoundError as e:
+        return fail(str(e))
+    except Exception as e:
+        # Повреждённый или не .xlsx файл: ошибка zipfile, XML или архива
+        return fail(f"Ошибка при чтении файла: {e}")
+    if allMarks == "":
+        return fail("В файле отсутствуют комментарии к отметкам (ключ --tolerant разберёт остальные отметки)")
+    if diagnostics is not None and not diagnostics.complete and not subjects:
+        return fail(diagnostics.problems[-1].detail)
+    if args.archive:
+        d.save_archive(args.archive, info, subjects, allMarks)
+    subjectNames = args.subject or list(subjects.values())
+    unknown = [name for name in subjectNames if name not in subjects.values()]
+    if unknown:
+        print(f'{'\033[31m'}Указан несуществующий предмет: {", ".join(unknown)}{'\033[0m'}', file=sys.stderr)
+        return 2
+    if report is None:
+        with profiling.stage("statistics"):
+            report = a.analyze_marks(info, allMarks)
+    # Графики рисуются только для явно указанных предметов
+    graphs = {} if args.no_graph or not args.subject else saveGraphs(subjectNames, allMarks, d.folder_root, args.period)
+    if args.dashboard:
+        saveDashboard(args.dashboard, subjectNames, allMarks, args.period)
+    targets = None
+    if args.target:
+        import target as t
+        with profiling.stage("target"):
+            targets = t.solve(allMarks, str(info.get('Период') or ''), args.target, subjectNames)
+    period = None
+    if args.start or args.end:
+        with profiling.stage("period"):
+            period = periodResults(allMarks, subjectNames, args.start, args.end)
+    if args.format == 'json':
+        data = reportToDict(filePath, report, subjectNames, graphs, targets)
+        if args.dashboard:
+            data['dashboard'] = args.dashboard
+        if diagnostics is not None:
+            data['diagnostics'] = diagnostics.to_dict()
+        if period is not None:
+            data['range'] = {'from': args.start, 'to': args.end, 'subjects': [asdict(result) for result in period[0]],
+                             'total_score': period[1]}
+        print(json.dumps(data, ensure_ascii=False))
+    else:
+        import visualization as v
+        print(v.formatReport(report) if not args.subject else '\n'.join(v.formatSubject(report.subject(name)) for name in subjectNames))
+        if diagnostics is not None and not diagnostics.ok:
+            print(f'{'\033[33m'}{diagnostics.format()}{'\033[0m'}')
+        for subject, path in graphs.items():
+            print(f'График "{subject}": {path}' if path else f'{'\033[31m'}Слишком мало оценок для отрисовки графика "{subject}"{'\033[0m'}')
+        if args.dashboard:
+            print(f'Сводка графиков: {args.dashboard}')
+        if period is not None:
+            print(f'\nСредний балл с {args.start or "начала"} по {args.end or "последнюю дату"}:')
+            print('\n'.join(v.formatSubject(result) for result in period[0]))
+            print(f'Общий средний балл - {period[1]}')
+        if targets is not None:
+            import target as t
+            print(f'\nЧто нужно для оценки {args.target}:')
+            print('\n'.join(t.format_target(result) for result in targets))
+    return 0
+
+def parseDate(value):
+    # Проверяем дату сразу при разборе аргументов, в отчёт идёт строка как есть
+    date_to_ordinal(value)
+    return value
+
+def parseArgs(argv=None):
+    parser = argparse.ArgumentParser(description="Анализ выгрузки электронного дневника. "
+                                                 "Без имени файла программа задаёт вопросы через консоль")
+    parser.add_argument("file", nargs="?", default=None,
+                        help="имя файла в папке data или путь к нему (.xlsx или архив .marks)")
+    parser.add_argument("-s", "--subject", action="append", default=None, metavar="ПРЕДМЕТ",
+                        help="вывести только этот предмет и нарисовать его график (можно указать несколько раз)")
+    parser.add_argument("--format", choices=("text", "json"), default="text", help="формат вывода (default: text)")
+    parser.add_argument("--no-graph", action="store_true", help="не рисовать графики указанных предметов")
+    parser.add_argument("--from", dest="start", type=parseDate, default=None, metavar="ДД.ММ.ГГГГ",
+                        help="дополнительно посчитать средний балл за период, начиная с этой даты")
+    parser.add_argument("--to", dest="end", type=parseDate, default=None, metavar="ДД.ММ.ГГГГ",
+                        help="дополнительно посчитать средний балл за период, заканчивая этой датой")
+    parser.add_argument("--target", type=int, choices=range(2, 6), default=None, metavar="ОЦЕНКА",
+                        help="посчитать, сколько и каких отметок нужно для этой оценки (2-5) по каждому предмету")
+    parser.add_argument("--period", choices=PERIODS, default="day",
+                        help="за какой период усреднять точки графика: день, неделя, месяц, квартал (default: day)")
+    parser.add_argument("--tolerant", action="store_true",
+                        help="не останавливаться на ячейках без комментария и других ошибках, а вывести их список и качество разбора")
+    parser.add_argument("--dashboard", default=None, metavar="ФАЙЛ",
+                        help="сохранить маленькие графики всех выбранных предметов в одну картинку (.png или .svg)")
+    parser.add_argument("--engine", choices=("xml", "openpyxl"), default="xml",
+                        help="способ чтения книги при запуске с файлом (default: xml, без импорта openpyxl)")
+    parser.add_argument("--archive", default=None, metavar="ФАЙЛ",
+                        help="сохранить разобранные отметки в архив .marks, который потом открывается вместо .xlsx")
+    parser.add_argument("--no-cache", action="store_true", help="разобрать файл заново, не обращаясь к кэшу")
+    parser.add_argument("--profile", nargs="?", const="1", default=None, metavar="ФАЙЛ",
+                        help="замерить этапы и вывести отчёт в JSON (в stderr или дописать строкой в файл)")
+    parser.add_argument("--cprofile", default=None, metavar="ФАЙЛ", help="вместе с --profile сохранить дамп cProfile")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parseArgs(argv)
+    if args.profile:
+        profiling.enable(cprofile_path=args.cprofile)
+    else:
+        profiling.enable_from_env()
+    try:
+        return analyzeFile(args) if args.file else run()
+    finally:
+        if profiling.enabled():
+            profiling.emit(args.profile)
+
+def run():
     print(f">_\nДля того, чтобы прога работала, нужно создать папку data в корне проекта, затем закинуть туда файл с оценками с расширением .xlsx и перезапустить программу\n"
         "Эта прога создана для тестинга на работоспособность, поэтому скоро будет готова telegram bot версия")
     fileName = input("Введите имя файла (например, example.xlsx): ").strip()
@@ -75,13 +273,18 @@ def main():
         print(f'{'\033[31m'}Файл нечитаем, должно быть расширение{'\033[1;91m'} .xlsx{'\033[0m'}')
         return
     try:
-        worksheet = getWorksheet(fileName)
-        subjects = d.extract_subjects(worksheet)
-        allMarks = d.extract_marks(worksheet, subjects)
+        info, subjects, allMarks = loadWorkbook(fileName)
+    except FileNotFoundError as e:
+        print(f'{'\033[31m'}{e}{'\033[0m'}')
+        return
+    except Exception as e:
+        print(f'{'\033[31m'}Ошибка при чтении файла: {e}{'\033[0m'}')
+        return
+    try:
         if allMarks == "":
             print("\033[1;91mВ вашем файле отсутствуют комментарии к отметкам, их наличие критически важно\033[0m")
             return
-        printInfo(worksheet, subjects, allMarks)
+        printInfo(info, subjects, allMarks)
         subForGraph = input('\nГрафик изменения среднего балла какого предмета нарисовать (если не надо рисовать, то нажмите enter) ')
         drawGraph(subForGraph, subjects, allMarks)
     except TypeError:
@@ -89,4 +292,4 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    raise SystemExit(main())
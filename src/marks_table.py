@@ -0,0 +1,152 @@
+"""
+Колоночное хранение отметок на массивах NumPy.
+
+Вместо словаря на каждую отметку (`extract_marks`) все отметки лежат в пяти
+плотных массивах: номер предмета, дата (порядковый номер дня), отметка, номер
+типа работы и коэффициент. Отметки одного предмета идут подряд, поэтому
+выборка по предмету - это срез-представление (view) без копирования.
+"""
+from array import array
+from collections import namedtuple
+
+# NumPy и datetime импортируются там, где нужны: модуль подгружается и при запуске
+# `main` только ради средних баллов, когда таблица не строится
+
+# Срез отметок одного предмета, все поля - представления массивов таблицы
+SubjectView = namedtuple("SubjectView", ["dates", "marks", "work_types", "coeffs"])
+
+
+def date_to_ordinal(value) -> int:
+    '''Переводит дату ("dd.mm.yyyy", `date` или `datetime`) в порядковый номер дня'''
+    from datetime import date as Date
+    if isinstance(value, Date):
+        return value.toordinal()
+    # Разбор вручную: strptime медленнее и при первом вызове подгружает _strptime с locale и calendar
+    day, month, year = value.split(".")
+    return Date(int(year), int(month), int(day)).toordinal()
+
+
+class MarksTable:
+    """
+    Таблица отметок всех предметов ученика.
+
+    Атрибуты:
+        `subjects`: Список названий предметов, индекс в нём - номер предмета
+        `work_types`: Список типов работ, индекс в нём - номер типа работы
+        `subject_id`, `date`, `mark`, `work_type_id`, `coeff`: Колонки таблицы
+        `offsets`: Границы предметов: отметки предмета `i` лежат в `[offsets[i], offsets[i+1])`
+    """
+    __slots__ = ("subjects", "work_types", "subject_id", "date", "mark", "work_type_id", "coeff",
+                 "offsets", "_index", "_date_labels")
+
+    def __init__(self, subjects, work_types, subject_id, date, mark, work_type_id, coeff, date_labels=None):
+        import numpy as np
+        self.subjects = list(subjects)
+        self.work_types = list(work_types)
+        self.subject_id = subject_id
+        self.date = date
+        self.mark = mark
+        self.work_type_id = work_type_id
+        self.coeff = coeff
+        self.offsets = np.searchsorted(subject_id, np.arange(len(self.subjects) + 1)).astype(np.int64)
+        self._index = {name: idx for idx, name in enumerate(self.subjects)}
+        self._date_labels = date_labels or {}
+
+    @classmethod
+    def build(cls, subjects: list, records) -> "MarksTable":
+        """
+        Собирает таблицу из потока отметок
+
+        Аргументы:
+            `subjects`: Список названий предметов
+            `records`: Итерируемый объект пар `(subj_id, (date, mark, work_type, coeff))`,
+                где `subj_id` - номер предмета начиная от 1 (как в `extract_subjects`)
+
+        Важно:
+            Порядок отметок внутри предмета сохраняется
+        """
+        import numpy as np
+        subject_id, dates, marks, work_ids, coeff = array("h"), array("i"), array("b"), array("h"), array("d")
+        work_types, work_index, ordinals, labels = [], {}, {}, {}
+        for subj_id, (date, mark, work_type, weight) in records:
+            ordinal = ordinals.get(date)
+            if ordinal is None:
+                ordinal = ordinals[date] = date_to_ordinal(date)
+                labels.setdefault(ordinal, date)
+            work_id = work_index.get(work_type)
+            if work_id is None:
+                work_id = work_index[work_type] = len(work_types)
+                work_types.append(work_type)
+            subject_id.append(subj_id - 1)
+            dates.append(ordinal)
+            marks.append(int(mark))
+            work_ids.append(work_id)
+            coeff.append(weight)
+
+        columns = [np.frombuffer(col, dtype=col.typecode) if len(col) else np.empty(0, col.typecode)
+                   for col in (subject_id, dates, marks, work_ids, coeff)]
+        # Группируем по предметам, сохраняя порядок отметок внутри предмета
+        order = np.argsort(columns[0], kind="stable")
+        columns = [np.ascontiguousarray(col[order]) for col in columns]
+        return cls(subjects, work_types, *columns, date_labels=labels)
+
+    @classmethod
+    def from_marks(cls, marks: dict) -> "MarksTable":
+        '''Строит таблицу из словаря, который возвращает `extract_marks`'''
+        def records():
+            for subj_id, subject in enumerate(marks, start=1):
+                for info in marks[subject]:
+                    yield subj_id, (info["Дата"], info["Отметка"], info["Тип работы"], info["Коэффициент"])
+        return cls.build(list(marks), records())
+
+    def __len__(self) -> int:
+        return len(self.mark)
+
+    def __contains__(self, subject: str) -> bool:
+        return subject in self._index
+
+    @property
+    def nbytes(self) -> int:
+        '''Объём памяти, занимаемый колонками'''
+        return sum(col.nbytes for col in (self.subject_id, self.date, self.mark, self.work_type_id, self.coeff))
+
+    def bounds(self, subject: str) -> tuple[int, int]:
+        '''Границы отметок предмета в колонках таблицы'''
+        idx = self._index[subject]
+        return int(self.offsets[idx]), int(self.offsets[idx + 1])
+
+    def view(self, subject: str) -> SubjectView:
+        """
+        Отметки одного предмета без копирования
+
+        Возвращает:
+            `SubjectView` из представлений колонок: даты (порядковые номера), отметки, номера типов работ, коэффициенты
+        """
+        start, stop = self.bounds(subject)
+        return SubjectView(self.date[start:stop], self.mark[start:stop],
+                           self.work_type_id[start:stop], self.coeff[start:stop])
+
+    def date_label(self, ordinal: int):
+        '''Возвращает дату в том виде, в котором она была в исходном листе'''
+        label = self._date_labels.get(ordinal)
+        if label is not None:
+            return label
+        from datetime import date as Date
+        return Date.fromordinal(ordinal).strftime("%d.%m.%Y")
+
+    def refactor(self, subject: str) -> tuple[list, list, list]:
+        '''Аналог `refactor_marks` для таблицы: списки дат, отметок и коэффициентов предмета'''
+        view = self.view(subject)
+        return [self.date_label(o) for o in view.dates.tolist()], view.marks.tolist(), view.coeffs.tolist()
+
+    def to_marks(self) -> dict:
+        '''Переводит таблицу обратно в словарь вида, который возвращает `extract_marks`'''
+        marks = {}
+        for subject in self.subjects:
+            view = self.view(subject)
+            marks[subject] = [
+                {"Дата": self.date_label(d), "Отметка": m, "Тип работы": self.work_types[w], "Коэффициент": c}
+                for d, m, w, c in zip(view.dates.tolist(), view.marks.tolist(),
+                                      view.work_types.tolist(), view.coeffs.tolist())
+            ]
+        return marks
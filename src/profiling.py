@@ -0,0 +1,199 @@
+"""
+Встроенное профилирование по этапам обработки.
+
+По умолчанию выключено и стоит одну проверку флага на вызов. После `enable()`
+(ключ `--profile` в `main.py` или переменная окружения `SCORE_ANALYZER_PROFILE`)
+для каждого этапа копятся количество вызовов, суммарное и максимальное время
+и пик памяти по tracemalloc, а также счётчики: ячейки, отметки, предметы,
+попадания в кэш. `report()` возвращает всё это словарём, `emit()` пишет одну
+строку JSON - её удобно собирать из логов и строить графики.
+
+Переменные окружения:
+    SCORE_ANALYZER_PROFILE=1            - вывести отчёт в stderr
+    SCORE_ANALYZER_PROFILE=путь.jsonl   - дописать отчёт строкой в файл
+    SCORE_ANALYZER_CPROFILE=путь.prof   - дополнительно сохранить дамп cProfile
+"""
+import functools, json, os, sys, threading, time, tracemalloc
+from contextlib import contextmanager
+
+ENV_PROFILE = "SCORE_ANALYZER_PROFILE"
+ENV_CPROFILE = "SCORE_ANALYZER_CPROFILE"
+
+_lock = threading.Lock()
+_local = threading.local()
+_enabled = False
+_started = None
+_stages = {}
+_counters = {}
+_cprofile = None
+_cprofile_path = None
+_own_tracemalloc = False
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable(memory: bool = True, cprofile_path: str = None):
+    """
+    Включает профилирование и сбрасывает накопленные данные
+
+    Аргументы:
+        `memory`: Считать пики памяти через tracemalloc (замедляет работу в разы) (default: True)
+        `cprofile_path`: Куда сохранить дамп cProfile при `emit()`; если не задан, cProfile не запускается
+    """
+    global _enabled, _started, _cprofile, _cprofile_path, _own_tracemalloc
+    reset()
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _own_tracemalloc = True
+    if cprofile_path:
+        # cProfile и platform нужны только при включённом профилировании, запуск без него их не импортирует
+        import cProfile
+        _cprofile, _cprofile_path = cProfile.Profile(), cprofile_path
+        _cprofile.enable()
+    _started = time.perf_counter()
+    _enabled = True
+
+
+def disable():
+    '''Выключает профилирование; накопленные данные остаются доступны в `report()`'''
+    global _enabled, _cprofile, _own_tracemalloc
+    _enabled = False
+    if _cprofile is not None:
+        _cprofile.disable()
+        if _cprofile_path:
+            _cprofile.dump_stats(_cprofile_path)
+        _cprofile = None
+    if _own_tracemalloc:
+        tracemalloc.stop()
+        _own_tracemalloc = False
+
+
+def enable_from_env(environ=os.environ) -> bool:
+    '''Включает профилирование, если задана `SCORE_ANALYZER_PROFILE`'''
+    if environ.get(ENV_PROFILE) and not _enabled:
+        enable(cprofile_path=environ.get(ENV_CPROFILE))
+    return _enabled
+
+
+def reset():
+    global _started
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+    _started = time.perf_counter()
+
+
+def count(name: str, value: int = 1):
+    '''Прибавляет `value` к счётчику `name`'''
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+@contextmanager
+def _measure(name: str):
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        # Пик внешнего этапа до начала вложенного сохраняется, затем пик сбрасывается
+        if stack:
+            stack[-1][1] = max(stack[-1][1], tracemalloc.get_traced_memory()[1])
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+    else:
+        base = 0
+    frame = [name, 0]
+    stack.append(frame)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        stack.pop()
+        peak = max(frame[1], tracemalloc.get_traced_memory()[1]) if tracing else 0
+        if stack:
+            stack[-1][1] = max(stack[-1][1], peak)
+        with _lock:
+            entry = _stages.get(name)
+            if entry is None:
+                entry = _stages[name] = {"calls": 0, "total_ms": 0.0, "max_ms": 0.0, "peak_kb": 0.0}
+            entry["calls"] += 1
+            entry["total_ms"] += elapsed * 1e3
+            entry["max_ms"] = max(entry["max_ms"], elapsed * 1e3)
+            entry["peak_kb"] = max(entry["peak_kb"], (peak - base) / 1024)
+
+
+@contextmanager
+def _noop():
+    yield
+
+
+def stage(name: str):
+    """
+    Контекстный менеджер этапа:
+        with profiling.stage("load_workbook"):
+            ...
+
+    Важно:
+        Пик памяти этапа считается относительно памяти на его начало и включает вложенные этапы
+    """
+    return _measure(name) if _enabled else _noop()
+
+
+def timed(name: str):
+    '''Декоратор: каждый вызов функции - этап `name`'''
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            with _measure(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def report() -> dict:
+    '''Накопленные данные: этапы, счётчики, общее время и окружение'''
+    import platform
+    with _lock:
+        stages = {name: {"calls": entry["calls"], "total_ms": round(entry["total_ms"], 3),
+                         "max_ms": round(entry["max_ms"], 3), "peak_kb": round(entry["peak_kb"], 1)}
+                  for name, entry in _stages.items()}
+        counters = dict(_counters)
+    return {
+        "event": "profile",
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "elapsed_ms": round((time.perf_counter() - _started) * 1e3, 3) if _started else None,
+        "python": platform.python_version(),
+        "pid": os.getpid(),
+        "stages": stages,
+        "counters": counters,
+    }
+
+
+def emit(destination: str = None) -> dict:
+    """
+    Выключает профилирование и выводит отчёт одной строкой JSON
+
+    Аргументы:
+        `destination`: Файл, в который дописывается строка; None или "1" - stderr (default: значение `SCORE_ANALYZER_PROFILE`)
+
+    Возвращает:
+        Отчёт `report()`
+    """
+    disable()
+    data = report()
+    destination = destination if destination is not None else os.environ.get(ENV_PROFILE)
+    line = json.dumps(data, ensure_ascii=False)
+    if destination and destination not in ("1", "true", "yes", "-"):
+        with open(destination, "a", encoding="utf-8") as file:
+            file.write(line + "\n")
+    else:
+        print(line, file=sys.stderr)
+    return data
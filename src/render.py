@@ -0,0 +1,131 @@
+"""
+Отрисовка графиков без окна и без глобального состояния pyplot.
+
+Графики рисуются через объектный API (`Figure` + холст Agg) и сохраняются в
+буфер в памяти, результат - байты PNG или SVG. Фигуры-шаблоны (оси, сетка,
+пороговые линии 1.5/2.5/3.5/4.5, линия графика) создаются один раз для каждого
+размера и переиспользуются: при отрисовке меняются только данные и подписи.
+Шаблоны свои у каждого потока, поэтому рендер можно вызывать из нескольких
+потоков, а `render_subjects` раскладывает предметы по процессам пула.
+
+Внешний вид повторяет `visualization.drawGraph`.
+"""
+import io, threading
+from concurrent.futures import ProcessPoolExecutor
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+import resample
+
+THRESHOLDS = [1.5, 2.5, 3.5, 4.5]
+THRESHOLD_COLORS = ['black', 'red', 'orange', 'green']
+
+_local = threading.local()
+
+
+def figure_size(number_of_dates: int) -> tuple[float, float]:
+    '''Размер фигуры в дюймах в зависимости от количества дат (как в `drawGraph`)'''
+    if number_of_dates <= 10:
+        return (6.4, 4.8)
+    elif number_of_dates <= 15:
+        return (9.6, 5.4)
+    elif number_of_dates <= 30:
+        return (10.66, 6.0)
+    elif number_of_dates < 40:
+        return (12.8, 7.2)
+    return (16, 9)
+
+
+class _Template:
+    '''Заранее подготовленная фигура: оси, сетка, пороговые линии и пустая линия графика'''
+    def __init__(self, size: tuple[float, float]):
+        self.figure = Figure(figsize=size)
+        FigureCanvasAgg(self.figure)
+        self.axes = self.figure.add_subplot()
+        # Поля заданы заранее: `bbox_inches='tight'` требует лишней отрисовки и почти вдвое замедляет сохранение
+        self.figure.subplots_adjust(left=0.08, right=0.97, top=0.88, bottom=0.16)
+        self.axes.grid()
+        self.thresholds = [self.axes.axhline(y=y, color=color, linestyle='--')
+                           for y, color in zip(THRESHOLDS, THRESHOLD_COLORS)]
+        self.line, = self.axes.plot([], [], 'r-o')
+
+
+def _template(size: tuple[float, float]) -> _Template:
+    templates = getattr(_local, "templates", None)
+    if templates is None:
+        templates = _local.templates = {}
+    if size not in templates:
+        templates[size] = _Template(size)
+    return templates[size]
+
+
+def render_graph(subject: str, scores: list, dates: list, fmt: str = "png", dpi: int = 100) -> bytes:
+    """
+    Рисует график изменения среднего балла в память
+
+    Аргументы:
+        `subject`: Название предмета
+        `scores`: Средний балл на каждую дату
+        `dates`: Даты ("dd.mm.yyyy", `date` или порядковые номера дней) либо готовые подписи периодов
+        `fmt`: Формат результата: "png" или "svg" (default: "png")
+        `dpi`: Разрешение для PNG (default: 100)
+
+    Возвращает:
+        Содержимое файла изображения
+    """
+    labels = [resample.short_date(date) for date in dates]
+    template = _template(figure_size(len(labels)))
+    axes = template.axes
+
+    axes.set_title(f'График изменения среднего балла по предмету\n{subject}')
+    min_lim = (min(scores) - 0.5 if min(scores) - 0.5 >= 1 else 1) - 0.07
+    max_lim = (max(scores) + 0.5 if max(scores) + 0.5 <= 5 else 5) + 0.07
+    axes.set_ylim(min_lim, max_lim)
+    for y, line in zip(THRESHOLDS, template.thresholds):
+        line.set_visible(min_lim <= y <= max_lim)
+
+    positions = range(len(labels))
+    template.line.set_data(positions, scores)
+    axes.set_xticks(positions, labels, rotation=-70, fontsize=8 if len(labels) > 20 else 10)
+    axes.set_xlim(-0.5, len(labels) - 0.5)
+
+    buffer = io.BytesIO()
+    template.figure.savefig(buffer, format=fmt, dpi=dpi)
+    return buffer.getvalue()
+
+
+def _render_job(args) -> bytes:
+    return render_graph(*args)
+
+
+def render_subjects(allMarks, subjects=None, fmt: str = "png", workers: int = 1, executor=None, freq: str = "day") -> dict:
+    """
+    Рисует графики сразу для нескольких предметов
+
+    Аргументы:
+        `allMarks`: Словарь из `extract_marks` или `MarksTable`
+        `subjects`: Список предметов (default: все предметы, у которых хотя бы две даты с отметками)
+        `fmt`: Формат результата: "png" или "svg" (default: "png")
+        `workers`: Количество процессов; при 1 рисуется в текущем процессе (default: 1)
+        `executor`: Готовый пул процессов, чтобы не запускать новый на каждый вызов
+        `freq`: Период точек графика: "day", "week", "month" или "quarter" (default: "day")
+
+    Возвращает:
+        Словарь `{subject: bytes}`
+    """
+    if subjects is None:
+        subjects = allMarks.subjects if hasattr(allMarks, "subjects") else list(allMarks)
+    jobs = []
+    for subject in subjects:
+        scores, dates = resample.graph_series(allMarks, subject, freq)
+        if len(scores) > 1:
+            jobs.append((subject, scores, dates, fmt))
+    if executor is not None:
+        images = list(executor.map(_render_job, jobs))
+    elif workers == 1 or len(jobs) <= 1:
+        images = [_render_job(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            images = list(pool.map(_render_job, jobs))
+    return {job[0]: image for job, image in zip(jobs, images)}
@@ -0,0 +1,233 @@
+"""
+Группировка отметок по периодам: день, неделя, месяц, квартал.
+
+Даты переводятся в порядковые номера дней (`date.toordinal()`, как в колонке
+`MarksTable.date`) один раз - при разборе листа, дальше это просто целые числа.
+Ключ периода считается по номеру дня: неделя - целочисленным делением (неделя
+начинается с понедельника), месяц и квартал - через `datetime64`. Отметки
+сортируются по ключу (если они ещё не отсортированы), границы групп - места,
+где ключ меняется (`np.flatnonzero(np.diff(keys))`), суммы по группам - одним
+`np.add.reduceat`. Словарей и циклов по отметкам нет.
+"""
+from collections import namedtuple
+from datetime import date as Date
+
+import numpy as np
+
+from marks_table import MarksTable, date_to_ordinal
+from stats import running_means
+
+FREQUENCIES = ("day", "week", "month", "quarter")
+
+# Порядковый номер 1970-01-01 - начала отсчёта datetime64
+_EPOCH = Date(1970, 1, 1).toordinal()
+
+_QUARTERS = ("I", "II", "III", "IV")
+
+# Ряд по периодам, все поля - массивы одной длины в порядке возрастания дат
+Series = namedtuple("Series", [
+    "starts",  # порядковый номер первого дня периода
+    "values",  # значение за период
+    "counts",  # количество отметок в периоде
+])
+
+
+def to_ordinals(dates) -> np.ndarray:
+    """
+    Переводит даты в массив порядковых номеров дней
+
+    Аргументы:
+        `dates`: Даты ("dd.mm.yyyy", `date`) или уже готовые порядковые номера
+
+    Важно:
+        Каждая различная дата разбирается один раз
+    """
+    if isinstance(dates, np.ndarray) and dates.dtype.kind in "iu":
+        return dates.astype(np.int64, copy=False)
+    parsed = {}
+    ordinals = []
+    for date in dates:
+        ordinal = parsed.get(date)
+        if ordinal is None:
+            ordinal = parsed[date] = date if isinstance(date, int) else date_to_ordinal(date)
+        ordinals.append(ordinal)
+    return np.asarray(ordinals, dtype=np.int64)
+
+
+def _months(ordinals: np.ndarray) -> np.ndarray:
+    '''Номер месяца от января 1970 для каждого дня'''
+    days = (ordinals - _EPOCH).astype("datetime64[D]")
+    return days.astype("datetime64[M]").astype(np.int64)
+
+
+def _month_starts(months: np.ndarray) -> np.ndarray:
+    '''Порядковый номер первого дня каждого месяца'''
+    return months.astype("datetime64[M]").astype("datetime64[D]").astype(np.int64) + _EPOCH
+
+
+def period_keys(ordinals, freq: str = "day") -> np.ndarray:
+    """
+    Ключ периода для каждой даты: у дат одного периода ключ одинаковый, ключи растут вместе с датами
+
+    Аргументы:
+        `ordinals`: Порядковые номера дней
+        `freq`: Период: "day", "week", "month" или "quarter" (default: "day")
+    """
+    ordinals = np.asarray(ordinals, dtype=np.int64)
+    if freq == "day":
+        return ordinals
+    if freq == "week":
+        # Первый день отсчёта (01.01.0001) - понедельник
+        return (ordinals - 1) // 7
+    if freq == "month":
+        return _months(ordinals)
+    if freq == "quarter":
+        return _months(ordinals) // 3
+    raise ValueError(f"Неизвестный период {freq!r}, ожидается один из {FREQUENCIES}")
+
+
+def period_starts(keys: np.ndarray, freq: str = "day") -> np.ndarray:
+    '''Порядковый номер первого дня периода по его ключу (обратное к `period_keys`)'''
+    keys = np.asarray(keys, dtype=np.int64)
+    if freq == "day":
+        return keys
+    if freq == "week":
+        return keys * 7 + 1
+    if freq == "month":
+        return _month_starts(keys)
+    if freq == "quarter":
+        return _month_starts(keys * 3)
+    raise ValueError(f"Неизвестный период {freq!r}, ожидается один из {FREQUENCIES}")
+
+
+def _group(keys: np.ndarray):
+    """
+    Сортирует ключи и находит границы групп
+
+    Возвращает:
+        Кортеж `(order, keys, starts)`: порядок сортировки (None, если ключи уже не убывают),
+        отсортированные ключи и индексы начала каждой группы в них
+    """
+    order = None
+    if len(keys) > 1 and (keys[1:] < keys[:-1]).any():
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+    starts = np.flatnonzero(np.diff(keys)) + 1
+    starts = np.concatenate(([0], starts)) if len(keys) else starts
+    return order, keys, starts
+
+
+def resample(ordinals, values, freq: str = "day", weights=None) -> Series:
+    """
+    Среднее значений внутри каждого периода
+
+    Аргументы:
+        `ordinals`: Порядковые номера дней
+        `values`: Значения (например, отметки или ряд среднего балла)
+        `freq`: Период: "day", "week", "month" или "quarter" (default: "day")
+        `weights`: Веса значений, например коэффициенты отметок (default: без весов)
+
+    Возвращает:
+        `Series` по периодам, в которых есть хотя бы одно значение
+    """
+    keys = period_keys(ordinals, freq)
+    values = np.asarray(values, dtype=np.float64)
+    order, keys, starts = _group(keys)
+    if order is not None:
+        values = values[order]
+    counts = np.diff(np.append(starts, len(keys)))
+    if not len(keys):
+        return Series(np.empty(0, np.int64), np.empty(0), counts)
+    if weights is None:
+        means = np.add.reduceat(values, starts) / counts
+    else:
+        weights = np.asarray(weights, dtype=np.float64)
+        if order is not None:
+            weights = weights[order]
+        means = np.add.reduceat(values * weights, starts) / np.add.reduceat(weights, starts)
+    return Series(period_starts(keys[starts], freq), means, counts)
+
+
+def running(ordinals, marks, coeffs, freq: str = "day") -> Series:
+    """
+    Накопленный средний балл на конец каждого периода
+
+    Возвращает:
+        `Series`, где значение - средний балл по всем отметкам до конца периода включительно,
+        округлённый до сотых (как последнее значение `extractScoreMass` в этом периоде)
+    """
+    keys = period_keys(ordinals, freq)
+    marks = np.asarray(marks, dtype=np.float64)
+    coeffs = np.asarray(coeffs, dtype=np.float64)
+    order, keys, starts = _group(keys)
+    if order is not None:
+        marks, coeffs = marks[order], coeffs[order]
+    ends = np.append(starts[1:], len(keys))
+    values = running_means(marks, coeffs)[ends - 1] if len(keys) else np.empty(0)
+    return Series(period_starts(keys[starts], freq), values, ends - starts)
+
+
+def subject_series(allMarks, subject: str, freq: str = "day") -> Series:
+    """
+    Ряд для графика предмета: среднее значений `extractScoreMass` внутри каждого периода
+
+    Аргументы:
+        `allMarks`: Словарь из `extract_marks` или `MarksTable`
+        `subject`: Название предмета
+        `freq`: Период: "day", "week", "month" или "quarter" (default: "day")
+
+    Важно:
+        При `freq="day"` это те же значения, что даёт `process_grades`, но по возрастанию дат
+    """
+    if isinstance(allMarks, MarksTable):
+        view = allMarks.view(subject)
+        ordinals, marks, coeffs = view.dates, view.marks, view.coeffs
+    else:
+        rows = allMarks[subject]
+        ordinals = to_ordinals([row['Дата'] for row in rows])
+        marks = [row['Отметка'] for row in rows]
+        coeffs = [row['Коэффициент'] for row in rows]
+    return resample(ordinals, running_means(marks, coeffs), freq)
+
+
+def graph_series(allMarks, subject: str, freq: str = "day") -> tuple[list, list]:
+    '''Средний балл предмета по периодам и подписи оси: то, что передаётся в `drawGraph` и `render_graph`'''
+    series = subject_series(allMarks, subject, freq)
+    return series.values.tolist(), labels(series.starts, freq)
+
+
+def short_date(value) -> str:
+    '''Подпись даты на оси: "dd.mm" из "dd.mm.yyyy", `date` или порядкового номера дня'''
+    if isinstance(value, str):
+        parts = value.split(".")
+        if len(parts) != 3:
+            # Уже готовая подпись периода из `labels`
+            return value
+        return f"{int(parts[0]):02}.{int(parts[1]):02}"
+    if isinstance(value, (int, np.integer)):
+        value = Date.fromordinal(int(value))
+    return f"{value.day:02}.{value.month:02}"
+
+
+def format_date(ordinal: int) -> str:
+    '''Дата в виде "dd.mm.yyyy", как в выгрузке'''
+    day = Date.fromordinal(int(ordinal))
+    return f"{day.day:02}.{day.month:02}.{day.year}"
+
+
+def labels(starts, freq: str = "day") -> list:
+    """
+    Подписи периодов для графика и отчёта
+
+    Возвращает:
+        Для дня и недели - "dd.mm" (у недели - её понедельник), для месяца - "mm.yyyy",
+        для квартала - "I кв. 2024"
+    """
+    days = [Date.fromordinal(ordinal) for ordinal in np.asarray(starts, dtype=np.int64).tolist()]
+    if freq in ("day", "week"):
+        return [f"{day.day:02}.{day.month:02}" for day in days]
+    if freq == "month":
+        return [f"{day.month:02}.{day.year}" for day in days]
+    if freq == "quarter":
+        return [f"{_QUARTERS[(day.month - 1) // 3]} кв. {day.year}" for day in days]
+    raise ValueError(f"Неизвестный период {freq!r}, ожидается один из {FREQUENCIES}")
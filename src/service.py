@@ -0,0 +1,314 @@
+"""
+Асинхронный сервис анализа выгрузок для бота.
+
+`AnalysisService` принимает содержимое .xlsx в `bytes` и отдаёт разбор, подсчёт
+и отрисовку в ограниченный пул процессов, чтобы тяжёлая работа не блокировала
+цикл событий. Одновременно в пуле выполняется не больше `workers` задач, ещё
+не больше `max_pending` ждут своей очереди, остальные сразу получают отказ
+(`ServiceBusy`). На каждый запрос действует таймаут.
+
+Для локальной проверки вместо бота есть небольшой HTTP-сервер:
+    python ./src/service.py --port 8080
+    POST /analyze   - тело запроса - файл .xlsx, ответ - отчёт в JSON
+                      (?target=5 - добавить, сколько и каких отметок нужно для оценки 5;
+                       ?tolerant=1 - не отклонять файл из-за ячеек без комментария, а добавить
+                       в отчёт список проблем и качество разбора;
+                       ?charts=png или ?charts=svg - добавить графики всех предметов)
+    GET  /metrics   - глубина очереди, задержки, счётчики
+    GET  /health
+"""
+import argparse, asyncio, base64, io, json, multiprocessing, time
+from collections import deque
+from contextlib import closing
+from urllib.parse import parse_qs
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict
+
+import data_processing as d
+import target as t
+from analysis import analyze_marks
+from diagnostics import Diagnostics
+
+MAX_BODY = 20 * 2**20
+
+
+class ServiceBusy(Exception):
+    '''Очередь заполнена, запрос нужно повторить позже'''
+
+
+def process_upload(data: bytes, engine: str = "xml", target: int = None, tolerant: bool = False,
+                   charts: str = None) -> dict:
+    """
+    Обрабатывает загруженный файл. Выполняется в процессе пула
+
+    Аргументы:
+        `data`: Содержимое файла .xlsx
+        `engine`: Способ чтения книги, как в `read_excel` (default: "xml")
+        `target`: Желаемая оценка; если задана, в отчёт добавляется `targets` (`target.solve`)
+        `tolerant`: Мягкий режим `scan_sheet`; в отчёт добавляется `diagnostics` (default: False)
+        `charts`: "png" или "svg" - в отчёт добавляются графики предметов `charts` (`render.render_subjects`):
+            `{предмет: строка SVG или PNG в base64}` (default: None - без графиков)
+
+    Возвращает:
+        Отчёт `analysis.Report` в виде словаря
+    """
+    diagnostics = Diagnostics(limit=100) if tolerant else None
+    with closing(d.open_workbook(io.BytesIO(data), engine)) as workbook:
+        info, subjects, marks = d.scan_sheet(workbook.active, diagnostics=diagnostics)
+    if marks == "":
+        raise ValueError("В файле отсутствуют комментарии к отметкам")
+    if diagnostics is not None and not diagnostics.complete and not subjects:
+        raise ValueError(diagnostics.problems[-1].detail)
+    report = asdict(analyze_marks(info, marks))
+    report["info"] = {key: str(value) if value is not None else None for key, value in report["info"].items()}
+    if target is not None:
+        report["targets"] = [t.target_to_dict(result) for result in t.solve(marks, str(info.get("Период") or ""), target)]
+    if diagnostics is not None:
+        report["diagnostics"] = diagnostics.to_dict()
+    if charts is not None:
+        # matplotlib импортируется только в процессе пула и только когда нужны графики
+        import render
+        images = render.render_subjects(marks, fmt=charts)
+        report["charts"] = {subject: image.decode("utf-8") if charts == "svg" else base64.b64encode(image).decode("ascii")
+                            for subject, image in images.items()}
+    return report
+
+
+class AnalysisService:
+    """
+    Асинхронный фронтенд над пулом процессов
+
+    Аргументы:
+        `workers`: Количество процессов пула (default: количество ядер)
+        `max_pending`: Сколько запросов может ждать свободного процесса (default: 32)
+        `timeout`: Таймаут на один запрос в секундах, включая ожидание в очереди (default: 30)
+        `job`: Функция обработки `job(data) -> dict` (default: `process_upload`)
+        `executor`: Готовый пул; если задан, сервис им не владеет и не закрывает его
+
+    Важно:
+        Задачу, уже запущенную в процессе, прервать нельзя: по таймауту клиент получает
+        ошибку сразу, но место в пуле остаётся занятым, пока задача не доработает.
+        Такие брошенные задачи видны в `metrics()` (`abandoned`, `abandoned_running`), и новые запросы
+        ждут в очереди (или получают `ServiceBusy`), а не копятся внутри пула
+    """
+    def __init__(self, workers: int = None, max_pending: int = 32, timeout: float = 30,
+                 job=process_upload, executor=None):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.job = job
+        self._executor = executor
+        self._own_executor = executor is None
+        self._slots = None
+        self.waiting = 0
+        self.running = 0
+        self.abandoned = 0
+        self.counters = {"accepted": 0, "completed": 0, "failed": 0, "rejected": 0, "timeouts": 0,
+                         "abandoned": 0}
+        self._latencies = deque(maxlen=1000)
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    def _new_executor(self):
+        # Процессы запускаются через spawn: при fork они унаследовали бы открытые сокеты клиентов,
+        # и закрытое сервером соединение оставалось бы открытым в дочернем процессе
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def start(self):
+        if self._executor is None:
+            self._executor = self._new_executor()
+        if self.workers is None:
+            self.workers = getattr(self._executor, "_max_workers", 1)
+        self._slots = asyncio.Semaphore(self.workers)
+
+    def close(self):
+        if self._own_executor and self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def submit(self, data: bytes, *args) -> dict:
+        """
+        Ставит файл в очередь и ждёт результат
+
+        Возвращает:
+            Результат `job(data, *args)`
+
+        Важно:
+            `ServiceBusy` - очередь заполнена; `asyncio.TimeoutError` - истёк таймаут;
+            исключения из `job` пробрасываются как есть
+        """
+        if self.waiting >= self.max_pending:
+            self.counters["rejected"] += 1
+            raise ServiceBusy(f"Очередь заполнена ({self.max_pending} запросов)")
+        self.counters["accepted"] += 1
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(self._run(data, *args), self.timeout)
+        except asyncio.TimeoutError:
+            self.counters["timeouts"] += 1
+            raise
+        except Exception:
+            self.counters["failed"] += 1
+            raise
+        self.counters["completed"] += 1
+        self._latencies.append(time.perf_counter() - started)
+        return result
+
+    async def _run(self, data: bytes, *args):
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        try:
+            future = asyncio.get_running_loop().run_in_executor(self._executor, self.job, data, *args)
+        except BaseException:
+            self._release()
+            raise
+        # Место в пуле освобождается, когда задача действительно завершилась, а не когда истёк таймаут
+        future.add_done_callback(lambda _: self._release())
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            self._abandon(future)
+            raise
+        except BrokenProcessPool:
+            # Упавший процесс ломает весь пул - пересоздаём его для следующих запросов
+            if self._own_executor:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._new_executor()
+            raise
+
+    def _release(self):
+        self.running -= 1
+        self._slots.release()
+
+    def _abandon(self, future):
+        '''Запрос отменён (таймаут), а задача ещё выполняется: считаем её до завершения'''
+        self.abandoned += 1
+        self.counters["abandoned"] += 1
+
+        def finished(future):
+            self.abandoned -= 1
+            # Ошибку брошенной задачи никто не ждёт: забираем её, чтобы asyncio не ругался
+            if not future.cancelled():
+                future.exception()
+
+        future.add_done_callback(finished)
+
+    def metrics(self) -> dict:
+        """
+        Глубина очереди, число выполняемых задач, счётчики и задержки (в секундах) последних запросов
+
+        Важно:
+            `running` включает брошенные по таймауту задачи, `abandoned_running` - сколько
+            из них ещё выполняется, `abandoned` - сколько задач было брошено всего
+        """
+        latencies = sorted(self._latencies)
+
+        def percentile(q):
+            return round(latencies[min(int(q * len(latencies)), len(latencies) - 1)], 4) if latencies else None
+
+        return {
+            "queue_depth": self.waiting,
+            "running": self.running,
+            "abandoned_running": self.abandoned,
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            **self.counters,
+            "latency": {"p50": percentile(0.5), "p95": percentile(0.95), "max": percentile(1.0)},
+        }
+
+
+async def _respond(writer, status: int, payload: dict):
+    reasons = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large",
+               422: "Unprocessable Entity", 503: "Service Unavailable", 504: "Gateway Timeout"}
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    writer.write(f"HTTP/1.1 {status} {reasons.get(status, '')}\r\n"
+                 f"Content-Type: application/json; charset=utf-8\r\n"
+                 f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body)
+    await writer.drain()
+
+
+async def handle_http(service: AnalysisService, reader, writer):
+    '''Обрабатывает одно HTTP-соединение: один запрос - один ответ'''
+    try:
+        request_line = (await reader.readline()).decode("latin-1").split()
+        headers = {}
+        while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+        if len(request_line) < 2:
+            return await _respond(writer, 400, {"error": "Некорректный запрос"})
+        method, (path, _, query) = request_line[0], request_line[1].partition("?")
+
+        if method == "GET" and path == "/health":
+            return await _respond(writer, 200, {"status": "ok"})
+        if method == "GET" and path == "/metrics":
+            return await _respond(writer, 200, service.metrics())
+        if method != "POST" or path != "/analyze":
+            return await _respond(writer, 404, {"error": "Неизвестный адрес"})
+
+        length = int(headers.get("content-length", 0))
+        if length > MAX_BODY:
+            return await _respond(writer, 413, {"error": "Слишком большой файл"})
+        params = parse_qs(query)
+        target = params.get("target")
+        if target and target[0] not in ("2", "3", "4", "5"):
+            return await _respond(writer, 400, {"error": "Оценка target должна быть от 2 до 5"})
+        tolerant = params.get("tolerant", ["0"])[0] in ("1", "true", "yes")
+        charts = params.get("charts", [None])[0]
+        if charts not in (None, "png", "svg"):
+            return await _respond(writer, 400, {"error": "Формат charts должен быть png или svg"})
+        data = await reader.readexactly(length)
+        try:
+            if target or tolerant or charts:
+                report = await service.submit(data, "xml", int(target[0]) if target else None, tolerant, charts)
+            else:
+                report = await service.submit(data)
+        except ServiceBusy as e:
+            return await _respond(writer, 503, {"error": str(e)})
+        except asyncio.TimeoutError:
+            return await _respond(writer, 504, {"error": "Истекло время обработки"})
+        except Exception as e:
+            return await _respond(writer, 422, {"error": f"{type(e).__name__}: {e}"})
+        await _respond(writer, 200, report)
+    except (ValueError, asyncio.IncompleteReadError):
+        await _respond(writer, 400, {"error": "Некорректный запрос"})
+    finally:
+        writer.close()
+
+
+async def serve(host: str = "127.0.0.1", port: int = 8080, **kwargs):
+    '''Запускает HTTP-сервер поверх `AnalysisService` и работает до отмены'''
+    async with AnalysisService(**kwargs) as service:
+        server = await asyncio.start_server(lambda r, w: handle_http(service, r, w), host, port)
+        print(f"Сервис запущен на http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP-сервис анализа выгрузок электронного дневника")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=None, help="количество процессов пула")
+    parser.add_argument("--max-pending", type=int, default=32, help="сколько запросов может ждать в очереди")
+    parser.add_argument("--timeout", type=float, default=30, help="таймаут на запрос в секундах")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, workers=args.workers,
+                          max_pending=args.max_pending, timeout=args.timeout))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+"""
+Маленькие графики среднего балла без matplotlib: для ответов бота и писем.
+
+Рисуется то же, что в `visualization.drawGraph` - ряд среднего балла (средние
+значения `extractScoreMass` по датам), пороговые линии 1.5/2.5/3.5/4.5 и
+подписи дат, - но сразу примитивами: в строку SVG или в картинку Pillow.
+matplotlib не импортируется, поэтому нет ни долгого импорта, ни расчёта
+разметки фигуры, а `dashboard` за один проход раскладывает все предметы
+плитками в одну картинку.
+
+Для кириллицы в PNG нужен шрифт TrueType: путь из переменной окружения
+`SCORE_ANALYZER_FONT`, системный DejaVu Sans или Arial либо DejaVu Sans из
+пакета matplotlib (сам matplotlib при этом не импортируется). Если шрифт не
+найден, используется встроенный шрифт Pillow.
+"""
+import io, os
+from functools import lru_cache
+from importlib.util import find_spec
+from xml.sax.saxutils import escape
+
+import resample
+
+THRESHOLDS = [1.5, 2.5, 3.5, 4.5]
+THRESHOLD_COLORS = ['black', 'red', 'orange', 'green']
+_RGB = {'black': (0, 0, 0), 'red': (214, 39, 40), 'orange': (255, 140, 0), 'green': (44, 160, 44),
+        'line': (230, 0, 0), 'grid': (225, 225, 225), 'text': (40, 40, 40), 'white': (255, 255, 255)}
+
+# Поля плитки в пикселях: слева подписи порогов, сверху название предмета, снизу даты
+_LEFT, _RIGHT, _TOP, _BOTTOM = 26, 10, 20, 18
+_FONT_SIZE = 11
+
+_FONT_CANDIDATES = (
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/TTF/DejaVuSans.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans.ttf",
+    "/Library/Fonts/Arial.ttf",
+    "C:/Windows/Fonts/arial.ttf",
+)
+
+
+def _font_path() -> str | None:
+    '''Шрифт с кириллицей: переменная окружения, системные шрифты, затем шрифт из пакета matplotlib'''
+    candidates = [os.environ.get("SCORE_ANALYZER_FONT"), *_FONT_CANDIDATES]
+    spec = find_spec("matplotlib")
+    if spec is not None and spec.origin:
+        candidates.append(os.path.join(os.path.dirname(spec.origin), "mpl-data", "fonts", "ttf", "DejaVuSans.ttf"))
+    return next((path for path in candidates if path and os.path.isfile(path)), None)
+
+
+@lru_cache(maxsize=None)
+def _font(size: int):
+    from PIL import ImageFont
+    path = _font_path()
+    return ImageFont.truetype(path, size) if path else ImageFont.load_default(size)
+
+
+def _limits(scores) -> tuple[float, float]:
+    '''Пределы оси Y, как в `drawGraph`'''
+    low = (min(scores) - 0.5 if min(scores) - 0.5 >= 1 else 1) - 0.07
+    high = (max(scores) + 0.5 if max(scores) + 0.5 <= 5 else 5) + 0.07
+    return low, high
+
+
+def _ticks(positions: list, spacing: float = 38) -> list:
+    '''Индексы точек с подписью даты: первая, последняя и между ними не чаще, чем через `spacing` пикселей'''
+    ticks = [0]
+    for i in range(1, len(positions)):
+        if positions[i] - positions[ticks[-1]] >= spacing:
+            ticks.append(i)
+    last = len(positions) - 1
+    if ticks[-1] != last:
+        if len(ticks) > 1 and positions[last] - positions[ticks[-1]] < spacing:
+            ticks.pop()
+        ticks.append(last)
+    return ticks
+
+
+def _tile(canvas, x0: float, y0: float, width: float, height: float, subject: str, scores: list, dates: list):
+    '''Рисует одну плитку: название, пороговые линии, ряд среднего балла и подписи дат'''
+    canvas.text(x0 + width / 2, y0 + 4, subject, anchor="top")
+    left, right = x0 + _LEFT, x0 + width - _RIGHT
+    top, bottom = y0 + _TOP, y0 + height - _BOTTOM
+    canvas.rect(left, top, right, bottom)
+    if len(scores) < 2:
+        canvas.text(x0 + width / 2, (top + bottom) / 2 - _FONT_SIZE / 2, "мало отметок", anchor="top")
+        return
+    low, high = _limits(scores)
+
+    def y_of(value):
+        return bottom - (value - low) / (high - low) * (bottom - top)
+
+    for value, color in zip(THRESHOLDS, THRESHOLD_COLORS):
+        if low <= value <= high:
+            y = y_of(value)
+            canvas.line([(left, y), (right, y)], color, dashed=True)
+            canvas.text(left - 3, y - _FONT_SIZE / 2, f"{value}", anchor="right")
+    step = (right - left - 8) / (len(scores) - 1)
+    points = [(left + 4 + i * step, y_of(score)) for i, score in enumerate(scores)]
+    canvas.line(points, 'line', width=2)
+    for x, y in points:
+        canvas.dot(x, y, 2)
+    for i in _ticks([x for x, _ in points]):
+        # Крайние подписи сдвигаются внутрь плитки
+        x = min(max(points[i][0], x0 + 16), x0 + width - 16)
+        canvas.text(x, bottom + 2, resample.short_date(dates[i]), anchor="top")
+
+
+class _SvgCanvas:
+    def __init__(self, width: int, height: int):
+        self.width, self.height = width, height
+        self.parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+                      f'viewBox="0 0 {width} {height}" font-family="DejaVu Sans, Arial, sans-serif" font-size="{_FONT_SIZE}">',
+                      f'<rect width="{width}" height="{height}" fill="white"/>']
+
+    @staticmethod
+    def _color(color):
+        return "rgb({},{},{})".format(*_RGB[color])
+
+    def rect(self, x0, y0, x1, y1):
+        self.parts.append(f'<rect x="{x0:.1f}" y="{y0:.1f}" width="{x1 - x0:.1f}" height="{y1 - y0:.1f}" '
+                          f'fill="none" stroke="{self._color("grid")}"/>')
+
+    def line(self, points, color, width=1, dashed=False):
+        coords = " ".join(f"{x:.1f},{y:.1f}" for x, y in points)
+        dash = ' stroke-dasharray="4,3"' if dashed else ''
+        self.parts.append(f'<polyline points="{coords}" fill="none" stroke="{self._color(color)}" stroke-width="{width}"{dash}/>')
+
+    def dot(self, x, y, radius):
+        self.parts.append(f'<circle cx="{x:.1f}" cy="{y:.1f}" r="{radius}" fill="{self._color("line")}"/>')
+
+    def text(self, x, y, value, anchor="top"):
+        align = "end" if anchor == "right" else "middle"
+        self.parts.append(f'<text x="{x:.1f}" y="{y + _FONT_SIZE - 1:.1f}" text-anchor="{align}" '
+                          f'fill="{self._color("text")}">{escape(str(value))}</text>')
+
+    def result(self) -> str:
+        return "".join(self.parts) + "</svg>"
+
+
+class _PillowCanvas:
+    def __init__(self, width: int, height: int):
+        from PIL import Image, ImageDraw
+        self.image = Image.new("RGB", (width, height), _RGB['white'])
+        self.draw = ImageDraw.Draw(self.image)
+        self.font = _font(_FONT_SIZE)
+
+    def rect(self, x0, y0, x1, y1):
+        self.draw.rectangle((x0, y0, x1, y1), outline=_RGB['grid'])
+
+    def line(self, points, color, width=1, dashed=False):
+        if not dashed:
+            self.draw.line(points, fill=_RGB[color], width=width, joint="curve")
+            return
+        # В Pillow нет штриховых линий: рисуем горизонтальную линию отрезками
+        (x0, y), (x1, _) = points[0], points[-1]
+        x = x0
+        while x < x1:
+            self.draw.line([(x, y), (min(x + 4, x1), y)], fill=_RGB[color], width=width)
+            x += 7
+
+    def dot(self, x, y, radius):
+        self.draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=_RGB['line'])
+
+    def text(self, x, y, value, anchor="top"):
+        self.draw.text((x, y), str(value), font=self.font, fill=_RGB['text'], anchor="ra" if anchor == "right" else "ma")
+
+    def result(self, fmt: str = "png") -> bytes:
+        buffer = io.BytesIO()
+        self.image.save(buffer, format=fmt.upper())
+        return buffer.getvalue()
+
+
+def render_sparkline(subject: str, scores: list, dates: list, fmt: str = "svg", width: int = 320, height: int = 120):
+    """
+    Рисует один маленький график среднего балла
+
+    Аргументы:
+        `subject`: Название предмета
+        `scores`: Средний балл на каждую дату (как `resample.graph_series`)
+        `dates`: Даты ("dd.mm.yyyy", `date` или порядковые номера дней) либо готовые подписи периодов
+        `fmt`: "svg" - строка SVG, "png" - байты PNG через Pillow (default: "svg")
+        `width`, `height`: Размер в пикселях (default: 320x120)
+    """
+    canvas = _SvgCanvas(width, height) if fmt == "svg" else _PillowCanvas(width, height)
+    _tile(canvas, 0, 0, width, height, subject, scores, dates)
+    return canvas.result() if fmt == "svg" else canvas.result(fmt)
+
+
+def dashboard(allMarks, subjects=None, fmt: str = "png", columns: int = 3, width: int = 320, height: int = 120,
+              freq: str = "day"):
+    """
+    Раскладывает графики всех предметов плитками в одну картинку за один проход
+
+    Аргументы:
+        `allMarks`: Словарь из `extract_marks` или `MarksTable`
+        `subjects`: Список предметов (default: все предметы)
+        `fmt`: "png" или "svg" (default: "png")
+        `columns`: Количество плиток в строке (default: 3)
+        `width`, `height`: Размер одной плитки в пикселях (default: 320x120)
+        `freq`: Период точек графика: "day", "week", "month" или "quarter" (default: "day")
+
+    Возвращает:
+        Байты PNG или строку SVG; у предметов, где меньше двух точек, плитка с надписью «мало отметок»,
+        а если предметов нет - одна плитка с надписью «нет оценок»
+    """
+    if subjects is None:
+        subjects = allMarks.subjects if hasattr(allMarks, "subjects") else list(allMarks)
+    if not subjects:
+        # Иначе картинка получилась бы высотой 0 пикселей
+        canvas = _SvgCanvas(width, height) if fmt == "svg" else _PillowCanvas(width, height)
+        canvas.text(width / 2, (height - _FONT_SIZE) / 2, "нет оценок", anchor="top")
+        return canvas.result() if fmt == "svg" else canvas.result(fmt)
+    columns = max(1, min(columns, len(subjects)))
+    rows = -(-len(subjects) // columns)
+    canvas = _SvgCanvas(columns * width, rows * height) if fmt == "svg" else _PillowCanvas(columns * width, rows * height)
+    for idx, subject in enumerate(subjects):
+        series = resample.subject_series(allMarks, subject, freq)
+        row, column = divmod(idx, columns)
+        _tile(canvas, column * width, row * height, width, height, subject,
+              series.values.tolist(), resample.labels(series.starts, freq))
+    return canvas.result() if fmt == "svg" else canvas.result(fmt)
@@ -0,0 +1,160 @@
+"""
+Векторизованный подсчёт статистики сразу по всем предметам.
+
+Все величины считаются через сгруппированные накопленные суммы по колонкам
+`MarksTable`: средневзвешенный балл, округлённая оценка, ряд изменения
+среднего балла и распределение итоговых оценок (то, что раньше копилось
+в `visualization.totalEst`).
+
+Округление совпадает с `visualization.countMean`/`extractScoreMass`:
+средний балл - `round(x, 2)`, оценка - `round(score + 0.01)`. Значения,
+попавшие почти точно на середину между сотыми, пересчитываются так же,
+как это делает исходный код, чтобы результат совпадал до последней цифры.
+"""
+import math
+from collections import namedtuple
+
+import numpy as np
+
+from data_processing import min_marks
+from marks_table import MarksTable
+
+# Статистика по всем предметам, массивы идут в порядке `table.subjects`
+Stats = namedtuple("Stats", [
+    "counts",         # количество отметок
+    "weighted_sums",  # сумма отметок с учётом коэффициентов
+    "weights",        # сумма коэффициентов
+    "means",          # средний балл, округлённый до сотых (nan, если отметок нет)
+    "grades",         # округлённая оценка (0, если отметок нет)
+    "missing",        # сколько отметок не хватает до минимума периода
+    "histogram",      # [пятёрки, четвёрки, тройки, двойки, единицы] у предметов без нехватки
+    "running",        # ряд изменения среднего балла, выровнен по строкам таблицы
+    "total_score",    # среднее по всем отметкам всех предметов
+])
+
+# Допуск, в пределах которого значение считается попавшим на середину между сотыми
+_TIE_EPS = 1e-6
+
+
+def _round2(values: np.ndarray, exact) -> np.ndarray:
+    """
+    Округляет до сотых как встроенный `round`
+
+    Аргументы:
+        `values`: Массив значений
+        `exact`: Функция `exact(i) -> float`, возвращающая i-е значение, посчитанное так же, как в исходном коде
+
+    Важно:
+        `np.round` отличается от `round` только у значений на середине между сотыми,
+        такие значения (их единицы) пересчитываются через `exact`
+    """
+    rounded = np.round(values, 2)
+    scaled = values * 100
+    for i in np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < _TIE_EPS).tolist():
+        rounded[i] = round(exact(i), 2)
+    return rounded
+
+
+def round_mean(value: float, exact) -> float:
+    """
+    Скалярный вариант `_round2` для одного значения
+
+    Аргументы:
+        `value`: Значение, посчитанное через накопленные суммы
+        `exact`: Функция без аргументов, возвращающая то же значение, посчитанное как в исходном коде
+    """
+    scaled = value * 100
+    if abs(scaled - math.floor(scaled) - 0.5) < _TIE_EPS:
+        return round(exact(), 2)
+    return round(value, 2)
+
+
+def _exact_mean(products: np.ndarray, coeffs: np.ndarray) -> float:
+    """
+    Средний балл, посчитанный встроенным `sum`, как в исходном коде
+
+    Важно:
+        В словаре `extract_marks` целые коэффициенты имеют тип `int`, поэтому и произведения
+        с ними - `int`. `sum` по смеси `int` и `float` даёт другой результат, чем по одним
+        `float`, так что типы восстанавливаются
+    """
+    products, coeffs = products.tolist(), coeffs.tolist()
+    for i, coeff in enumerate(coeffs):
+        if coeff.is_integer():
+            products[i], coeffs[i] = int(products[i]), int(coeff)
+    return sum(products) / sum(coeffs)
+
+
+def running_means(marks, coeffs) -> np.ndarray:
+    """
+    Ряд изменения среднего балла одного предмета за O(n)
+
+    Аргументы:
+        `marks`: Отметки предмета
+        `coeffs`: Коэффициенты отметок
+
+    Возвращает:
+        Массив, i-й элемент которого равен `round(sum(marks[:i+1] * coeffs[:i+1]) / sum(coeffs[:i+1]), 2)`
+    """
+    marks = np.asarray(marks, dtype=np.float64)
+    coeffs = np.asarray(coeffs, dtype=np.float64)
+    products = marks * coeffs
+    values = np.cumsum(products) / np.cumsum(coeffs) if len(marks) else np.empty(0)
+    return _round2(values, lambda i: _exact_mean(products[:i + 1], coeffs[:i + 1]))
+
+
+def weighted_mean(marks, coeffs) -> float:
+    '''Средневзвешенный балл, округлённый до сотых (как в `countMean`)'''
+    marks = np.asarray(marks, dtype=np.float64)
+    coeffs = np.asarray(coeffs, dtype=np.float64)
+    if not len(marks):
+        return float("nan")
+    products = marks * coeffs
+    value = np.array([products.sum() / coeffs.sum()])
+    return float(_round2(value, lambda i: _exact_mean(products, coeffs))[0])
+
+
+def compute_stats(table: MarksTable, period: str = "") -> Stats:
+    """
+    Считает статистику по всем предметам таблицы за один проход
+
+    Аргументы:
+        `table`: Таблица отметок
+        `period`: Период из шапки листа (`extract_info(...)['Период']`), задаёт минимум отметок
+
+    Возвращает:
+        `Stats`
+    """
+    offsets = table.offsets
+    starts, ends = offsets[:-1], offsets[1:]
+    counts = np.diff(offsets)
+    products = table.mark * table.coeff
+
+    # Накопленные суммы по всей таблице, затем вычитаем значение на начало предмета
+    cum_products = np.concatenate(([0.0], np.cumsum(products)))
+    cum_coeffs = np.concatenate(([0.0], np.cumsum(table.coeff)))
+    row_start = np.repeat(starts, counts)
+    rows = np.arange(len(table))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        running = (cum_products[rows + 1] - cum_products[row_start]) / (cum_coeffs[rows + 1] - cum_coeffs[row_start])
+        weighted_sums = cum_products[ends] - cum_products[starts]
+        weights = cum_coeffs[ends] - cum_coeffs[starts]
+        raw_means = weighted_sums / weights
+
+    def exact(start, stop):
+        return _exact_mean(products[start:stop], table.coeff[start:stop])
+
+    running = _round2(running, lambda i: exact(int(row_start[i]), i + 1))
+    means = _round2(raw_means, lambda i: exact(int(starts[i]), int(ends[i])))
+    has_marks = counts > 0
+    grades = np.where(has_marks, np.rint(np.where(has_marks, means, 0) + 0.01), 0).astype(np.int64)
+
+    required = min_marks(period)
+    missing = np.maximum(required - counts, 0)
+    enough = has_marks & (missing == 0)
+    histogram = np.bincount(5 - grades[enough], minlength=5)[:5]
+
+    total_score = float("nan")
+    if len(table):
+        total_score = float(_round2(np.array([cum_products[-1] / cum_coeffs[-1]]), lambda i: exact(0, len(table)))[0])
+    return Stats(counts, weighted_sums, weights, means, grades, missing, histogram, running, total_score)
@@ -0,0 +1,206 @@
+"""
+Потоковые агрегаторы по отметкам из `data_processing.stream_marks`.
+
+Каждый агрегатор принимает записи `MarkRecord` по одной (`add`) и хранит только
+итоги по предметам, поэтому память не растёт с числом отметок: выгрузки за
+несколько лет или всей школы обрабатываются так же, как одна четверть.
+`consume(records, *aggregators)` прогоняет поток через несколько агрегаторов
+за один проход, а `running_series` выдаёт ряд среднего балла по ходу потока.
+
+Суммы копятся в `ExactSum` тем же способом, каким их считает встроенный `sum`
+в `countMean`, поэтому средние баллы совпадают с `analysis.analyze_marks` до
+последней цифры.
+"""
+import math
+from collections import Counter
+
+from analysis import Report, SubjectResult
+from data_processing import min_marks
+
+
+class ExactSum:
+    """
+    Накопленная сумма, равная `sum()` по тем же значениям в том же порядке.
+
+    `sum` складывает целые точно, а после первого `float` переходит к сумме
+    с компенсацией (алгоритм Ноймайера); целые на этом этапе прибавляются без
+    компенсации. Здесь повторяется тот же порядок действий.
+    """
+    __slots__ = ("_int", "_float", "_compensation", "_is_float")
+
+    def __init__(self):
+        self._int = 0
+        self._float = 0.0
+        self._compensation = 0.0
+        self._is_float = False
+
+    def add(self, value):
+        if not self._is_float:
+            if type(value) is int:
+                self._int += value
+                return
+            self._float, self._is_float = self._int + value, True
+            return
+        if type(value) is float:
+            total = self._float + value
+            if abs(self._float) >= abs(value):
+                self._compensation += (self._float - total) + value
+            else:
+                self._compensation += (value - total) + self._float
+            self._float = total
+        else:
+            self._float += float(value)
+
+    @property
+    def value(self):
+        if not self._is_float:
+            return self._int
+        if self._compensation and math.isfinite(self._compensation):
+            return self._float + self._compensation
+        return self._float
+
+
+class WeightedMean:
+    '''Средневзвешенный балл одного ряда отметок'''
+    __slots__ = ("count", "products", "coeffs")
+
+    def __init__(self):
+        self.count = 0
+        self.products = ExactSum()
+        self.coeffs = ExactSum()
+
+    def add(self, mark: int, coeff):
+        self.count += 1
+        self.products.add(mark * coeff)
+        self.coeffs.add(coeff)
+
+    @property
+    def mean(self) -> float | None:
+        '''Средний балл, округлённый до сотых (None, если отметок нет)'''
+        if not self.count:
+            return None
+        return round(self.products.value / self.coeffs.value, 2)
+
+
+class Means:
+    '''Средний балл по каждому предмету и по всем отметкам сразу'''
+    __slots__ = ("subjects", "total")
+
+    def __init__(self):
+        self.subjects = {}
+        self.total = WeightedMean()
+
+    def add(self, record):
+        subject = self.subjects.get(record.subject)
+        if subject is None:
+            subject = self.subjects[record.subject] = WeightedMean()
+        subject.add(record.mark, record.coeff)
+        self.total.add(record.mark, record.coeff)
+
+    def mean(self, subject: str) -> float | None:
+        found = self.subjects.get(subject)
+        return found.mean if found is not None else None
+
+
+class Counts:
+    '''Количество отметок по предметам и по типам работ'''
+    __slots__ = ("subjects", "work_types", "total")
+
+    def __init__(self):
+        self.subjects = Counter()
+        self.work_types = Counter()
+        self.total = 0
+
+    def add(self, record):
+        self.subjects[record.subject] += 1
+        self.work_types[record.work_type] += 1
+        self.total += 1
+
+
+class Histogram:
+    '''Распределение отметок по предметам: `{предмет: [пятёрки, четвёрки, тройки, двойки, единицы]}`'''
+    __slots__ = ("subjects",)
+
+    def __init__(self):
+        self.subjects = {}
+
+    def add(self, record):
+        # Отметки вне 1-5 (например, 0) в распределение не попадают
+        if not 1 <= record.mark <= 5:
+            return
+        counts = self.subjects.get(record.subject)
+        if counts is None:
+            counts = self.subjects[record.subject] = [0] * 5
+        counts[5 - record.mark] += 1
+
+    def total(self) -> list:
+        '''Распределение по всем предметам вместе'''
+        return [sum(column) for column in zip(*self.subjects.values())] if self.subjects else [0] * 5
+
+
+def consume(records, *aggregators):
+    """
+    Прогоняет поток отметок через агрегаторы за один проход
+
+    Аргументы:
+        `records`: Итерируемый объект `MarkRecord`, например `stream_marks(worksheet)`
+        `aggregators`: Объекты с методом `add(record)`
+
+    Возвращает:
+        Те же агрегаторы (удобно для `means, counts = consume(stream, Means(), Counts())`)
+    """
+    adders = [aggregator.add for aggregator in aggregators]
+    for record in records:
+        for add in adders:
+            add(record)
+    return aggregators
+
+
+def running_series(records):
+    """
+    Ряд изменения среднего балла по ходу потока
+
+    Возвращает:
+        Генератор пар `(record, mean)`, где `mean` - средний балл предмета `record.subject` с учётом
+        этой отметки, округлённый до сотых (как `visualization.extractScoreMass`)
+    """
+    means = {}
+    for record in records:
+        mean = means.get(record.subject)
+        if mean is None:
+            mean = means[record.subject] = WeightedMean()
+        mean.add(record.mark, record.coeff)
+        yield record, mean.mean
+
+
+def build_report(info: dict, subjects: dict, means: Means) -> Report:
+    """
+    Собирает `analysis.Report` из потоковых итогов
+
+    Аргументы:
+        `info`: Информация об ученике (из `stream_marks(..., info=...)`)
+        `subjects`: Словарь предметов (из `stream_marks(..., subjects=...)`), задаёт порядок и предметы без отметок
+        `means`: Агрегатор `Means`, через который прошёл весь поток
+
+    Возвращает:
+        `Report`, совпадающий с `analysis.analyze_marks` по тем же отметкам
+    """
+    period = str(info.get('Период') or '')
+    required = min_marks(period)
+    results, histogram = [], [0] * 5
+    for name in subjects.values():
+        subject = means.subjects.get(name)
+        count = subject.count if subject is not None else 0
+        mean = subject.mean if count else None
+        grade = round(mean + 0.01) if count else None
+        missing = max(required - count, 0)
+        if count and not missing and 1 <= grade <= 5:
+            histogram[5 - grade] += 1
+        results.append(SubjectResult(name=name, count=count, mean=mean, grade=grade, missing=missing))
+    return Report(
+        info=dict(info),
+        subjects=tuple(results),
+        histogram=tuple(histogram),
+        total_score=means.total.mean,
+        min_marks=required,
+    )
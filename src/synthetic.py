@@ -0,0 +1,137 @@
+"""
+Генератор синтетических выгрузок электронного дневника.
+
+Книга устроена так же, как настоящая выгрузка: шапка со сведениями об ученике
+(для `extract_info`), предметы с 11-й строки, строка дат с 10-й строки,
+заканчивающаяся "Итог:", и ячейки с отметками и комментариями вида
+"5 - Работа на уроке - 06.11.2024". Количество предметов и дней, заполненность,
+число отметок в ячейке и доли типов работ настраиваются, а одинаковый `seed`
+даёт одинаковую книгу.
+
+Запуск:
+    python ./src/synthetic.py Отметки_1.xlsx [--subjects 15] [--days 90] [--seed 0]
+"""
+import argparse, os, random
+from datetime import date as Date, timedelta
+
+import openpyxl as xl
+from openpyxl.comments import Comment
+
+import data_processing as d
+
+SUBJECTS = [
+    "Алгебра", "Английский язык", "Биология", "Вероятность и статистика", "География", "Геометрия",
+    "Изобразительное искусство", "Информатика", "История", "Литература", "Музыка",
+    "Обществознание", "Основы безопасности жизнедеятельности", "Родной язык", "Русский язык",
+    "Технология", "Физика", "Физическая культура", "Химия", "Черчение",
+]
+# Доли типов работ: на уроках отметок больше всего, контрольных - меньше
+WORK_TYPES = {
+    "Работа на уроке": 45, "Домашнее задание": 15, "Самостоятельная работа": 10, "Проверочная работа": 8,
+    "Контрольная работа": 7, "Словарный диктант": 4, "Тест": 5, "Практическая работа": 4, "Чтение наизусть": 2,
+}
+# Доли отметок; "Н" - пропуск, отметкой не считается
+MARKS = {"5": 35, "4": 35, "3": 17, "2": 6, "Н": 7}
+# Сколько отметок стоит в одной ячейке
+MARKS_PER_CELL = {1: 85, 2: 13, 3: 2}
+
+
+def school_days(start: Date, days: int) -> list:
+    '''`days` учебных дней (без воскресений), начиная с `start`'''
+    result, current = [], start
+    while len(result) < days:
+        if current.weekday() != 6:
+            result.append(current)
+        current += timedelta(days=1)
+    return result
+
+
+def generate_diary(path: str = None, subjects: int = 12, days: int = 60, fill: float = 0.35,
+                   marks_per_cell: dict = MARKS_PER_CELL, work_types: dict = WORK_TYPES, marks: dict = MARKS,
+                   start: Date = Date(2024, 9, 2), period: str = "I полугодие",
+                   student: str = "Иванов Иван Иванович", seed: int = 0) -> xl.Workbook:
+    """
+    Создаёт выгрузку дневника
+
+    Аргументы:
+        `path`: Куда сохранить книгу; если не задан, книга только возвращается (default: None)
+        `subjects`: Количество предметов (default: 12)
+        `days`: Количество учебных дней - столбцов-дат (default: 60)
+        `fill`: Доля ячеек с отметками (default: 0.35)
+        `marks_per_cell`: Доли количества отметок в ячейке `{количество: вес}`
+        `work_types`: Доли типов работ `{тип работы: вес}`
+        `marks`: Доли отметок `{отметка: вес}`, нецифровые значения ("Н") отметками не считаются
+        `start`: Первый учебный день (default: 02.09.2024)
+        `period`: Период в шапке (default: "I полугодие")
+        `student`: Имя ученика в шапке
+        `seed`: Зерно генератора случайных чисел (default: 0)
+
+    Возвращает:
+        `openpyxl.Workbook`
+    """
+    rnd = random.Random(seed)
+    counts, count_weights = list(marks_per_cell), list(marks_per_cell.values())
+    types, type_weights = list(work_types), list(work_types.values())
+    values = list(marks)
+
+    workbook = xl.Workbook()
+    sheet = workbook.active
+    header = [("Организация:", "МБОУ СОШ №1"), ("Обучающийся:", student), ("Класс:", "9 Б"), ("Период:", period)]
+    for row, (key, value) in enumerate(header):
+        sheet.cell(row * 2 + 1, 1, key)
+        sheet.cell(row * 2 + 2, 1, value)
+    sheet.cell(10, 1, "Предметы")
+    names = [SUBJECTS[idx % len(SUBJECTS)] + (f" {idx // len(SUBJECTS) + 1}" if idx >= len(SUBJECTS) else "")
+             for idx in range(subjects)]
+    for idx, name in enumerate(names):
+        sheet.cell(11 + idx, 1, name)
+    # У каждого предмета своя успеваемость: пятёрки чаще или реже, двойки и тройки - наоборот
+    levels = [rnd.uniform(0.25, 3) for _ in names]
+    subject_weights = [[weight * level if value == "5" else weight / level if value in ("2", "3") else weight
+                        for value, weight in marks.items()] for level in levels]
+
+    dates = [day.strftime("%d.%m.%Y") for day in school_days(start, days)]
+    totals = [[0.0, 0.0] for _ in names]
+    for col, date in enumerate(dates, start=2):
+        sheet.cell(10, col, date)
+        for idx in range(subjects):
+            if rnd.random() >= fill:
+                continue
+            cell_marks = rnd.choices(values, subject_weights[idx], k=rnd.choices(counts, count_weights)[0])
+            entries = []
+            for mark in cell_marks:
+                work_type = rnd.choices(types, type_weights)[0]
+                entries.append(f"{mark} - {work_type} - {date}")
+                if mark.isdigit():
+                    coeff = d.coeffs.get(work_type, d.default_coeff)
+                    totals[idx][0] += int(mark) * coeff
+                    totals[idx][1] += coeff
+            cell = sheet.cell(11 + idx, col, "".join(cell_marks))
+            cell.comment = Comment("; ".join(entries), "ЭлЖур")
+    sheet.cell(10, len(dates) + 2, "Итог:")
+    for idx, (weighted, weight) in enumerate(totals):
+        if weight:
+            sheet.cell(11 + idx, len(dates) + 2, str(round(weighted / weight + 0.01)))
+
+    if path is not None:
+        workbook.save(path)
+    return workbook
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Генератор синтетических выгрузок электронного дневника")
+    parser.add_argument("file", help="имя файла (относительно папки data) или путь")
+    parser.add_argument("--subjects", type=int, default=12)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--fill", type=float, default=0.35, help="доля ячеек с отметками")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--period", default="I полугодие")
+    args = parser.parse_args(argv)
+    path = os.path.join(d.folder_root, args.file)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    generate_diary(path, args.subjects, args.days, args.fill, period=args.period, seed=args.seed)
+    print(f"Сохранено: {path}")
+
+
+if __name__ == '__main__':
+    main()
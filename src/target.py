@@ -0,0 +1,197 @@
+"""
+Сколько и каких отметок нужно получить, чтобы выйти на желаемую оценку.
+
+Для каждого предмета берутся текущие суммы `sum(отметка * коэффициент)` и
+`sum(коэффициент)` (`stats.compute_stats`). Если добавить `n` отметок `v` с
+коэффициентом `c`, средний балл станет `(S + n*v*c) / (W + n*c)`, поэтому
+нужное `n` находится по формуле, а не перебором. Заранее, при импорте модуля,
+считаются:
+- `THRESHOLDS` - наименьший средний балл (в сотых), с которого округление
+  `round(score + 0.01)` даёт каждую оценку (например, 4.49 - это ещё 4, а 3.49 - уже 4);
+- группы типов работ из `data_processing.coeffs` с одинаковым коэффициентом.
+
+Формула считается сразу для всех предметов и всех пар (отметка, коэффициент)
+массивами NumPy, затем каждый ответ проверяется тем же округлением, что и в
+`countMean`. Учитывается и минимум отметок за период: пока отметок меньше
+минимума, оценка не выставляется.
+"""
+import math
+from collections import namedtuple
+from dataclasses import dataclass
+
+import numpy as np
+
+import data_processing as d
+from marks_table import MarksTable
+from stats import compute_stats, min_marks
+
+# Наименьший средний балл в сотых, с которого выставляется оценка: `{оценка: сотые}`
+THRESHOLDS = {}
+for _grade in range(1, 6):
+    _hundredths = 500
+    while _hundredths > 0 and round((_hundredths - 1) / 100 + 0.01) >= _grade:
+        _hundredths -= 1
+    THRESHOLDS[_grade] = _hundredths
+del _grade, _hundredths
+
+# Типы работ с одинаковым коэффициентом: `{коэффициент: [типы работ]}`, по возрастанию коэффициента
+WORK_TYPES = {}
+for _work_type, _coeff in sorted(d.coeffs.items(), key=lambda item: (item[1], item[0])):
+    WORK_TYPES.setdefault(_coeff, []).append(_work_type)
+del _work_type, _coeff
+
+# Отметки, которые можно получить
+MARKS = (5, 4, 3, 2)
+
+# Один вариант: `count` отметок `mark` за работы с коэффициентом `coeff` (например, из `work_types`)
+Plan = namedtuple("Plan", ["mark", "coeff", "count", "work_types"])
+
+
+@dataclass(slots=True, frozen=True)
+class SubjectTarget:
+    '''Что нужно по одному предмету, чтобы выйти на оценку `target`'''
+    name: str
+    mean: float | None       # текущий средний балл (None, если отметок нет)
+    grade: int | None        # текущая оценка
+    target: int              # желаемая оценка
+    missing: int             # сколько отметок не хватает до минимума периода
+    reached: bool            # оценка уже не ниже желаемой и отметок хватает
+    plans: tuple[Plan, ...]  # минимальные варианты, от меньшего числа отметок к большему
+
+    @property
+    def best(self) -> Plan | None:
+        '''Вариант с наименьшим числом отметок'''
+        return self.plans[0] if self.plans else None
+
+
+def grade_of(weighted_sum: float, weight: float) -> int:
+    '''Оценка по суммам, округление как в `countMean`: `round(round(S / W, 2) + 0.01)`'''
+    return round(round(weighted_sum / weight, 2) + 0.01)
+
+
+def marks_needed(weighted_sum: float, weight: float, count: int, mark: int, coeff: float,
+                 target: int, required: int = 0) -> int | None:
+    """
+    Сколько отметок `mark` с коэффициентом `coeff` нужно, чтобы выйти на оценку `target`
+
+    Аргументы:
+        `weighted_sum`: Текущая сумма `отметка * коэффициент` по предмету
+        `weight`: Текущая сумма коэффициентов
+        `count`: Текущее количество отметок
+        `mark`, `coeff`: Будущая отметка и коэффициент работы
+        `target`: Желаемая оценка (1-5)
+        `required`: Минимум отметок за период (`stats.min_marks`)
+
+    Возвращает:
+        Количество отметок (0, если оценка уже выставлена и не ниже желаемой) или None,
+        если такими отметками желаемую оценку не получить
+    """
+    floor = max(required - count, 0)
+    limit = (THRESHOLDS[target] - 0.5) / 100
+    if mark <= limit:
+        # Такие отметки средний балл не поднимают: подойдёт только добор до минимума
+        return floor if _reaches(floor, weighted_sum, weight, mark, coeff, target) else None
+    estimate = math.ceil((limit * weight - weighted_sum) / (coeff * (mark - limit)))
+    return _check(max(estimate, floor), floor, weighted_sum, weight, mark, coeff, target)
+
+
+def _reaches(n: int, weighted_sum, weight, mark, coeff, target) -> bool:
+    '''Даёт ли `n` отметок `mark` с коэффициентом `coeff` оценку не ниже `target`'''
+    total = weight + n * coeff
+    return total > 0 and grade_of(weighted_sum + n * mark * coeff, total) >= target
+
+
+def _check(n: int, floor: int, weighted_sum, weight, mark, coeff, target) -> int:
+    '''Уточняет ответ формулы проверкой точным округлением: формула считается во float и может ошибиться на единицу'''
+    while not _reaches(n, weighted_sum, weight, mark, coeff, target):
+        n += 1
+    while n > floor and _reaches(n - 1, weighted_sum, weight, mark, coeff, target):
+        n -= 1
+    return n
+
+
+def _minimal(plans: list) -> tuple:
+    '''Оставляет варианты, которые не проще другого варианта сразу по числу, отметке и коэффициенту'''
+    plans.sort(key=lambda p: (p.count, p.mark, p.coeff))
+    result = []
+    for plan in plans:
+        if not any(o.count <= plan.count and o.mark <= plan.mark and o.coeff <= plan.coeff for o in result):
+            result.append(plan)
+    return tuple(result)
+
+
+def solve(allMarks, period: str = "", target: int = 5, subjects=None, marks=MARKS) -> tuple[SubjectTarget, ...]:
+    """
+    Считает, что нужно по каждому предмету для выхода на оценку `target`
+
+    Аргументы:
+        `allMarks`: Словарь из `extract_marks` или `MarksTable`
+        `period`: Период из шапки листа, задаёт минимум отметок (default: "")
+        `target`: Желаемая оценка 1-5 (default: 5)
+        `subjects`: Список предметов (default: все предметы таблицы)
+        `marks`: Какие отметки рассматривать (default: `MARKS`)
+
+    Возвращает:
+        Кортеж `SubjectTarget` в порядке `subjects`
+    """
+    if target not in THRESHOLDS:
+        raise ValueError(f"Оценка должна быть от 1 до 5, а не {target!r}")
+    table = allMarks if isinstance(allMarks, MarksTable) else MarksTable.from_marks(allMarks)
+    stats = compute_stats(table, period)
+    required = min_marks(period)
+    names = list(subjects) if subjects is not None else table.subjects
+    index = np.array([table.subjects.index(name) for name in names], dtype=np.int64)
+    sums, weights, counts = stats.weighted_sums[index], stats.weights[index], stats.counts[index]
+
+    # Все пары (отметка, коэффициент) - столбцы, предметы - строки
+    limit = (THRESHOLDS[target] - 0.5) / 100
+    options = [(mark, coeff) for mark in marks if mark > limit for coeff in WORK_TYPES]
+    option_marks = np.array([mark for mark, _ in options], dtype=np.float64)
+    option_coeffs = np.array([coeff for _, coeff in options], dtype=np.float64)
+    estimates = np.ceil((limit * weights[:, None] - sums[:, None]) / (option_coeffs * (option_marks - limit)))
+    estimates = np.maximum(estimates, np.maximum(required - counts, 0)[:, None]).astype(np.int64)
+
+    results = []
+    for row, name in enumerate(names):
+        count = int(counts[row])
+        missing = max(required - count, 0)
+        mean = float(stats.means[index[row]]) if count else None
+        grade = int(stats.grades[index[row]]) if count else None
+        reached = bool(count) and not missing and grade >= target
+        plans = []
+        if not reached:
+            for column, (mark, coeff) in enumerate(options):
+                n = _check(int(estimates[row, column]), missing, float(sums[row]), float(weights[row]), mark, coeff, target)
+                plans.append(Plan(mark, coeff, n, tuple(WORK_TYPES[coeff])))
+        results.append(SubjectTarget(name=name, mean=mean, grade=grade, target=target, missing=missing,
+                                     reached=reached, plans=_minimal(plans)))
+    return tuple(results)
+
+
+def target_to_dict(result: SubjectTarget) -> dict:
+    '''`SubjectTarget` в виде словаря для JSON: варианты - словари, а не списки'''
+    return {
+        "name": result.name, "mean": result.mean, "grade": result.grade, "target": result.target,
+        "missing": result.missing, "reached": result.reached,
+        "plans": [{**plan._asdict(), "work_types": list(plan.work_types)} for plan in result.plans],
+    }
+
+
+def _plural(count: int) -> str:
+    if count % 10 == 1 and count % 100 != 11:
+        return "отметка"
+    if 2 <= count % 10 <= 4 and not 12 <= count % 100 <= 14:
+        return "отметки"
+    return "отметок"
+
+
+def format_target(result: SubjectTarget, plans: int = 3) -> str:
+    '''Строка для вывода в консоль: что нужно по предмету, не больше `plans` вариантов'''
+    current = f'{result.mean} ~ {result.grade}' if result.mean is not None else 'нет оценок'
+    if result.reached:
+        return f'{result.name} - {current}: оценка {result.target} уже есть'
+    if not result.plans:
+        return f'{result.name} - {current}: оценку {result.target} не получить'
+    options = [f'{p.count} {_plural(p.count)} "{p.mark}" с коэфф. {p.coeff} ({", ".join(sorted(p.work_types, key=len)[:2])})'
+               for p in result.plans[:plans]]
+    return f'{result.name} - {current}: до {result.target} нужно ' + ' или '.join(options)
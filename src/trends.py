@@ -0,0 +1,361 @@
+"""
+Тренды среднего балла и ранние предупреждения сразу по всем ученикам и предметам.
+
+Для каждой пары ученик-предмет берётся ряд изменения среднего балла (тот же,
+что `visualization.extractScoreMass`) и по нему считаются:
+- `ewma` - экспоненциальное среднее отметок с учётом коэффициентов: вес отметки
+  убывает вдвое каждые `halflife` дней до последней отметки («текущая форма»);
+- `rolling` - средний балл последних `window` отметок;
+- `slope` - скорость изменения среднего балла (наклон прямой по методу
+  наименьших квадратов за последние `span` дней), баллов в неделю;
+- `days_to_boundary` - через сколько дней при такой скорости средний балл дойдёт
+  до границы округления и оценка станет на единицу ниже (`target.THRESHOLDS`);
+- `drop` - самое сильное за последние `recent` дней падение среднего балла после
+  контрольной работы (коэффициент от `CONTROL_COEFF`).
+
+Флаги: `slide` - граница будет достигнута за `horizon` дней, `drop` - падение
+после контрольной не меньше `drop`, `form` - текущая форма ниже границы текущей
+оценки. Из них складывается `score` (каждая часть от 0 до 1), по нему
+предупреждения сортируются.
+
+Ряды всех пар лежат подряд в плоских массивах, как в `cohort`, и обрабатываются
+блоками по `chunk` пар: блок раскладывается в прямоугольные массивы (строка на
+пару, короткие ряды дополнены пустыми ячейками с нулевым коэффициентом), и все
+величины считаются операциями NumPy по строкам, без циклов по ученикам и предметам.
+
+Запуск:
+    python ./src/trends.py <папка или маска> [--workers N] [--cache [папка]] [--top 20] [--json файл]
+"""
+import argparse, json, math, os, time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import date as Date
+
+import numpy as np
+
+import batch
+import data_processing as d
+from marks_table import MarksTable
+from stats import _exact_mean, _round2
+from target import THRESHOLDS
+
+# Коэффициент, начиная с которого работа считается контрольной
+CONTROL_COEFF = 1.5
+# Названия флагов
+FLAGS = ("slide", "drop", "form")
+
+# Падение среднего балла после контрольной: дата, отметка, тип работы и изменение среднего балла
+Drop = namedtuple("Drop", ["date", "mark", "work_type", "delta"])
+
+# Граница снижения для каждой оценки: наибольший средний балл оценки на единицу ниже
+_BOUNDARY = np.full(7, np.nan)
+for _grade in range(2, 6):
+    _BOUNDARY[_grade] = (THRESHOLDS[_grade] - 1) / 100
+del _grade
+
+
+@dataclass(slots=True, frozen=True)
+class Trend:
+    '''Тренд одного предмета одного ученика'''
+    student: str
+    subject: str
+    count: int                        # количество отметок
+    mean: float                       # текущий средний балл (последнее значение `extractScoreMass`)
+    grade: int                        # текущая оценка
+    ewma: float                       # экспоненциальное среднее отметок, до сотых
+    rolling: float                    # средний балл последних `window` отметок, до сотых
+    slope: float | None               # изменение среднего балла, баллов в неделю (None - меньше двух дней)
+    boundary: float | None            # средний балл, на котором оценка станет ниже (None у единицы)
+    days_to_boundary: float | None    # дней до границы при текущей скорости (None, если балл не снижается)
+    drop: Drop | None                 # самое сильное недавнее падение после контрольной
+    flags: tuple[str, ...]            # сработавшие флаги из `FLAGS`
+    score: float                      # важность предупреждения: сумма частей флагов
+
+    def to_dict(self) -> dict:
+        '''Словарь для JSON'''
+        result = asdict(self)
+        result["drop"] = self.drop._asdict() if self.drop is not None else None
+        return result
+
+
+class _Series:
+    '''Ряды всех пар ученик-предмет подряд в плоских массивах'''
+    __slots__ = ("students", "subjects", "work_types", "student_id", "starts", "date", "mark", "coeff", "work_type_id")
+
+    def __init__(self, tables: list, names: list):
+        self.subjects = []
+        work_type_index = {}
+        student_id, lengths, columns = [], [], ([], [], [], [])
+        for student, table in enumerate(tables):
+            counts = np.diff(table.offsets)
+            self.subjects.extend(table.subjects)
+            student_id.extend([student] * len(table.subjects))
+            lengths.append(counts)
+            lookup = np.asarray([work_type_index.setdefault(w, len(work_type_index)) for w in table.work_types] or [0],
+                                dtype=np.int64)
+            # Строки `MarksTable` уже сгруппированы по предметам в порядке `subjects`
+            columns[0].append(table.date.astype(np.int64))
+            columns[1].append(table.mark.astype(np.float64))
+            columns[2].append(np.asarray(table.coeff, dtype=np.float64))
+            columns[3].append(lookup[table.work_type_id])
+        self.students = list(names)
+        self.work_types = list(work_type_index)
+        self.student_id = np.asarray(student_id, dtype=np.int64)
+        lengths = np.concatenate(lengths) if lengths else np.empty(0, dtype=np.int64)
+        self.starts = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+        self.date, self.mark, self.coeff, self.work_type_id = (
+            np.concatenate(column) if column else np.empty(0) for column in columns)
+
+    def __len__(self) -> int:
+        return len(self.subjects)
+
+
+def _block(series: _Series, first: int, last: int, halflife: float, window: int, span: int, recent: int,
+           drop: float, control: float) -> dict:
+    '''Величины трендов для пар `[first, last)` одним блоком прямоугольных массивов'''
+    starts = series.starts[first:last + 1]
+    lengths = np.diff(starts)
+    pairs, width = len(lengths), int(lengths.max(initial=0))
+    rows = np.repeat(np.arange(pairs), lengths)
+    cols = np.arange(starts[-1] - starts[0]) - np.repeat(starts[:-1] - starts[0], lengths)
+    flat = slice(int(starts[0]), int(starts[-1]))
+    valid = np.zeros((pairs, width), dtype=bool)
+    valid[rows, cols] = True
+
+    def grid(values, fill=0):
+        result = np.full((pairs, width), fill, dtype=values.dtype)
+        result[rows, cols] = values[flat]
+        return result
+
+    marks, coeffs, work_type = grid(series.mark), grid(series.coeff), grid(series.work_type_id, -1)
+    products = marks * coeffs
+    has = lengths > 0
+    last_col = np.maximum(lengths - 1, 0)
+    dates = grid(series.date)
+    last_date = dates[np.arange(pairs), last_col]
+    dates = np.where(valid, dates, last_date[:, None])
+
+    # Ряд среднего балла по строкам: в дополненных ячейках коэффициент 0, значение не меняется
+    cum_products, cum_coeffs = np.cumsum(products, axis=1), np.cumsum(coeffs, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        raw = cum_products / cum_coeffs
+    running = np.full((pairs, width), np.nan)
+    running[rows, cols] = _round2(raw[rows, cols], lambda i: _exact_mean(products[rows[i], :cols[i] + 1],
+                                                                          coeffs[rows[i], :cols[i] + 1]))
+    means = running[np.arange(pairs), last_col] if width else np.full(pairs, np.nan)
+    grades = np.where(has, np.rint(np.where(has, means, 0) + 0.01), 0).astype(np.int64)
+
+    age = (last_date[:, None] - dates).astype(np.float64)
+    weights = np.exp2(-age / halflife) * coeffs
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ewma = (weights * marks).sum(axis=1) / weights.sum(axis=1)
+
+    padded_products = np.concatenate((np.zeros((pairs, 1)), cum_products), axis=1)
+    padded_coeffs = np.concatenate((np.zeros((pairs, 1)), cum_coeffs), axis=1)
+    since = np.maximum(lengths - window, 0)
+    end = np.arange(pairs), lengths
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rolling = ((padded_products[end] - padded_products[np.arange(pairs), since])
+                   / (padded_coeffs[end] - padded_coeffs[np.arange(pairs), since]))
+
+    # Наклон ряда среднего балла за последние `span` дней; x - дни до последней отметки
+    inside = valid & (age <= span)
+    x = np.where(inside, -age, 0.0)
+    y = np.where(inside, running, 0.0)
+    n = inside.sum(axis=1)
+    sx, sy, sxy, sxx = x.sum(axis=1), y.sum(axis=1), (x * y).sum(axis=1), (x * x).sum(axis=1)
+    denominator = n * sxx - sx * sx
+    with np.errstate(invalid="ignore", divide="ignore"):
+        slope = np.where(denominator > 1e-9, (n * sxy - sx * sy) / denominator, np.nan)
+
+    boundary = _BOUNDARY[grades]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        days = np.where(slope < 0, (means - boundary) / -slope, np.nan)
+
+    # Изменение среднего балла на каждой отметке; первая отметка предмета не сравнивается
+    delta = np.full((pairs, width), np.inf)
+    if width > 1:
+        change = running[:, 1:] - running[:, :-1]
+        candidate = valid[:, 1:] & (coeffs[:, 1:] >= control) & (age[:, 1:] <= recent) & (change <= -drop + 1e-9)
+        delta[:, 1:] = np.where(candidate, change, np.inf)
+    drop_col = delta.argmin(axis=1) if width else np.zeros(pairs, dtype=np.int64)
+    drop_delta = delta[np.arange(pairs), drop_col] if width else np.full(pairs, np.inf)
+    return {
+        "count": lengths, "mean": means, "grade": grades, "ewma": ewma, "rolling": rolling, "slope": slope,
+        "boundary": boundary, "days": days, "drop_delta": drop_delta,
+        "drop_date": dates[np.arange(pairs), drop_col] if width else last_date,
+        "drop_mark": marks[np.arange(pairs), drop_col] if width else np.zeros(pairs),
+        "drop_work_type": work_type[np.arange(pairs), drop_col] if width else np.full(pairs, -1),
+    }
+
+
+def _scores(values: dict, horizon: float, min_count: int) -> tuple[np.ndarray, np.ndarray]:
+    '''Части важности по флагам (массив пар x `FLAGS`) и их сумма'''
+    lower = _BOUNDARY[values["grade"]] + 0.01
+    enough = values["count"] >= min_count
+    with np.errstate(invalid="ignore"):
+        slide = np.where(values["days"] <= horizon, 1 - values["days"] / horizon, 0.0)
+        fall = np.where(np.isfinite(values["drop_delta"]), np.minimum(-values["drop_delta"] / 0.5, 1), 0.0)
+        form = np.where(values["ewma"] < lower, np.minimum(lower - values["ewma"], 1), 0.0)
+    parts = np.stack((slide, fall, form), axis=1)
+    parts = np.where(enough[:, None], np.nan_to_num(np.clip(parts, 0, 1)), 0.0)
+    # Флаг срабатывает и при нулевой части (например, граница достигается ровно через `horizon` дней)
+    fired = np.stack((values["days"] <= horizon, np.isfinite(values["drop_delta"]),
+                      values["ewma"] < lower), axis=1) & enough[:, None]
+    return fired, parts.sum(axis=1)
+
+
+def _column(values: np.ndarray, digits: int) -> list:
+    '''Значения, округлённые до `digits` знаков, списком; nan и бесконечность - None'''
+    return [x if math.isfinite(x) else None for x in np.round(values, digits).tolist()]
+
+
+def scan(tables: list, names: list = None, halflife: float = 14, window: int = 5, span: int = 28,
+         horizon: float = 21, recent: int = 14, drop: float = 0.1, control: float = CONTROL_COEFF,
+         min_count: int = 3, chunk: int = 4096) -> list:
+    """
+    Считает тренды всех предметов всех учеников
+
+    Аргументы:
+        `tables`: Таблицы отметок учеников (`MarksTable` или словари из `extract_marks`)
+        `names`: Имена учеников (default: "Ученик 1", "Ученик 2", ...)
+        `halflife`: Через сколько дней вес отметки в `ewma` уменьшается вдвое (default: 14)
+        `window`: Сколько последних отметок входит в `rolling` (default: 5)
+        `span`: За сколько последних дней считается `slope` (default: 28)
+        `horizon`: Флаг `slide`, если до границы меньше стольких дней (default: 21)
+        `recent`: Сколько последних дней смотреть на контрольные для флага `drop` (default: 14)
+        `drop`: Наименьшее падение среднего балла после контрольной для флага `drop` (default: 0.1)
+        `control`: Коэффициент контрольной работы (default: `CONTROL_COEFF`)
+        `min_count`: Флаги ставятся только предметам, где отметок не меньше (default: 3)
+        `chunk`: Сколько пар ученик-предмет обрабатывается одним блоком (default: 4096)
+
+    Возвращает:
+        Список `Trend` по ученикам в порядке `tables`, внутри - в порядке предметов; предметы без отметок пропускаются
+
+    Важно:
+        Все величины считаются на дату последней отметки предмета
+    """
+    tables = [t if isinstance(t, MarksTable) else MarksTable.from_marks(t) for t in tables]
+    names = list(names) if names is not None else [f"Ученик {idx + 1}" for idx in range(len(tables))]
+    series = _Series(tables, names)
+    chunk = max(chunk, 1)
+    blocks = [_block(series, first, min(first + chunk, len(series)), halflife, window, span, recent, drop, control)
+              for first in range(0, len(series), chunk)]
+    if not blocks:
+        return []
+    values = {key: np.concatenate([block[key] for block in blocks]) for key in blocks[0]}
+    fired, scores = _scores(values, horizon, min_count)
+
+    # Объекты собираются из списков: поштучное обращение к элементам массивов в разы медленнее
+    keep = np.flatnonzero(values["count"] > 0)
+    columns = {key: values[key][keep] for key in values}
+    codes = (fired[keep] * (1 << np.arange(len(FLAGS)))).sum(axis=1).tolist()
+    flag_sets = [tuple(name for bit, name in enumerate(FLAGS) if code >> bit & 1) for code in range(1 << len(FLAGS))]
+    drops = [None if delta is None else Drop(Date.fromordinal(day).strftime("%d.%m.%Y"), int(value),
+                                             series.work_types[work_type], delta)
+             for delta, day, value, work_type in zip(_column(columns["drop_delta"], 2), columns["drop_date"].tolist(),
+                                                     columns["drop_mark"].tolist(), columns["drop_work_type"].tolist())]
+    return [Trend(series.students[student], series.subjects[idx], *fields, drop, flag_sets[code], score)
+            for idx, student, *fields, drop, code, score in zip(
+                keep.tolist(), series.student_id[keep].tolist(), columns["count"].tolist(), columns["mean"].tolist(),
+                columns["grade"].tolist(), _column(columns["ewma"], 2), _column(columns["rolling"], 2),
+                _column(columns["slope"] * 7, 3), _column(columns["boundary"], 2), _column(columns["days"], 1),
+                drops, codes, _column(scores[keep], 3))]
+
+
+def rank(trends: list, top: int = None) -> list:
+    '''Предупреждения (тренды хотя бы с одним флагом) по убыванию `score`; при равенстве - ближе к границе'''
+    flagged = [t for t in trends if t.flags]
+    flagged.sort(key=lambda t: (-t.score, t.days_to_boundary if t.days_to_boundary is not None else float("inf")))
+    return flagged[:top] if top is not None else flagged
+
+
+def _load(args):
+    '''Разбирает выгрузку в процессе пула: `(файл, имя ученика, MarksTable или None, ошибка)`'''
+    file_path, engine, cache_folder = args
+    try:
+        cache = d.WorkbookCache(cache_folder) if cache_folder else None
+        info, _, table = d.parse_workbook(file_path, engine, cache)
+        if table == "":
+            raise ValueError("В файле отсутствуют комментарии к отметкам")
+        return file_path, str(info.get("Обучающийся") or os.path.basename(file_path)), table, None
+    except Exception as e:
+        return file_path, None, None, f"{type(e).__name__}: {e}"
+
+
+def scan_files(files: list, workers: int = None, chunksize: int = 4, engine: str = "xml", cache_folder: str = None,
+               **options) -> tuple[list, dict]:
+    """
+    Разбирает выгрузки учеников в пуле процессов и считает тренды
+
+    Аргументы:
+        `files`: Пути к файлам .xlsx
+        `workers`: Количество процессов; при 1 разбор идёт в текущем процессе (default: количество ядер)
+        `chunksize`: Сколько файлов отдаётся процессу за раз (default: 4)
+        `engine`: Способ чтения книги (default: "xml")
+        `cache_folder`: Папка `WorkbookCache` (default: None)
+        `options`: Параметры `scan`
+
+    Возвращает:
+        Кортеж `(trends, errors)`, где `errors` - `{файл: ошибка}` для файлов, которые не разобрались
+    """
+    jobs = [(path, engine, cache_folder) for path in files]
+    if workers == 1 or len(jobs) <= 1:
+        loaded = list(map(_load, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            loaded = list(pool.map(_load, jobs, chunksize=max(chunksize, 1)))
+    ok = [(name, table) for _, name, table, error in loaded if error is None]
+    errors = {path: error for path, _, _, error in loaded if error is not None}
+    return scan([table for _, table in ok], [name for name, _ in ok], **options), errors
+
+
+def format_trend(trend: Trend) -> str:
+    '''Одна строка предупреждения для вывода в консоль'''
+    parts = [f'{trend.mean:.2f} ({trend.grade}), форма {trend.ewma:.2f}']
+    if trend.slope is not None:
+        parts.append(f'{trend.slope:+.2f} в неделю')
+    if trend.days_to_boundary is not None:
+        parts.append(f'до {trend.boundary:.2f} ~{trend.days_to_boundary:.0f} дн.')
+    if trend.drop is not None:
+        parts.append(f'{trend.drop.work_type or "контрольная"} {trend.drop.date}: {trend.drop.mark}, {trend.drop.delta:+.2f}')
+    return f'{trend.student} - {trend.subject}: {", ".join(parts)} [{", ".join(trend.flags)}]'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Тренды среднего балла и ранние предупреждения по выгрузкам учеников")
+    parser.add_argument("source", help="папка или маска файлов (относительно папки data)")
+    parser.add_argument("--workers", type=int, default=None, help="количество процессов (по умолчанию - число ядер)")
+    parser.add_argument("--chunksize", type=int, default=4, help="сколько файлов отдавать процессу за раз")
+    parser.add_argument("--engine", choices=["xml", "openpyxl"], default="xml", help="способ чтения книги")
+    parser.add_argument("--cache", nargs="?", const=True, default=None,
+                        help="использовать кэш разобранных книг (можно указать папку)")
+    parser.add_argument("--halflife", type=float, default=14, help="полураспад веса отметки в днях")
+    parser.add_argument("--horizon", type=float, default=21, help="за сколько дней предупреждать о границе")
+    parser.add_argument("--top", type=int, default=20, help="сколько предупреждений вывести")
+    parser.add_argument("--json", default=None, help="куда сохранить все тренды и предупреждения в JSON")
+    args = parser.parse_args(argv)
+
+    files = batch.collect_files(args.source)
+    if not files:
+        print(f'{'\033[31m'}По запросу "{args.source}" не найдено ни одного файла .xlsx{'\033[0m'}')
+        return 1
+    started = time.perf_counter()
+    trends, errors = scan_files(files, args.workers, args.chunksize, args.engine, d.resolve_cache(args.cache),
+                                halflife=args.halflife, horizon=args.horizon)
+    elapsed = time.perf_counter() - started
+    ranked = rank(trends)
+    for idx, trend in enumerate(ranked[:args.top], 1):
+        print(f'{idx:>4}. {format_trend(trend)}')
+    print(f'\nПредметов: {len(trends)}, предупреждений: {len(ranked)}, файлов с ошибками: {len(errors)}, '
+          f'время: {elapsed:.2f} с')
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump({"alerts": [t.to_dict() for t in ranked], "trends": [t.to_dict() for t in trends],
+                       "errors": errors}, file, ensure_ascii=False, indent=2)
+    return 0 if not errors else 2
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,5 +1,12 @@
+import os
 import data_processing as d
+import profiling
+from marks_table import MarksTable
+from resample import short_date
+from stats import compute_stats, min_marks, running_means, weighted_mean
 
+# Распределение оценок, которое копит countMean. Не сбрасывается между вызовами,
+# поэтому для нескольких анализов в одном процессе используйте analysis.analyze и formatReport
 totalEst = [0, 0, 0, 0, 0]
 
 def setColorOfScore(score):
@@ -16,47 +23,43 @@ def setColorOfScore(score):
         color = '\033[1;92m'  # зеленый
     return color
 
+@profiling.timed("count_total_score")
 def countTotalScore(allMarks):
-    marks = []
-    coeffs = []
+    """
+    Считаем среднее всех отметок по всем предметам
+
+    Принимает:
+        allMarks - массив всех оценок для каждого предмета (словарь из extract_marks или MarksTable)
+    """
+    if isinstance(allMarks, MarksTable):
+        return compute_stats(allMarks).total_score
+    marks, coeffs = [], []
     for i in allMarks:
         for j in allMarks[i]:
             marks.append(j["Отметка"])
             coeffs.append(j["Коэффициент"])
-    for i in range(len(marks)):
-        marks[i] = marks[i] * coeffs[i]
-    totalScore = round(sum(marks) / sum(coeffs), 2)
-    return totalScore
+    return weighted_mean(marks, coeffs)
 
+@profiling.timed("count_mean")
 def countMean(subject, allMarks, period):
     """
     Считаем средний балл
 
     Принимает:
         subject - название предмета (если нужно несколько предметов то предметы через пробел)
-        allMarks - массив всех оценок для каждого предмета
+        allMarks - массив всех оценок для каждого предмета (словарь из extract_marks или MarksTable)
 
     Возвращает для вывода в цикле:
         {subject} - {score} ~ {roundScore}, где subject - предмет; score - средний балл;
          roundScore - округленный средний балл
     """
-    minNumOfEstimates = 0
-    if 'четверть' in period:
-        minNumOfEstimates = 3
-    elif 'полугодие' in period:
-        minNumOfEstimates = 6
-    elif period == 'Год':
-        minNumOfEstimates = 12
-
-    marks = d.refactor_marks(allMarks, subject)[1]
-    coeffs = d.refactor_marks(allMarks, subject)[2]
+    minNumOfEstimates = min_marks(period)
+
+    _, marks, coeffs = d.refactor_marks(allMarks, subject)
     if marks == [] or coeffs == []:
         return f'{subject} - нет оценок'
 
-    for i in range(len(marks)):
-        marks[i] = marks[i] * coeffs[i]
-
-    score = round(sum(marks) / sum(coeffs), 2)
+    score = weighted_mean(marks, coeffs)
     roundScore = round(score + 0.01)
     if len(marks) < minNumOfEstimates:
         return f'{subject} - {score} ~ {roundScore} (не хватает {minNumOfEstimates - len(marks)} оценок)'
@@ -64,67 +67,101 @@ def countMean(subject, allMarks, period):
         totalEst[-roundScore + 5] += 1
         return f'{subject} - {score} ~ {setColorOfScore(roundScore)}{roundScore}{'\033[0m'}'
 
+def formatSubject(result):
+    """
+    Форматируем итог по предмету для вывода в консоль (в том же виде, что и countMean)
+
+    Принимает:
+        result - analysis.SubjectResult
+    """
+    if not result.count:
+        return f'{result.name} - нет оценок'
+    if result.missing:
+        return f'{result.name} - {result.mean} ~ {result.grade} (не хватает {result.missing} оценок)'
+    return f'{result.name} - {result.mean} ~ {setColorOfScore(result.grade)}{result.grade}{'\033[0m'}'
+
+def formatReport(report):
+    """
+    Форматируем весь отчёт для вывода в консоль
+
+    Принимает:
+        report - analysis.Report
+
+    Возвращает:
+        строку со сведениями об ученике, средними баллами по предметам и итогами
+    """
+    lines = ['\n']
+    lines += [f'{key}: {value}' for key, value in report.info.items()]
+    lines.append('\nСредний балл по всем предметам:\n')
+    lines += [formatSubject(result) for result in report.subjects]
+    if report.total_score is None:
+        lines.append('___________________________\nСреднее всех средних баллов - нет оценок')
+    else:
+        lines.append(f'___________________________\nСреднее всех средних баллов - {setColorOfScore(report.total_score)}{report.total_score}{'\033[0m'}')
+    five, four, three, two, one = report.histogram
+    lines.append(f'Итого: {five} пятёрок; {four} четверок; {three} троек; {two} двоек; {one} единиц; не хватает оценок у {report.incomplete} предметов')
+    return '\n'.join(lines)
+
+@profiling.timed("score_mass")
 def extractScoreMass(subject, allMarks):
     """
     Создаем массив изменений среднего балла
 
     Принимает:
         subject - название предмета (если нужно несколько предметов то предметы через пробел)
-        allMarks - массив всех оценок для каждого предмета
+        allMarks - массив всех оценок для каждого предмета (словарь из extract_marks или MarksTable)
 
     Возвращает:
         простой массив изменений среднего балла
     """
-    marks = d.refactor_marks(allMarks, subject)[1]
-    coeffs = d.refactor_marks(allMarks, subject)[2]
-    marks = [x * y for x, y in zip(marks, coeffs)]
-    scores = []
-    for i in range(len(marks)):
-        scores.append(round(sum(marks[:i + 1]) / sum(coeffs[:i + 1]), 2))
-    return scores
-
-def drawGraph(subject: str, scores: list, dates: list):
+    _, marks, coeffs = d.refactor_marks(allMarks, subject)
+    return running_means(marks, coeffs).tolist()
+
+def drawGraph(subject: str, scores: list, dates: list, path: str = None):
     """
     Рисуем график изменения среднего балла
 
     Принимает:
         subject - название предмета (если нужно нарисовать несколько предметов то предметы через пробел)
         scores - массив изменений среднего балла у данного предмета
-        dates - массив дат оценок у данного предмета
+        dates - массив дат оценок у данного предмета ("dd.mm.yyyy", date, порядковые номера дней или готовые подписи периодов)
+        path - куда сохранить картинку (по умолчанию data/graph.png в корне проекта)
+
+    Для рисования без окна и в память есть render.render_graph
     """
-    from datetime import datetime as dt
-    from matplotlib import pyplot as plt
-    dates = [dt.strptime(i, '%d.%m.%Y') for i in dates]
-    dates = [f'{str(i.day).zfill(2)}.{str(i.month).zfill(2)}' for i in dates]
-    plt.title(f'График изменения среднего балла по предмету\n{subject}')
-
-    minLim = (min(scores) - 0.5 if min(scores) - 0.5 >= 1 else 1) - 0.07
-    maxLim = (max(scores) + 0.5 if max(scores) + 0.5 <= 5 else 5) + 0.07
-    plt.ylim(minLim, maxLim)
-    colors = ['black', 'red', 'orange', 'green']
-    # отрисовка линий границ изменения ср. балла (2.5, 3.5, 4.5)
-    for i in [1.5, 2.5, 3.5, 4.5]:
-        if minLim <= i <= maxLim:
-            plt.axhline(y=i, color=colors[[1.5, 2.5, 3.5, 4.5].index(i)], linestyle='--')
-
-    numberOfDates = len(dates)
-    plt.xticks(rotation=-70, fontsize=10)
-    if numberOfDates > 20:
-        plt.xticks(fontsize=8)
-    plt.plot(dates, scores, 'r-o')
-    plt.grid()
-    if numberOfDates > 10:
-        if numberOfDates <= 15:
-            size = (9.6, 5.4)
-        elif numberOfDates <= 30:
-            size = (10.66, 6.0)
-        elif 30 < numberOfDates < 40:
-            size = (12.8, 7.2)
-        else:
-            size = (16, 9)
-        figure = plt.gcf()
-        figure.set_size_inches(size)
-    plt.savefig('../data/graph.png', bbox_inches='tight')
+    # В этап не входит plt.show(): окно с графиком открыто, пока его не закроет пользователь
+    with profiling.stage("draw_graph"):
+        from matplotlib import pyplot as plt
+        dates = [short_date(i) for i in dates]
+        plt.title(f'График изменения среднего балла по предмету\n{subject}')
+
+        minLim = (min(scores) - 0.5 if min(scores) - 0.5 >= 1 else 1) - 0.07
+        maxLim = (max(scores) + 0.5 if max(scores) + 0.5 <= 5 else 5) + 0.07
+        plt.ylim(minLim, maxLim)
+        colors = ['black', 'red', 'orange', 'green']
+        # отрисовка линий границ изменения ср. балла (2.5, 3.5, 4.5)
+        for i in [1.5, 2.5, 3.5, 4.5]:
+            if minLim <= i <= maxLim:
+                plt.axhline(y=i, color=colors[[1.5, 2.5, 3.5, 4.5].index(i)], linestyle='--')
+
+        numberOfDates = len(dates)
+        plt.xticks(rotation=-70, fontsize=10)
+        if numberOfDates > 20:
+            plt.xticks(fontsize=8)
+        plt.plot(dates, scores, 'r-o')
+        plt.grid()
+        if numberOfDates > 10:
+            if numberOfDates <= 15:
+                size = (9.6, 5.4)
+            elif numberOfDates <= 30:
+                size = (10.66, 6.0)
+            elif 30 < numberOfDates < 40:
+                size = (12.8, 7.2)
+            else:
+                size = (16, 9)
+            figure = plt.gcf()
+            figure.set_size_inches(size)
+        plt.savefig(path or os.path.join(d.folder_root, 'graph.png'), bbox_inches='tight')
     plt.show()
 
 # def main():
@@ -0,0 +1,394 @@
+"""
+Хранилище отметок многих учеников и периодов в SQLite.
+
+Выгрузки разбираются один раз (в пуле процессов) и целиком, одной транзакцией
+через `executemany`, складываются в локальную базу. Дальше вопросы «по всем
+четвертям» и «по всему классу» решаются запросами к базе без открытия книг:
+средневзвешенный балл (`SUM(mark * coeff) / SUM(coeff)` с группировкой) и ряд
+изменения среднего балла (оконные суммы `OVER (ORDER BY date, ...)`) считает
+сама SQLite. По отметкам есть индексы `(student_id, subject_id, date)` и
+`(work_type_id)`.
+
+Одна выгрузка - одна запись `exports`, ключ - хэш содержимого файла. Хэши всех
+когда-либо загруженных выгрузок хранятся в `digests`, поэтому повторная загрузка
+того же файла пропускается. Из двух выгрузок одного ученика за один период в базе
+остаётся более новая - с более поздней последней отметкой (при равенстве - с
+большим числом отметок), независимо от порядка загрузки. Хэш вытесненной выгрузки
+остаётся в `digests`, так что повторная загрузка той же папки ничего не меняет.
+
+Запуск:
+    python ./src/warehouse.py ingest <папка или маска> [--db файл] [--workers N]
+    python ./src/warehouse.py means [--db файл] [--student ФИО] [--subject ПРЕДМЕТ] [--from ДАТА] [--to ДАТА]
+"""
+import argparse, json, os, sqlite3, time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date as Date
+
+import numpy as np
+
+import batch
+import data_processing as d
+from marks_table import MarksTable, date_to_ordinal
+from stats import _exact_mean, _round2, round_mean
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    class TEXT NOT NULL DEFAULT '',
+    organization TEXT NOT NULL DEFAULT '',
+    UNIQUE (name, class, organization)
+);
+CREATE TABLE IF NOT EXISTS exports (
+    id INTEGER PRIMARY KEY,
+    student_id INTEGER NOT NULL REFERENCES students (id),
+    digest TEXT UNIQUE,
+    file TEXT,
+    period TEXT NOT NULL DEFAULT '',
+    last_date TEXT NOT NULL DEFAULT '',
+    count INTEGER NOT NULL DEFAULT 0,
+    info TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS digests (digest TEXT PRIMARY KEY, student_id INTEGER NOT NULL, period TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS subjects (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS work_types (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS marks (
+    export_id INTEGER NOT NULL REFERENCES exports (id),
+    student_id INTEGER NOT NULL REFERENCES students (id),
+    subject_id INTEGER NOT NULL REFERENCES subjects (id),
+    date TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    mark INTEGER NOT NULL,
+    work_type_id INTEGER NOT NULL REFERENCES work_types (id),
+    coeff REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS marks_student_subject_date ON marks (student_id, subject_id, date);
+CREATE INDEX IF NOT EXISTS marks_work_type ON marks (work_type_id);
+CREATE INDEX IF NOT EXISTS marks_export ON marks (export_id);
+CREATE INDEX IF NOT EXISTS exports_student_period ON exports (student_id, period);
+"""
+
+# Средний балл одной группы отметок: ученик, предмет (или тип работы), количество, средний балл до сотых и оценка
+MeanRow = namedtuple("MeanRow", ["student", "subject", "count", "mean", "grade"])
+# Одна точка ряда изменения среднего балла
+RunningRow = namedtuple("RunningRow", ["date", "mark", "work_type", "coeff", "mean"])
+
+
+def _iso(value) -> str | None:
+    '''Дата ("dd.mm.yyyy", `date` или порядковый номер) в виде "yyyy-mm-dd", как она хранится в базе'''
+    if value is None:
+        return None
+    ordinal = int(value) if isinstance(value, (int, np.integer)) else date_to_ordinal(value)
+    return Date.fromordinal(ordinal).isoformat()
+
+
+def read_export(file_path: str, engine: str = "xml"):
+    '''Разбирает выгрузку для загрузки в базу. Выполняется в процессе пула'''
+    info, subjects, table = d.parse_workbook(file_path, engine)
+    if table == "":
+        raise ValueError("В файле отсутствуют комментарии к отметкам")
+    return info, subjects, table
+
+
+def _read_job(args):
+    file_path, engine = args
+    try:
+        return file_path, read_export(file_path, engine), None
+    except Exception as e:
+        return file_path, None, f"{type(e).__name__}: {e}"
+
+
+class Warehouse:
+    """
+    База отметок
+
+    Аргументы:
+        `path`: Путь к файлу базы; ":memory:" - база в памяти (default: `marks.sqlite` в папке `folder_root`,
+            определяется при открытии базы)
+
+    Важно:
+        Даты в базе хранятся строками "yyyy-mm-dd", так что их можно сравнивать и передавать в
+        функции дат SQLite. Границы периода в запросах включаются и задаются как "dd.mm.yyyy" или `date`
+    """
+    def __init__(self, path: str = None):
+        path = path if path is not None else os.path.join(d.folder_root, 'marks.sqlite')
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        if path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode = WAL")
+            self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def _ids(self, table: str, names) -> dict:
+        '''Номера строк справочника `subjects` или `work_types`, недостающие добавляются'''
+        names = list(dict.fromkeys(names))
+        self.conn.executemany(f"INSERT OR IGNORE INTO {table} (name) VALUES (?)", [(name,) for name in names])
+        ids = {}
+        for start in range(0, len(names), 500):
+            chunk = names[start:start + 500]
+            query = f"SELECT name, id FROM {table} WHERE name IN ({', '.join('?' * len(chunk))})"
+            ids.update(self.conn.execute(query, chunk).fetchall())
+        return ids
+
+    def _student_id(self, info: dict, file_path: str = None) -> int:
+        name = str(info.get('Обучающийся') or os.path.basename(file_path or '') or '')
+        key = (name, str(info.get('Класс') or ''), str(info.get('Организация') or ''))
+        self.conn.execute("INSERT OR IGNORE INTO students (name, class, organization) VALUES (?, ?, ?)", key)
+        return self.conn.execute("SELECT id FROM students WHERE name = ? AND class = ? AND organization = ?", key).fetchone()[0]
+
+    def has_export(self, digest: str) -> bool:
+        '''Выгрузка с таким ключом уже загружалась (в том числе если её потом вытеснила более новая)'''
+        return self.conn.execute("SELECT 1 FROM digests WHERE digest = ?", (digest,)).fetchone() is not None
+
+    def _insert(self, info: dict, subjects: dict, marks, file_path: str = None, digest: str = None) -> int | None:
+        '''Добавляет одну выгрузку в текущей транзакции: количество отметок или None, если в базе выгрузка новее'''
+        table = marks if isinstance(marks, MarksTable) else MarksTable.from_marks(marks)
+        student_id = self._student_id(info, file_path)
+        period = str(info.get('Период') or '')
+        last_date = _iso(int(table.date.max())) if len(table) else ''
+        if digest is not None:
+            self.conn.execute("INSERT OR IGNORE INTO digests (digest, student_id, period) VALUES (?, ?, ?)",
+                              (digest, student_id, period))
+        # Из выгрузок ученика за один период остаётся более новая; хэш - только чтобы порядок загрузки не влиял на итог
+        key = (last_date, len(table), digest or '')
+        old = self.conn.execute("SELECT id, last_date, count, COALESCE(digest, '') FROM exports "
+                                "WHERE student_id = ? AND period = ?", (student_id, period)).fetchall()
+        if any(tuple(row[1:]) >= key for row in old):
+            return None
+        self.conn.executemany("DELETE FROM marks WHERE export_id = ?", [(row[0],) for row in old])
+        self.conn.executemany("DELETE FROM exports WHERE id = ?", [(row[0],) for row in old])
+        export_id = self.conn.execute(
+            "INSERT INTO exports (student_id, digest, file, period, last_date, count, info) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (student_id, digest, file_path, period, last_date, len(table),
+             json.dumps(batch._plain_info(info), ensure_ascii=False))).lastrowid
+
+        subject_ids = self._ids("subjects", list(subjects.values()) + table.subjects)
+        work_ids = self._ids("work_types", table.work_types)
+        subject_map = [subject_ids[name] for name in table.subjects]
+        work_map = [work_ids[name] for name in table.work_types]
+        dates = {ordinal: _iso(ordinal) for ordinal in np.unique(table.date).tolist()}
+        # Номер отметки внутри предмета: задаёт порядок отметок одного дня в ряде среднего балла
+        seq = np.arange(len(table)) - np.repeat(table.offsets[:-1], np.diff(table.offsets))
+        rows = zip(
+            [subject_map[x] for x in table.subject_id.tolist()],
+            [dates[x] for x in table.date.tolist()],
+            seq.tolist(),
+            table.mark.tolist(),
+            [work_map[x] for x in table.work_type_id.tolist()],
+            table.coeff.tolist(),
+        )
+        self.conn.executemany(
+            "INSERT INTO marks (export_id, student_id, subject_id, date, seq, mark, work_type_id, coeff) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            ((export_id, student_id, *row) for row in rows))
+        return len(table)
+
+    def add_export(self, info: dict, subjects: dict, marks, file_path: str = None, digest: str = None) -> int:
+        """
+        Добавляет одну разобранную выгрузку отдельной транзакцией
+
+        Аргументы:
+            `info`, `subjects`, `marks`: Результат `parse_workbook` (`marks` - `MarksTable` или словарь `extract_marks`)
+            `file_path`: Путь к исходному файлу (для справки)
+            `digest`: Ключ выгрузки; выгрузка с уже известным ключом не добавляется
+
+        Возвращает:
+            Количество добавленных отметок; 0 - если выгрузка уже загружалась или в базе есть более новая
+            выгрузка этого ученика за тот же период
+        """
+        if digest is not None and self.has_export(digest):
+            return 0
+        with self.conn:
+            return self._insert(info, subjects, marks, file_path, digest) or 0
+
+    def ingest(self, files: list, workers: int = None, chunksize: int = 4, engine: str = "xml") -> dict:
+        """
+        Разбирает выгрузки в пуле процессов и загружает их в базу одной транзакцией
+
+        Аргументы:
+            `files`: Пути к файлам .xlsx
+            `workers`: Количество процессов; при 1 разбор идёт в текущем процессе (default: количество ядер)
+            `chunksize`: Сколько файлов отдаётся процессу за раз (default: 4)
+            `engine`: Способ чтения книги (default: "xml")
+
+        Возвращает:
+            Сводку: `added`, `skipped` (уже были в базе или повторяются в `files`), `superseded` (в базе
+            есть более новая выгрузка ученика за тот же период), `failed`, `errors`, `marks`, `elapsed`
+        """
+        started = time.perf_counter()
+        digests = {path: d.WorkbookCache.key(path) for path in files}
+        # Одинаковые файлы внутри пакета тоже разбираются один раз
+        unique = {digest: path for path, digest in reversed(digests.items())}
+        pending = [path for path in files if unique[digests[path]] == path and not self.has_export(digests[path])]
+        jobs = [(path, engine) for path in pending]
+        if workers == 1 or len(jobs) <= 1:
+            parsed = map(_read_job, jobs)
+            pool = None
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers)
+            parsed = pool.map(_read_job, jobs, chunksize=max(chunksize, 1))
+        summary = {"added": 0, "skipped": len(files) - len(pending), "superseded": 0, "failed": 0, "errors": {}, "marks": 0}
+        try:
+            with self.conn:
+                for path, result, error in parsed:
+                    if error is not None:
+                        summary["failed"] += 1
+                        summary["errors"][path] = error
+                        continue
+                    count = self._insert(*result, file_path=path, digest=digests[path])
+                    if count is None:
+                        summary["superseded"] += 1
+                        continue
+                    summary["marks"] += count
+                    summary["added"] += 1
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        summary["elapsed"] = round(time.perf_counter() - started, 4)
+        return summary
+
+    def _filters(self, student=None, subject=None, start=None, end=None, work_type=None) -> tuple[str, list]:
+        '''Условие WHERE по ученику, предмету, периоду и типу работы'''
+        conditions, params = [], []
+        if student is not None:
+            conditions.append("m.student_id IN (SELECT id FROM students WHERE name = ?)")
+            params.append(student)
+        if subject is not None:
+            conditions.append("m.subject_id = (SELECT id FROM subjects WHERE name = ?)")
+            params.append(subject)
+        if start is not None:
+            conditions.append("m.date >= ?")
+            params.append(_iso(start))
+        if end is not None:
+            conditions.append("m.date <= ?")
+            params.append(_iso(end))
+        if work_type is not None:
+            conditions.append("m.work_type_id = (SELECT id FROM work_types WHERE name = ?)")
+            params.append(work_type)
+        return ("WHERE " + " AND ".join(conditions)) if conditions else "", params
+
+    def _exact(self, where: str, params: list, student_id: int, group_column: str, group_id: int) -> float:
+        '''Средний балл группы, посчитанный встроенным `sum` (для значений на середине между сотыми)'''
+        rows = self.conn.execute(
+            f"SELECT m.mark * m.coeff, m.coeff FROM marks m {where} {'AND' if where else 'WHERE'} "
+            f"m.student_id = ? AND m.{group_column} = ? ORDER BY m.date, m.export_id, m.subject_id, m.seq",
+            [*params, student_id, group_id]).fetchall()
+        return _exact_mean(np.array([r[0] for r in rows]), np.array([r[1] for r in rows]))
+
+    def _means(self, group_column: str, name_table: str, **filters) -> list:
+        where, params = self._filters(**filters)
+        query = (f"SELECT m.student_id, s.name, g.id, g.name, COUNT(*), SUM(m.mark * m.coeff) / SUM(m.coeff) "
+                 f"FROM marks m JOIN students s ON s.id = m.student_id JOIN {name_table} g ON g.id = m.{group_column} "
+                 f"{where} GROUP BY m.student_id, m.{group_column} ORDER BY s.name, m.student_id, g.name")
+        result = []
+        for student_id, student, group_id, group, count, value in self.conn.execute(query, params):
+            mean = round_mean(value, lambda: self._exact(where, params, student_id, group_column, group_id))
+            result.append(MeanRow(student, group, count, mean, round(mean + 0.01)))
+        return result
+
+    def subject_means(self, student: str = None, subject: str = None, start=None, end=None, work_type: str = None) -> list:
+        """
+        Средний балл по предметам, средневзвешенное считает SQLite
+
+        Аргументы:
+            `student`: ФИО ученика (default: все ученики)
+            `subject`: Предмет (default: все предметы)
+            `start`, `end`: Первый и последний день периода (default: без ограничения)
+            `work_type`: Только отметки за этот тип работы (default: все)
+
+        Возвращает:
+            Список `MeanRow` по парам ученик-предмет, округление как в `countMean`
+        """
+        return self._means("subject_id", "subjects", student=student, subject=subject, start=start, end=end,
+                           work_type=work_type)
+
+    def work_type_means(self, student: str = None, subject: str = None, start=None, end=None) -> list:
+        '''Средний балл и количество отметок по типам работ: `MeanRow`, где в поле `subject` - тип работы'''
+        return self._means("work_type_id", "work_types", student=student, subject=subject, start=start, end=end)
+
+    def running_means(self, student: str, subject: str, start=None, end=None) -> list:
+        """
+        Ряд изменения среднего балла ученика по предмету через оконные суммы SQLite
+
+        Возвращает:
+            Список `RunningRow` в порядке отметок; `mean` - средний балл с учётом всех отметок
+            периода до этой включительно (как `extractScoreMass`). Если учеников с таким ФИО
+            несколько, их ряды идут друг за другом и считаются отдельно
+        """
+        where, params = self._filters(student=student, subject=subject, start=start, end=end)
+        window = ("OVER (PARTITION BY m.student_id, m.subject_id ORDER BY m.date, m.export_id, m.seq "
+                  "ROWS UNBOUNDED PRECEDING)")
+        rows = self.conn.execute(
+            f"SELECT m.date, m.mark, w.name, m.coeff, SUM(m.mark * m.coeff) {window} / SUM(m.coeff) {window}, "
+            f"m.student_id, m.subject_id FROM marks m JOIN work_types w ON w.id = m.work_type_id {where} "
+            f"ORDER BY m.student_id, m.subject_id, m.date, m.export_id, m.seq",
+            params).fetchall()
+        products = np.array([row[1] * row[3] for row in rows], dtype=np.float64)
+        coeffs = np.array([row[3] for row in rows], dtype=np.float64)
+        # Начало группы (ученик, предмет) для каждой строки: у тёзок ряды считаются отдельно
+        groups = np.array([(row[5], row[6]) for row in rows], dtype=np.int64).reshape(-1, 2)
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = (groups[1:] != groups[:-1]).any(axis=1)
+        starts = np.maximum.accumulate(np.where(first, np.arange(len(rows)), 0))
+        means = _round2(np.array([row[4] for row in rows], dtype=np.float64),
+                        lambda i: _exact_mean(products[starts[i]:i + 1], coeffs[starts[i]:i + 1]))
+        return [RunningRow(Date.fromisoformat(row[0]).strftime("%d.%m.%Y"), row[1], row[2], row[3], mean)
+                for row, mean in zip(rows, means.tolist())]
+
+    def students(self) -> list:
+        '''ФИО учеников в базе'''
+        return [row[0] for row in self.conn.execute("SELECT DISTINCT name FROM students ORDER BY name")]
+
+    def counts(self) -> dict:
+        '''Количество учеников, выгрузок и отметок в базе'''
+        return {table: self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("students", "exports", "marks")}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Хранилище отметок в SQLite")
+    parser.add_argument("--db", default=None, help="файл базы (default: data/marks.sqlite)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest = commands.add_parser("ingest", help="загрузить выгрузки в базу")
+    ingest.add_argument("source", help="папка или маска файлов (относительно папки data)")
+    ingest.add_argument("--workers", type=int, default=None, help="количество процессов (по умолчанию - число ядер)")
+    ingest.add_argument("--chunksize", type=int, default=4, help="сколько файлов отдавать процессу за раз")
+    ingest.add_argument("--engine", choices=["xml", "openpyxl"], default="xml", help="способ чтения книги")
+    means = commands.add_parser("means", help="средний балл по предметам из базы")
+    means.add_argument("--student", default=None, help="ФИО ученика")
+    means.add_argument("--subject", default=None, help="предмет")
+    means.add_argument("--from", dest="start", default=None, metavar="ДД.ММ.ГГГГ", help="первый день периода")
+    means.add_argument("--to", dest="end", default=None, metavar="ДД.ММ.ГГГГ", help="последний день периода")
+    args = parser.parse_args(argv)
+
+    with Warehouse(args.db) as warehouse:
+        if args.command == "ingest":
+            files = batch.collect_files(args.source)
+            if not files:
+                print(f'{'\033[31m'}По запросу "{args.source}" не найдено ни одного файла .xlsx{'\033[0m'}')
+                return 1
+            summary = warehouse.ingest(files, args.workers, args.chunksize, args.engine)
+            for path, error in summary["errors"].items():
+                print(f'{'\033[31m'}{os.path.basename(path)}: {error}{'\033[0m'}')
+            print(f'Загружено выгрузок: {summary["added"]}, уже были в базе: {summary["skipped"]}, '
+                  f'вытеснены более новыми: {summary["superseded"]}, '
+                  f'с ошибками: {summary["failed"]}, отметок: {summary["marks"]}, время: {summary["elapsed"]} с')
+            return 0 if not summary["failed"] else 2
+        for row in warehouse.subject_means(args.student, args.subject, args.start, args.end):
+            print(f'{row.student} | {row.subject} - {row.mean} ~ {row.grade} ({row.count} отм.)')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
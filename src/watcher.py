@@ -0,0 +1,431 @@
+"""
+Слежение за папкой `data`: новые и изменённые выгрузки обрабатываются сами.
+
+Запуск:
+    python ./src/watcher.py [папка] [--workers N] [--settle 1.0] [--poll 2.0] [--no-inotify] [--once]
+
+В Linux изменения в папке приходят от inotify (через ctypes, без сторонних
+пакетов), и в простое процесс спит в `select`. В других системах или если
+inotify недоступен, папка опрашивается раз в `--poll` секунд по размеру и
+времени изменения файлов.
+
+Файл берётся в работу, только когда он `--settle` секунд не менялся: недописанная
+выгрузка не разбирается. Перед постановкой в очередь считается хэш содержимого
+(тот же ключ, что у `WorkbookCache`). Если выгрузка с таким содержимым уже
+обрабатывалась, она пропускается, а хэши хранятся в `.watch_state.json` и
+переживают перезапуск. В пул одновременно отдаётся не больше `--workers`
+файлов, остальные ждут в очереди: всплеск из сотен выгрузок разбирается
+по очереди и не раздувает память пула.
+
+Каждая выгрузка разбирается в мягком режиме (`Diagnostics`). Рядом с файлом
+пишутся отчёт `<имя>.report.json` (средние баллы, оценки, проблемы разбора) и
+сводка графиков `<имя>.dashboard.png` (`sparkline.dashboard`, без matplotlib).
+"""
+import argparse, ctypes, ctypes.util, json, os, select, signal, struct, sys, time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict
+
+import data_processing as d
+from analysis import analyze_marks
+from diagnostics import Diagnostics
+
+REPORT_SUFFIX = ".report.json"
+DASHBOARD_SUFFIX = ".dashboard.png"
+STATE_NAME = ".watch_state.json"
+
+# Константы inotify(7)
+_IN_MODIFY, _IN_CLOSE_WRITE, _IN_MOVED_TO, _IN_CREATE, _IN_Q_OVERFLOW = 0x2, 0x8, 0x80, 0x100, 0x4000
+_IN_NONBLOCK, _IN_CLOEXEC = getattr(os, "O_NONBLOCK", 0o4000), getattr(os, "O_CLOEXEC", 0o2000000)
+# Заголовок события: wd, mask, cookie, длина имени
+_EVENT = struct.Struct("iIII")
+
+
+def is_export(name: str) -> bool:
+    '''Файл выгрузки: .xlsx, но не временный файл Excel ("~$...") и не скрытый'''
+    return name.endswith(".xlsx") and not name.startswith(("~$", "."))
+
+
+class InotifySource:
+    '''Изменения в папке от inotify (Linux): в простое процесс спит в `select`, диск не опрашивается'''
+    def __init__(self, folder: str):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        mask = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+        if libc.inotify_add_watch(self._fd, os.fsencode(folder), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, os.strerror(errno), folder)
+
+    def wait(self, timeout: float) -> list | None:
+        '''Имена файлов, изменившихся за время ожидания; None - очередь событий переполнилась и папку нужно пересканировать'''
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self._fd, 1 << 16)
+        except BlockingIOError:
+            return []
+        names, offset = [], 0
+        while offset < len(data):
+            _, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if mask & _IN_Q_OVERFLOW:
+                return None
+            if name:
+                names.append(os.fsdecode(name))
+        return names
+
+    def close(self):
+        os.close(self._fd)
+
+
+class PollingSource:
+    '''Изменения в папке по снимку `(размер, mtime)` файлов, раз в `interval` секунд'''
+    def __init__(self, folder: str, interval: float = 2.0):
+        self.folder, self.interval = folder, interval
+        self._snapshot = self._scan()
+
+    def _scan(self) -> dict:
+        snapshot = {}
+        with os.scandir(self.folder) as it:
+            for entry in it:
+                if is_export(entry.name):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    snapshot[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def wait(self, timeout: float) -> list:
+        time.sleep(min(timeout, self.interval))
+        snapshot = self._scan()
+        changed = [name for name, signature in snapshot.items() if self._snapshot.get(name) != signature]
+        self._snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+
+def make_source(folder: str, inotify: bool = True, poll: float = 2.0):
+    '''inotify, если он есть и не отключён, иначе опрос папки'''
+    if inotify and sys.platform.startswith("linux"):
+        try:
+            return InotifySource(folder)
+        except (OSError, AttributeError):
+            # Нет libc с inotify или исчерпан лимит fs.inotify.max_user_instances
+            pass
+    return PollingSource(folder, poll)
+
+
+def process_export(file_path: str, engine: str = "xml", period: str = "day") -> dict:
+    """
+    Обрабатывает одну выгрузку. Выполняется в процессе пула
+
+    Аргументы:
+        `file_path`: Путь к выгрузке
+        `engine`: Способ чтения книги, как в `read_excel` (default: "xml")
+        `period`: Период точек графиков: "day", "week", "month" или "quarter" (default: "day")
+
+    Возвращает:
+        Словарь с ключами `file`, `status` ("ok" или "error"), `error`, `quality`, `report` и `dashboard`
+        (пути к записанным файлам) и `elapsed`
+    """
+    started = time.perf_counter()
+    stem = os.path.splitext(file_path)[0]
+    result = {"file": file_path, "status": "ok", "error": None, "quality": None, "report": None, "dashboard": None}
+    try:
+        diagnostics = Diagnostics(limit=100)
+        info, subjects, marks = d.parse_workbook(file_path, engine, diagnostics=diagnostics)
+        result["quality"] = diagnostics.quality
+        if not subjects and not diagnostics.complete:
+            raise ValueError(diagnostics.problems[-1].detail)
+        report = asdict(analyze_marks(info, marks))
+        report["info"] = {key: str(value) if value is not None else None for key, value in report["info"].items()}
+        report["diagnostics"] = diagnostics.to_dict()
+        if subjects:
+            # Pillow и sparkline нужны только здесь, процесс наблюдателя их не импортирует
+            import sparkline
+            result["dashboard"] = stem + DASHBOARD_SUFFIX
+            with d.atomic_write(result["dashboard"]) as file:
+                file.write(sparkline.dashboard(marks, freq=period))
+            report["dashboard"] = os.path.basename(result["dashboard"])
+        result["report"] = stem + REPORT_SUFFIX
+        with d.atomic_write(result["report"]) as file:
+            file.write(json.dumps(report, ensure_ascii=False, indent=2).encode("utf-8"))
+    except Exception as e:
+        result["status"], result["error"] = "error", f"{type(e).__name__}: {e}"
+    result["elapsed"] = round(time.perf_counter() - started, 4)
+    return result
+
+
+class FolderWatcher:
+    """
+    Следит за папкой и отдаёт новые и изменённые выгрузки пулу процессов
+
+    Аргументы:
+        `folder`: Папка с выгрузками (default: папка `data`)
+        `workers`: Количество процессов пула и файлов, обрабатываемых одновременно (default: 2)
+        `settle`: Сколько секунд файл должен не меняться, прежде чем его взять (default: 1.0)
+        `poll`: Интервал опроса папки, если inotify недоступен (default: 2.0)
+        `inotify`: Использовать inotify, если он есть (default: True)
+        `engine`, `period`: Как в `process_export` (default: "xml", "day")
+        `state_path`: Файл с хэшами обработанных выгрузок (default: `.watch_state.json` в папке)
+        `job`: Функция обработки `job(file_path, engine, period) -> dict` (default: `process_export`)
+        `executor`: Готовый пул; если задан, наблюдатель им не владеет и не закрывает его. Если этот пул
+            сломается (`BrokenProcessPool`), наблюдатель дальше работает со своим пулом на `workers` процессов
+        `on_result`: Вызывается с результатом `job` для каждого обработанного файла (default: None)
+
+    Атрибуты:
+        `counters`: Счётчики `events`, `processed`, `failed`, `skipped`
+    """
+    def __init__(self, folder: str = None, workers: int = 2, settle: float = 1.0, poll: float = 2.0,
+                 inotify: bool = True, engine: str = "xml", period: str = "day", state_path: str = None,
+                 job=process_export, executor=None, on_result=None):
+        folder = folder if folder is not None else d.folder_root
+        self.folder = folder
+        self.workers = max(workers, 1)
+        self.settle = settle
+        self.engine, self.period = engine, period
+        self.state_path = state_path or os.path.join(folder, STATE_NAME)
+        self.job = job
+        self.on_result = on_result
+        self.counters = {"events": 0, "processed": 0, "failed": 0, "skipped": 0}
+        self._source = make_source(folder, inotify, poll)
+        self._executor = executor
+        self._own_executor = executor is None
+        self._pending = {}   # имя -> (срок, (размер, mtime)): ждут, пока файл перестанет меняться
+        self._ready = {}     # имя -> хэш: ждут свободного процесса, в порядке поступления
+        self._running = {}   # future -> (имя, хэш, пул)
+        self._digests = self._load_state()
+
+    @property
+    def uses_inotify(self) -> bool:
+        return isinstance(self._source, InotifySource)
+
+    @property
+    def idle(self) -> bool:
+        '''Нет ни ожидающих, ни выполняющихся файлов'''
+        return not (self._pending or self._ready or self._running)
+
+    def _load_state(self) -> dict:
+        try:
+            with open(self.state_path, encoding="utf-8") as file:
+                return json.load(file)["files"]
+        except (FileNotFoundError, ValueError, KeyError):
+            return {}
+
+    def _save_state(self):
+        with d.atomic_write(self.state_path) as file:
+            file.write(json.dumps({"files": self._digests}, ensure_ascii=False).encode("utf-8"))
+
+    def _signature(self, name: str):
+        try:
+            stat = os.stat(os.path.join(self.folder, name))
+        except FileNotFoundError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def notice(self, name: str, now: float = None):
+        '''Файл изменился: откладываем его на `settle` секунд от последнего изменения'''
+        if is_export(name):
+            self.counters["events"] += 1
+            now = time.monotonic() if now is None else now
+            self._pending[name] = (now + self.settle, self._signature(name))
+
+    def rescan(self, now: float = None):
+        '''Ставит в ожидание все выгрузки папки и забывает хэши удалённых: при запуске и после переполнения очереди inotify'''
+        names = set()
+        with os.scandir(self.folder) as it:
+            for entry in it:
+                if entry.is_file():
+                    names.add(entry.name)
+                    self.notice(entry.name, now)
+        gone = [name for name in self._digests if name not in names]
+        for name in gone:
+            del self._digests[name]
+        if gone:
+            self._save_state()
+
+    def _settle(self, now: float):
+        '''Файлы, которые не менялись `settle` секунд, проверяются по хэшу и встают в очередь'''
+        for name, (deadline, signature) in list(self._pending.items()):
+            if deadline > now:
+                continue
+            current = self._signature(name)
+            if current is None:
+                # Файл удалён: его хэш больше не нужен
+                del self._pending[name]
+                if self._digests.pop(name, None) is not None:
+                    self._save_state()
+                continue
+            if current != signature:
+                # Файл ещё дописывается
+                self._pending[name] = (now + self.settle, current)
+                continue
+            del self._pending[name]
+            try:
+                digest = d.WorkbookCache.key(os.path.join(self.folder, name))
+            except OSError:
+                # Файл занят другой программой (в Windows Excel держит его открытым) - попробуем позже
+                self._pending[name] = (now + self.settle, current)
+                continue
+            if self._digests.get(name) == digest:
+                self.counters["skipped"] += 1
+                continue
+            self._ready.pop(name, None)
+            self._ready[name] = digest
+
+    def _replace_executor(self):
+        '''Упавший процесс ломает весь пул: закрываем свой пул, а дальше работаем с новым собственным'''
+        if self._own_executor and self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        # Переданный снаружи пул не закрываем, но и не используем: пересоздать его наблюдатель не может
+        self._executor = None
+        self._own_executor = True
+
+    def _submit(self):
+        '''Отдаёт пулу файлы из очереди, пока заняты не все `workers` процессов'''
+        running = {name for name, _, _ in self._running.values()}
+        for name in list(self._ready):
+            if len(self._running) >= self.workers:
+                break
+            # Новая версия файла, который ещё обрабатывается, ждёт окончания прежней
+            if name in running:
+                continue
+            path = os.path.join(self.folder, name)
+            try:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                future = self._executor.submit(self.job, path, self.engine, self.period)
+            except BrokenProcessPool:
+                self._replace_executor()
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                future = self._executor.submit(self.job, path, self.engine, self.period)
+            self._running[future] = (name, self._ready.pop(name), self._executor)
+            running.add(name)
+
+    def _collect(self):
+        '''Забирает результаты завершившихся задач и запоминает хэши обработанных файлов'''
+        done = [future for future in self._running if future.done()]
+        for future in done:
+            name, digest, executor = self._running.pop(future)
+            try:
+                result = future.result()
+            except BrokenProcessPool as e:
+                # Пул пересоздаётся (если его ещё не заменили из-за другой задачи), а файл возьмётся снова
+                # при следующем изменении
+                if executor is self._executor:
+                    self._replace_executor()
+                result = {"file": os.path.join(self.folder, name), "status": "error", "error": f"{type(e).__name__}: {e}"}
+            else:
+                # Файл с ошибкой тоже запоминается: тот же битый файл не разбирается по кругу
+                self._digests[name] = digest
+            self.counters["processed" if result["status"] == "ok" else "failed"] += 1
+            if self.on_result is not None:
+                self.on_result(result)
+        if done:
+            self._save_state()
+
+    def step(self, idle: float = 5.0):
+        """
+        Одна итерация: ждёт событий (не дольше `idle` секунд или до ближайшего срока ожидающего файла),
+        затем ставит устоявшиеся файлы в очередь, забирает результаты и отдаёт пулу новые файлы
+        """
+        now = time.monotonic()
+        timeout = idle
+        if self._pending:
+            timeout = min(max(min(deadline for deadline, _ in self._pending.values()) - now, 0), idle)
+        if self._running:
+            # Пока пул занят, ждём и завершения задач; события inotify за это время копятся в ядре
+            wait(self._running, timeout=timeout, return_when=FIRST_COMPLETED)
+            timeout = 0
+        names = self._source.wait(timeout)
+        now = time.monotonic()
+        if names is None:
+            self.rescan(now)
+        else:
+            for name in names:
+                self.notice(name, now)
+        self._settle(now)
+        self._collect()
+        self._submit()
+
+    def run(self, once: bool = False, stop=None, idle: float = 5.0):
+        """
+        Обрабатывает уже лежащие в папке выгрузки и дальше следит за новыми
+
+        Аргументы:
+            `once`: Завершиться, когда обработаны файлы, найденные при запуске (default: False)
+            `stop`: `threading.Event`, по которому наблюдение завершается (default: None)
+            `idle`: Сколько секунд ждать событий в простое за одну итерацию (default: 5.0)
+        """
+        self.rescan()
+        try:
+            while not (stop is not None and stop.is_set()):
+                self.step(idle)
+                if once and self.idle:
+                    break
+        finally:
+            self.close()
+
+    def close(self):
+        self._source.close()
+        if self._own_executor and self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+def _print_result(result: dict):
+    name = os.path.basename(result["file"])
+    if result["status"] == "ok":
+        quality = f', качество {result["quality"]:.0%}' if result["quality"] is not None and result["quality"] < 1 else ''
+        print(f'Обработан "{name}" за {result["elapsed"]} с{quality}: {os.path.basename(result["report"])}', flush=True)
+    else:
+        print(f'{'\033[31m'}Ошибка в "{name}": {result["error"]}{'\033[0m'}', flush=True)
+
+
+def _terminate(signum, frame):
+    raise KeyboardInterrupt
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Слежение за папкой: новые выгрузки обрабатываются автоматически")
+    parser.add_argument("folder", nargs="?", default=d.folder_root, help="папка с выгрузками (default: data)")
+    parser.add_argument("--workers", type=int, default=2, help="сколько файлов обрабатывать одновременно (default: 2)")
+    parser.add_argument("--settle", type=float, default=1.0,
+                        help="сколько секунд файл должен не меняться, прежде чем его разбирать (default: 1.0)")
+    parser.add_argument("--poll", type=float, default=2.0, help="интервал опроса папки без inotify, с (default: 2.0)")
+    parser.add_argument("--no-inotify", action="store_true", help="опрашивать папку, даже если есть inotify")
+    parser.add_argument("--once", action="store_true", help="обработать то, что уже лежит в папке, и завершиться")
+    parser.add_argument("--engine", choices=("xml", "openpyxl"), default="xml", help="способ чтения книги")
+    parser.add_argument("--period", choices=("day", "week", "month", "quarter"), default="day",
+                        help="период точек графиков в сводке (default: day)")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.folder):
+        print(f'{'\033[31m'}Папка "{args.folder}" не найдена{'\033[0m'}')
+        return 1
+    watcher = FolderWatcher(args.folder, args.workers, args.settle, args.poll, not args.no_inotify,
+                            args.engine, args.period, on_result=_print_result)
+    print(f'Слежу за папкой "{args.folder}" ({"inotify" if watcher.uses_inotify else f"опрос раз в {args.poll} с"}), '
+          f'Ctrl+C - выход', flush=True)
+    signal.signal(signal.SIGTERM, _terminate)
+    try:
+        watcher.run(once=args.once)
+    except KeyboardInterrupt:
+        pass
+    counters = watcher.counters
+    print(f'Обработано: {counters["processed"]}, с ошибками: {counters["failed"]}, без изменений: {counters["skipped"]}')
+    return 0 if not counters["failed"] else 2
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
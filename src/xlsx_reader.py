@@ -0,0 +1,349 @@
+"""
+Чтение .xlsx напрямую из XML, без построения объектной модели openpyxl.
+
+Файл .xlsx - это zip-архив. Из него читаются только нужные части:
+`xl/workbook.xml` (список листов), `xl/sharedStrings.xml` (общие строки),
+`xl/worksheets/sheetN.xml` (значения ячеек) и файл комментариев листа.
+Все XML разбираются инкрементально через `iterparse`, уже обработанные
+элементы сразу удаляются из дерева, поэтому дерево XML в памяти не строится.
+Сам лист при первом обращении к нему собирается целиком: непустые ячейки
+и ячейки с комментариями лежат в словаре, память пропорциональна их числу.
+
+Книга держит zip-архив открытым, пока её не закроют (`close` или `with`).
+
+Возвращаемые объекты повторяют ту часть интерфейса openpyxl, которой
+пользуются функции `data_processing` (`worksheet["A1"]`, `rows`, `iter_rows`,
+`iter_cols`, `cell.value`, `cell.comment.text`), поэтому их можно передавать
+в `extract_info`, `extract_subjects` и `extract_marks` без изменений.
+
+Важно:
+    Числа с форматом даты не превращаются в `datetime` (стили не читаются),
+    в выгрузках дневника даты хранятся строками вида "dd.mm.yyyy".
+"""
+import io, posixpath, zipfile
+from xml.etree.ElementTree import iterparse
+
+REL_OFFICE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+REL_COMMENTS = "/comments"
+
+
+def _local(tag: str) -> str:
+    '''Отбрасывает пространство имён у тега: `{ns}row` -> `row`'''
+    return tag.rsplit('}', 1)[-1]
+
+
+def _iter_elements(stream, name: str):
+    """
+    Инкрементально выдаёт завершённые элементы с тегом `name`.
+
+    После обработки элемент удаляется из родителя, поэтому память не растёт
+    вместе с размером файла.
+    """
+    stack = []
+    for event, elem in iterparse(stream, events=("start", "end")):
+        if event == "start":
+            stack.append(elem)
+            continue
+        stack.pop()
+        if _local(elem.tag) == name:
+            yield elem
+            if stack:
+                stack[-1].remove(elem)
+
+
+def _text_content(elem) -> str:
+    '''Склеивает текст элемента со строкой (`<t>` и форматированные куски `<r><t>`), как это делает openpyxl'''
+    snippets = []
+    for child in elem:
+        tag = _local(child.tag)
+        if tag == "t":
+            snippets.append(child.text or "")
+        elif tag == "r":
+            for part in child:
+                if _local(part.tag) == "t":
+                    snippets.append(part.text or "")
+    return "".join(snippets)
+
+
+_column_cache = {}
+
+def column_index(letters: str) -> int:
+    '''Переводит буквенное обозначение столбца в номер: `A` -> 1, `AB` -> 28'''
+    idx = _column_cache.get(letters)
+    if idx is None:
+        idx = 0
+        for ch in letters:
+            idx = idx * 26 + ord(ch) - 64
+        _column_cache[letters] = idx
+    return idx
+
+def split_reference(ref: str) -> tuple[int, int]:
+    '''Разбирает адрес ячейки: `B11` -> `(11, 2)`'''
+    pos = 0
+    while not ref[pos].isdigit():
+        pos += 1
+    return int(ref[pos:]), column_index(ref[:pos].upper())
+
+
+def _cast_number(value: str):
+    '''Приводит число так же, как openpyxl: целое, если нет точки или экспоненты'''
+    if "." in value or "E" in value or "e" in value:
+        return float(value)
+    return int(value)
+
+
+class Comment:
+    '''Комментарий к ячейке, аналог `openpyxl.comments.Comment`'''
+    __slots__ = ("text",)
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class Cell:
+    '''Ячейка листа: значение и (при наличии) комментарий'''
+    __slots__ = ("row", "column", "value", "comment")
+
+    def __init__(self, row: int, column: int, value=None, comment=None):
+        self.row = row
+        self.column = column
+        self.value = value
+        self.comment = comment
+
+
+class StreamedSheet:
+    """
+    Лист, прочитанный из XML.
+
+    Хранит только непустые ячейки и ячейки с комментариями, остальные
+    возвращаются как пустые `Cell` с `value=None`.
+    """
+
+    def __init__(self, title: str, cells: dict, max_row: int, max_column: int):
+        self.title = title
+        self._cells = cells
+        self.max_row = max_row
+        self.max_column = max_column
+
+    def cell(self, row: int, column: int) -> Cell:
+        found = self._cells.get((row, column))
+        return found if found is not None else Cell(row, column)
+
+    def __getitem__(self, ref: str) -> Cell:
+        return self.cell(*split_reference(ref))
+
+    def iter_rows(self, min_row=None, max_row=None, min_col=None, max_col=None, values_only=False):
+        min_row, min_col = min_row or 1, min_col or 1
+        max_row, max_col = max_row or self.max_row, max_col or self.max_column
+        for row in range(min_row, max_row + 1):
+            cells = tuple(self.cell(row, col) for col in range(min_col, max_col + 1))
+            yield tuple(c.value for c in cells) if values_only else cells
+
+    def iter_cols(self, min_col=None, max_col=None, min_row=None, max_row=None, values_only=False):
+        min_row, min_col = min_row or 1, min_col or 1
+        max_row, max_col = max_row or self.max_row, max_col or self.max_column
+        for col in range(min_col, max_col + 1):
+            cells = tuple(self.cell(row, col) for row in range(min_row, max_row + 1))
+            yield tuple(c.value for c in cells) if values_only else cells
+
+    @property
+    def rows(self):
+        return self.iter_rows()
+
+    @property
+    def columns(self):
+        return self.iter_cols()
+
+
+class StreamedWorkbook:
+    """
+    Книга Excel, открытая без openpyxl.
+
+    Листы разбираются лениво, при первом обращении к ним. Уже разобранные листы
+    остаются доступны и после закрытия книги, поэтому её можно закрыть сразу,
+    как только получен нужный лист.
+    """
+
+    def __init__(self, source):
+        if isinstance(source, (bytes, bytearray)):
+            source = io.BytesIO(source)
+        self._zip = zipfile.ZipFile(source)
+        self._names = set(self._zip.namelist())
+        self._sheets = {}
+        self._shared_strings = None
+        self._paths, self._active = self._read_workbook()
+
+    @property
+    def sheetnames(self) -> list:
+        return list(self._paths)
+
+    @property
+    def active(self) -> StreamedSheet:
+        return self[self.sheetnames[self._active]]
+
+    def __getitem__(self, name: str) -> StreamedSheet:
+        if name not in self._sheets:
+            self._sheets[name] = self._read_sheet(name, self._paths[name])
+        return self._sheets[name]
+
+    def close(self):
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _rels(self, part: str) -> dict:
+        '''Читает связи части архива: `{rId: (тип, путь к цели)}`'''
+        folder, name = posixpath.split(part)
+        rels_path = posixpath.join(folder, "_rels", name + ".rels")
+        rels = {}
+        if rels_path not in self._names:
+            return rels
+        with self._zip.open(rels_path) as stream:
+            for elem in _iter_elements(stream, "Relationship"):
+                target = elem.get("Target")
+                if target.startswith("/"):
+                    target = target.lstrip("/")
+                else:
+                    target = posixpath.normpath(posixpath.join(folder, target))
+                rels[elem.get("Id")] = (elem.get("Type"), target)
+        return rels
+
+    def _read_workbook(self) -> tuple[dict, int]:
+        '''Возвращает пути к листам в порядке книги и номер активного листа'''
+        rels = self._rels("xl/workbook.xml")
+        paths, active = {}, 0
+        with self._zip.open("xl/workbook.xml") as stream:
+            for event, elem in iterparse(stream):
+                tag = _local(elem.tag)
+                if tag == "workbookView":
+                    active = int(elem.get("activeTab", 0))
+                elif tag == "sheet":
+                    rel_id = elem.get(f"{{{REL_OFFICE}}}id")
+                    paths[elem.get("name")] = rels[rel_id][1]
+        if active >= len(paths):
+            active = 0
+        return paths, active
+
+    def _read_shared_strings(self) -> list:
+        if self._shared_strings is None:
+            self._shared_strings = []
+            path = next((p for p in self._names if p.lower() == "xl/sharedstrings.xml"), None)
+            if path:
+                with self._zip.open(path) as stream:
+                    for elem in _iter_elements(stream, "si"):
+                        self._shared_strings.append(_text_content(elem))
+        return self._shared_strings
+
+    def _read_comments(self, sheet_path: str) -> dict:
+        '''Собирает комментарии листа: `{(row, column): text}`'''
+        comments = {}
+        for rel_type, target in self._rels(sheet_path).values():
+            if not rel_type.endswith(REL_COMMENTS) or target not in self._names:
+                continue
+            with self._zip.open(target) as stream:
+                for elem in _iter_elements(stream, "comment"):
+                    text = next((_text_content(c) for c in elem if _local(c.tag) == "text"), "")
+                    comments[split_reference(elem.get("ref"))] = text
+        return comments
+
+    def _read_sheet(self, title: str, path: str) -> StreamedSheet:
+        strings = self._read_shared_strings()
+        comments = self._read_comments(path)
+        cells = {}
+        max_row = max_column = 0
+        with self._zip.open(path) as stream:
+            for row, column, value in iter_cells(stream, strings):
+                comment = comments.pop((row, column), None)
+                if value is None and comment is None:
+                    continue
+                cells[row, column] = Cell(row, column, value, Comment(comment) if comment is not None else None)
+                max_row, max_column = max(max_row, row), max(max_column, column)
+        # Комментарии могут висеть и на ячейках без значения
+        for (row, column), text in comments.items():
+            cells[row, column] = Cell(row, column, None, Comment(text))
+            max_row, max_column = max(max_row, row), max(max_column, column)
+        return StreamedSheet(title, cells, max_row, max_column)
+
+
+def iter_cells(stream, shared_strings: list):
+    """
+    Инкрементально выдаёт ячейки листа из XML-потока `sheetN.xml`.
+
+    Аргументы:
+        `stream`: Открытый поток XML листа
+        `shared_strings`: Список общих строк книги
+
+    Возвращает:
+        Генератор кортежей `(row, column, value)` в порядке строк
+
+    Важно:
+        У `<row>` и `<c>` атрибут `r` необязателен: без него строка считается следующей
+        за предыдущей, а ячейка - следующей в своей строке (первая ячейка строки - столбец 1)
+    """
+    row_num, col_num = 0, 0
+    names, sheet_data, row = {}, None, None
+    for event, elem in iterparse(stream, events=("start", "end")):
+        name = names.get(elem.tag)
+        if name is None:
+            name = names[elem.tag] = _local(elem.tag)
+        if event == "start":
+            if name == "row":
+                row, ref = elem, elem.get("r")
+                row_num, col_num = int(ref) if ref else row_num + 1, 0
+            elif name == "sheetData":
+                sheet_data = elem
+            continue
+        # Разобранные ячейки и строки удаляются из дерева, чтобы память не росла с размером листа
+        if name == "row":
+            if sheet_data is not None:
+                sheet_data.remove(elem)
+            continue
+        if name != "c":
+            continue
+        if row is not None:
+            row.remove(elem)
+        ref = elem.get("r")
+        if ref:
+            row_num, col_num = split_reference(ref)
+        else:
+            col_num += 1
+        cell_type = elem.get("t", "n")
+        raw = None
+        for child in elem:
+            tag = _local(child.tag)
+            if tag == "v":
+                raw = child.text
+            elif tag == "is":
+                raw = _text_content(child)
+        if raw is None:
+            value = None
+        elif cell_type == "s":
+            value = shared_strings[int(raw)]
+        elif cell_type in ("str", "inlineStr", "e"):
+            value = raw
+        elif cell_type == "b":
+            value = bool(int(raw))
+        elif cell_type == "d":
+            from datetime import datetime
+            value = datetime.fromisoformat(raw)
+        else:
+            value = _cast_number(raw)
+        yield row_num, col_num, value
+
+
+def load_workbook(source) -> StreamedWorkbook:
+    """
+    Открывает книгу Excel потоковым XML-ридером
+
+    Аргументы:
+        `source`: Путь к файлу, файловый объект или содержимое файла в `bytes`
+
+    Возвращает:
+        `StreamedWorkbook`, у которого, как и у `openpyxl.Workbook`, есть `active` и доступ к листам по имени.
+        Книгу нужно закрыть: `with load_workbook(path) as workbook: ...`
+    """
+    return StreamedWorkbook(source)
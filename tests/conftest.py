@@ -0,0 +1,98 @@
+import os, sys
+
+import openpyxl as xl
+import pytest
+from openpyxl.comments import Comment
+
+# Модули из src импортируют друг друга напрямую (`import data_processing as d`),
+# поэтому добавляем src в пути поиска модулей
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+
+@pytest.fixture(scope="session", autouse=True)
+def sample_export():
+    '''Тесты читают `data/Отметки_1.xlsx`; если такой выгрузки нет, на время тестов создаётся синтетическая'''
+    import data_processing as d
+    from synthetic import generate_diary
+
+    path = os.path.join(d.folder_root, "Отметки_1.xlsx")
+    created = not os.path.exists(path)
+    folder_created = not os.path.exists(d.folder_root)
+    if created:
+        os.makedirs(d.folder_root, exist_ok=True)
+        generate_diary(path, subjects=15, days=60, period="II четверть", seed=1)
+    yield path
+    if created:
+        os.remove(path)
+    if folder_created and not os.listdir(d.folder_root):
+        os.rmdir(d.folder_root)
+
+
+def build_diary(path):
+    '''Создаёт небольшую выгрузку дневника в формате электронного дневника'''
+    workbook = xl.Workbook()
+    sheet = workbook.active
+    for row, (key, value) in enumerate([("Организация:", "Хогвардс"), ("Обучающийся:", "Гарри Поттер"),
+                                        ("Класс:", "9 б"), ("Период:", "II четверть")]):
+        sheet.cell(row * 2 + 1, 1, key)
+        sheet.cell(row * 2 + 2, 1, value)
+    sheet["A10"] = "Предметы"
+    for idx, subject in enumerate(["Алгебра", "Биология", "Химия"]):
+        sheet.cell(11 + idx, 1, subject)
+    dates = ["06.11.2024", "07.11.2024", "08.11.2024"]
+    for idx, date in enumerate(dates):
+        sheet.cell(10, 2 + idx, date)
+    sheet.cell(10, 2 + len(dates), "Итог:")
+    sheet.cell(11, 2 + len(dates), "4")
+
+    def put(ref, value, comment):
+        sheet[ref] = value
+        sheet[ref].comment = Comment(comment, "ЭлЖур")
+
+    put("B11", "54", "5 - Работа на уроке - 06.11.2024; 4 - Контрольная работа - 06.11.2024")
+    put("C11", "Н", "Н - Работа на уроке - 07.11.2024")
+    put("D11", "3", "3 - Самостоятельная работа - 08.11.2024")
+    put("B12", "•", "• - Тест - 06.11.2024")
+    put("C13", "5", "5 - Лабораторная работа - 07.11.2024")
+    workbook.save(path)
+
+
+def build_broken_diary(path):
+    '''Выгрузка `build_diary` с проблемными ячейками'''
+    build_diary(path)
+    workbook = xl.load_workbook(path)
+    sheet = workbook.active
+    sheet["D11"].comment = None                                                # нет комментария
+    sheet["B12"] = "5"
+    sheet["B12"].comment = Comment("5 - Работа с картой - 06.11.2024", "ЭлЖур")  # неизвестный тип работы
+    sheet["D12"] = "43"
+    sheet["D12"].comment = Comment("4 - Тест - 08.11.2024", "ЭлЖур")            # отметок больше, чем записей
+    workbook.save(path)
+
+
+@pytest.fixture
+def tmp_folder(request, tmp_path):
+    '''Временная папка теста; классам unittest она доступна как `self.folder`'''
+    folder = str(tmp_path)
+    if request.instance is not None:
+        request.instance.folder = folder
+    return folder
+
+
+@pytest.fixture
+def diary_builders(request):
+    '''`build_diary` и `build_broken_diary`; классам unittest они доступны как `self.build_diary` и `self.build_broken_diary`'''
+    if request.instance is not None:
+        request.instance.build_diary = build_diary
+        request.instance.build_broken_diary = build_broken_diary
+    return build_diary, build_broken_diary
+
+
+@pytest.fixture
+def diary(request, tmp_folder, diary_builders):
+    '''Выгрузка `build_diary` во временной папке теста; классам unittest путь доступен как `self.path`'''
+    path = os.path.join(tmp_folder, "Отметки.xlsx")
+    build_diary(path)
+    if request.instance is not None:
+        request.instance.path = path
+    return path
@@ -0,0 +1,60 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import analysis
+import data_processing as d
+import visualization as v
+
+
+@pytest.mark.usefixtures("diary")
+class TestAnalyze(unittest.TestCase):
+    def setUp(self):
+        self.sheet = d.read_excel(self.path, "xml").active
+
+    def test_report(self):
+        '''Тестируем содержимое отчёта'''
+        report = analysis.analyze(self.sheet)
+        self.assertEqual(report.info["Период"], "II четверть")
+        algebra = report.subject("Алгебра")
+        self.assertEqual((algebra.count, algebra.mean, algebra.grade, algebra.missing), (3, 3.95, 4, 0))
+        self.assertEqual(report.subject("Химия").missing, 2)
+        self.assertIsNone(report.subject("Биология").mean)
+        self.assertEqual(report.histogram, (0, 1, 0, 0, 0))
+        self.assertEqual(report.incomplete, 2)
+
+    def test_repeated_runs_do_not_mix(self):
+        '''Тестируем, что повторные анализы не накапливают распределение оценок'''
+        first = analysis.analyze(self.sheet)
+        second = analysis.analyze(self.sheet)
+        self.assertEqual(first, second)
+
+    def test_threads(self):
+        '''Тестируем параллельные анализы в потоках'''
+        expected = analysis.analyze(self.sheet)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            reports = list(pool.map(lambda _: analysis.analyze(self.sheet), range(32)))
+        self.assertTrue(all(report == expected for report in reports))
+
+    def test_formatter_matches_count_mean(self):
+        '''Тестируем, что форматирование совпадает со строками countMean'''
+        subjects = d.extract_subjects(self.sheet)
+        marks = d.extract_marks(self.sheet, subjects)
+        report = analysis.analyze(self.sheet)
+        saved = list(v.totalEst)
+        try:
+            for result in report.subjects:
+                self.assertEqual(v.formatSubject(result), v.countMean(result.name, marks, "II четверть"))
+        finally:
+            v.totalEst[:] = saved
+
+    def test_format_report(self):
+        '''Тестируем итоговые строки отчёта'''
+        text = v.formatReport(analysis.analyze(self.sheet))
+        self.assertIn("Обучающийся: Гарри Поттер", text)
+        self.assertTrue(text.endswith("Итого: 0 пятёрок; 1 четверок; 0 троек; 0 двоек; 0 единиц; не хватает оценок у 2 предметов"))
+
+
+if __name__ == "__main__":
+    unittest.main()
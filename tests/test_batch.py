@@ -0,0 +1,85 @@
+import unittest
+import csv
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+
+import batch
+import data_processing as d
+
+
+@pytest.mark.usefixtures("tmp_folder", "diary_builders")
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        for idx in range(3):
+            self.build_diary(os.path.join(self.folder, f"Отметки_{idx}.xlsx"))
+        with open(os.path.join(self.folder, "Битый.xlsx"), "wb") as file:
+            file.write(b"not a zip")
+
+    def test_collect_files(self):
+        '''Тестируем поиск файлов по папке и по маске'''
+        self.assertEqual(len(batch.collect_files(self.folder)), 4)
+        self.assertEqual(len(batch.collect_files("Отметки_*.xlsx", self.folder)), 3)
+
+    def test_pool_statuses(self):
+        '''Тестируем обработку в пуле и статус по каждому файлу'''
+        files = batch.collect_files(self.folder)
+        results = batch.run_batch(files, workers=2, chunksize=2)
+        self.assertEqual([r["file"] for r in results], files)
+        statuses = {os.path.basename(r["file"]): r["status"] for r in results}
+        self.assertEqual(statuses.pop("Битый.xlsx"), "error")
+        self.assertEqual(set(statuses.values()), {"ok"})
+        algebra = results[1]["subjects"][0]
+        self.assertEqual((algebra["name"], algebra["count"], algebra["grade"]), ("Алгебра", 3, 4))
+
+    def test_same_result_in_one_process(self):
+        '''Тестируем, что пул и последовательная обработка дают одно и то же'''
+        files = batch.collect_files(self.folder)
+        strip = lambda results: [{k: v for k, v in r.items() if k != "elapsed"} for r in results]
+        self.assertEqual(strip(batch.run_batch(files, workers=1)), strip(batch.run_batch(files, workers=2)))
+
+    def test_incremental_mode(self):
+        '''Тестируем, что инкрементальный режим даёт те же результаты, что и обычный'''
+        files = batch.collect_files(self.folder)
+        state = os.path.join(self.folder, "state")
+        strip = lambda results: [{k: v for k, v in r.items() if k != "elapsed"} for r in results]
+        expected = strip(batch.run_batch(files, workers=1))
+        self.assertEqual(strip(batch.run_batch(files, workers=1, state_folder=state)), expected)
+        self.assertEqual(strip(batch.run_batch(files, workers=2, state_folder=state)), expected)
+
+    def test_state_with_tolerant(self):
+        '''Тестируем, что --state вместе с --tolerant отклоняется, а не игнорируется молча'''
+        files = batch.collect_files(self.folder)
+        with self.assertRaises(ValueError):
+            batch.run_batch(files, workers=1, state_folder=os.path.join(self.folder, "state"), tolerant=True)
+        with self.assertRaises(SystemExit), patch("sys.stderr"):
+            batch.main(["Отметки_*.xlsx", "--state", "--tolerant"])
+
+    def test_default_folders(self):
+        '''Тестируем, что --cache и --state без папки берут папку данных в момент запуска, а не импорта'''
+        json_path = os.path.join(self.folder, "out.json")
+        with patch.object(d, "folder_root", self.folder), patch("builtins.print"):
+            self.assertEqual(batch.main(["Отметки_*.xlsx", "--workers", "1", "--json", json_path, "--cache"]), 0)
+            self.assertEqual(batch.main(["Отметки_*.xlsx", "--workers", "1", "--json", json_path, "--state"]), 0)
+        self.assertTrue(os.listdir(os.path.join(self.folder, ".cache")))
+        self.assertTrue(os.listdir(os.path.join(self.folder, ".state")))
+
+    def test_outputs(self):
+        '''Тестируем запись сводного JSON и CSV'''
+        json_path = os.path.join(self.folder, "out.json")
+        csv_path = os.path.join(self.folder, "out.csv")
+        code = batch.main([self.folder, "--workers", "2", "--json", json_path, "--csv", csv_path])
+        self.assertEqual(code, 2)
+        with open(json_path, encoding="utf-8") as file:
+            report = json.load(file)
+        self.assertEqual((report["summary"]["ok"], report["summary"]["failed"]), (3, 1))
+        with open(csv_path, encoding="utf-8-sig") as file:
+            rows = list(csv.reader(file, delimiter=";"))
+        self.assertEqual(rows[0], batch.CSV_FIELDS)
+        self.assertEqual(len(rows), 1 + 1 + 3 * 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+import csv
+import json
+import os
+import tempfile
+
+import numpy as np
+
+import batch
+import cohort
+from synthetic import generate_diary
+
+
+class TestCohort(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.folder = cls.tmp.name
+        for idx in range(8):
+            generate_diary(os.path.join(cls.folder, f"Отметки_{idx}.xlsx"), subjects=6, days=30, fill=0.15,
+                           period="II четверть", student=f"Ученик {idx}", seed=idx)
+        with open(os.path.join(cls.folder, "Битый.xlsx"), "wb") as file:
+            file.write(b"not a zip")
+        cls.files = batch.collect_files(cls.folder)
+        cls.report, cls.results = cohort.analyze_cohort(cls.files, workers=1)
+        cls.ok = [r for r in cls.results if r["status"] == "ok"]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def subject_rows(self, name):
+        return [s for r in self.ok for s in r["subjects"] if s["name"] == name]
+
+    def test_subject_statistics(self):
+        '''Тестируем распределение, процентили и долю нехватки по каждому предмету'''
+        self.assertEqual(len(self.report.students), 8)
+        for summary in self.report.subjects:
+            rows = self.subject_rows(summary.name)
+            means = [s["mean"] for s in rows if s["count"]]
+            self.assertEqual(summary.students, len(means))
+            self.assertEqual(summary.mean, round(sum(means) / len(means), 2))
+            self.assertEqual(summary.percentiles, tuple(round(float(x), 2) for x in np.percentile(means, cohort.PERCENTILES)))
+            self.assertEqual(summary.missing_share, round(sum(s["missing"] > 0 for s in rows) / len(rows), 4))
+            grades = [s["grade"] for s in rows if s["count"] and not s["missing"]]
+            self.assertEqual(summary.histogram, tuple(grades.count(grade) for grade in (5, 4, 3, 2, 1)))
+
+    def test_ranks(self):
+        '''Тестируем места в классе и по предметам: равные значения делят место'''
+        totals = [r["total_score"] for r in self.ok]
+        for student, result in zip(self.report.students, self.ok):
+            self.assertEqual(student.rank, 1 + sum(total > result["total_score"] for total in totals))
+            for subject in result["subjects"]:
+                if not subject["count"]:
+                    self.assertNotIn(subject["name"], student.subject_ranks)
+                    continue
+                means = [s["mean"] for s in self.subject_rows(subject["name"]) if s["count"]]
+                self.assertEqual(student.subject_ranks[subject["name"]], 1 + sum(m > subject["mean"] for m in means))
+
+    def test_ties_share_rank(self):
+        '''Тестируем места при одинаковых средних'''
+        results = [{"status": "ok", "file": f"{idx}.xlsx", "info": {}, "total_score": score,
+                    "subjects": [{"name": "Химия", "count": 3, "mean": score, "grade": round(score), "missing": 0}]}
+                   for idx, score in enumerate([4.5, 5.0, 4.5, 3.0])]
+        report = cohort.aggregate(results)
+        self.assertEqual([s.rank for s in report.students], [2, 1, 2, 4])
+        self.assertEqual([s.subject_ranks["Химия"] for s in report.students], [2, 1, 2, 4])
+        self.assertEqual(report.subject("Химия").percentiles[2], 4.5)
+
+    def test_cli_outputs(self):
+        '''Тестируем сводку в JSON и места учеников в CSV'''
+        json_path = os.path.join(self.folder, "cohort.json")
+        csv_path = os.path.join(self.folder, "cohort.csv")
+        code = cohort.main([self.folder, "--workers", "1", "--json", json_path, "--csv", csv_path])
+        self.assertEqual(code, 2)
+        with open(json_path, encoding="utf-8") as file:
+            data = json.load(file)
+        self.assertEqual(len(data["cohort"]["students"]), 8)
+        self.assertEqual(len(data["errors"]), 1)
+        with open(csv_path, encoding="utf-8-sig") as file:
+            rows = list(csv.reader(file, delimiter=";"))
+        self.assertEqual(rows[0][:4], ["Обучающийся", "Файл", "Общий средний", "Место"])
+        self.assertEqual(len(rows), 9)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+import openpyxl as xl
+from openpyxl.comments import Comment
+import pytest
+
+import data_processing as d
+from comment_tokenizer import CommentTokenizer
+
+
+class TestCommentTokenizer(unittest.TestCase):
+    def setUp(self):
+        self.tokenizer = CommentTokenizer(d.coeffs, default_coeff=1.1)
+
+    def test_single_mark(self):
+        '''Тестируем ячейку с одной отметкой'''
+        self.assertEqual(self.tokenizer.tokenize("5", "5 - Контрольная работа - 06.11.2024"),
+                         [(5, "Контрольная работа", 1.5)])
+        self.assertEqual(self.tokenizer.warnings, 0)
+
+    def test_multiple_marks(self):
+        '''Тестируем несколько отметок в одной ячейке и пропуск не-цифр'''
+        text = " 5 - Работа на уроке - 06.11.2024;  Н - Работа на уроке - 06.11.2024; 3 - Тест - 06.11.2024 "
+        self.assertEqual(self.tokenizer.tokenize("5Н3", text),
+                         [(5, "Работа на уроке", 1), (3, "Тест", 1)])
+
+    def test_interned_work_types(self):
+        '''Тестируем, что одинаковые типы работ - один и тот же объект строки'''
+        first = self.tokenizer.tokenize("5", "5 - Работа на " + "уроке - 06.11.2024")[0][1]
+        second = self.tokenizer.tokenize("4", "4 - Работа на уроке" + " - 07.11.2024")[0][1]
+        self.assertIs(first, second)
+
+    def test_unknown_work_type(self):
+        '''Тестируем, что неизвестный тип получает коэффициент по умолчанию и попадает в счётчик'''
+        result = self.tokenizer.tokenize("44", "4 - Олимпиада - 06.11.2024; 4 - Олимпиада - 06.11.2024")
+        self.assertEqual(result, [(4, "Олимпиада", 1.1), (4, "Олимпиада", 1.1)])
+        self.assertEqual(self.tokenizer.unknown, {"Олимпиада": 2})
+
+    def test_missing_and_extra_entries(self):
+        '''Тестируем ячейки, в которых число отметок и записей в комментарии не совпадает'''
+        self.assertEqual(self.tokenizer.tokenize("54", "5 - Тест - 06.11.2024"),
+                         [(5, "Тест", 1), (4, "", 1.1)])
+        self.assertEqual(self.tokenizer.missing, 1)
+        self.assertEqual(self.tokenizer.tokenize("5", "5 - Тест - 06.11.2024; 4 - Тест - 06.11.2024"),
+                         [(5, "Тест", 1)])
+        self.assertEqual(self.tokenizer.extra, 1)
+        self.assertEqual(self.tokenizer.warnings, 2)
+
+    @pytest.mark.usefixtures("diary")
+    def test_extract_marks_with_unknown_type(self):
+        '''Тестируем, что extract_marks не падает на неизвестном типе работы'''
+        workbook = xl.load_workbook(self.path)
+        workbook.active["D12"] = "4"
+        workbook.active["D12"].comment = Comment("4 - Олимпиада - 08.11.2024", "ЭлЖур")
+        workbook.save(self.path)
+        for engine in ("openpyxl", "xml"):
+            sheet = d.read_excel(self.path, engine).active
+            tokenizer = CommentTokenizer(d.coeffs)
+            marks = d.extract_marks(sheet, d.extract_subjects(sheet), tokenizer=tokenizer)
+            self.assertEqual(marks["Биология"], [{"Дата": "08.11.2024", "Отметка": 4,
+                                                  "Тип работы": "Олимпиада", "Коэффициент": 1}])
+            self.assertEqual(len(marks["Алгебра"]), 3)
+            self.assertEqual(tokenizer.unknown, {"Олимпиада": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,9 +2,11 @@ import unittest
 import os
 import openpyxl as xl
 from datetime import datetime
+import pytest
 from src.data_processing import *
 from unittest.mock import patch, MagicMock
 from unittest.mock import Mock
+from concurrent.futures import ProcessPoolExecutor
 
 class TestDataProcessing(unittest.TestCase):
     def setUp(self):
@@ -274,5 +276,168 @@ class TestRefactorMarks(unittest.TestCase):
         with self.assertRaises(KeyError):
             refactor_marks(empty_marks, "Math")
 
+@pytest.mark.usefixtures("diary")
+class TestScanSheet(unittest.TestCase):
+    def test_parity_with_separate_passes(self):
+        '''Тестируем, что один проход даёт то же, что extract_info, extract_subjects и extract_marks'''
+        from synthetic import generate_diary
+        for seed in range(3):
+            path = os.path.join(self.folder, f"diary_{seed}.xlsx")
+            generate_diary(path, subjects=10, days=40, seed=seed)
+            for engine in ("openpyxl", "xml"):
+                sheet = open_workbook(path, engine).active
+                subjects = extract_subjects(sheet)
+                expected = extract_info(sheet), subjects, extract_marks(sheet, subjects)
+                self.assertEqual(scan_sheet(sheet, table=False), expected)
+                info, subjects, table = scan_sheet(sheet)
+                self.assertEqual((info, subjects, table.to_marks()), expected)
+
+    def test_custom_layout(self):
+        '''Тестируем, что строки и столбцы шапки, предметов и отметок задаются параметрами'''
+        sheet = xl.Workbook().active
+        sheet["A2"], sheet["A3"] = "Обучающийся:", "Гарри Поттер"
+        sheet["C5"], sheet["D5"], sheet["E5"] = "06.11.2024", "07.11.2024", "Итог:"
+        sheet["B6"], sheet["B7"] = "Алгебра", "Химия"
+        sheet["D6"] = "5"
+        sheet["D6"].comment = xl.comments.Comment("5 - Тест - 07.11.2024", "ЭлЖур")
+        sheet["E6"] = "5"
+        info, subjects, marks = scan_sheet(sheet, info_row=2, info_rows=2, subjects_row=6, subject_column=1,
+                                           dates_row=5, marks_column=3, table=False)
+        self.assertEqual(info, {"Обучающийся": "Гарри Поттер"})
+        self.assertEqual(subjects, {1: "Алгебра", 2: "Химия"})
+        self.assertEqual(marks, {"Алгебра": [{"Дата": "07.11.2024", "Отметка": 5, "Тип работы": "Тест", "Коэффициент": 1}],
+                                 "Химия": []})
+
+    def test_missing_comment(self):
+        '''Тестируем, что без комментария отметки - "", а предметы всё равно дочитываются'''
+        workbook = xl.load_workbook(self.path)
+        workbook.active["B11"].comment = None
+        info, subjects, marks = scan_sheet(workbook.active)
+        self.assertEqual((subjects, marks), ({1: "Алгебра", 2: "Биология", 3: "Химия"}, ""))
+        self.assertEqual(info["Период"], "II четверть")
+
+    def test_header_not_a_date(self):
+        '''Тестируем, что подпись-не-дата в строке дат не обрывает разбор: в таблицу столбец не попадает'''
+        workbook = xl.load_workbook(self.path)
+        workbook.active["C10"] = "Каникулы"
+        _, _, table = scan_sheet(workbook.active)
+        self.assertEqual(table.refactor("Химия"), ([], [], []))
+        self.assertEqual(table.refactor("Алгебра")[0], ["06.11.2024", "06.11.2024", "08.11.2024"])
+        marks = scan_sheet(workbook.active, table=False)[2]
+        self.assertEqual([mark["Дата"] for mark in marks["Химия"]], ["Каникулы"])
+
+    def test_dates_below_subjects(self):
+        '''Тестируем, что строка дат ниже предметов не допускается'''
+        with self.assertRaises(ValueError):
+            scan_sheet(xl.Workbook().active, dates_row=12)
+
+def _cache_worker(args):
+    folder, file_path = args
+    cache = WorkbookCache(folder, max_entries=3)
+    info, subjects, marks = parse_workbook(file_path, "xml", cache)
+    return cache.hits, cache.misses, len(marks)
+
+@pytest.mark.usefixtures("diary")
+class TestWorkbookCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_folder = os.path.join(self.folder, "cache")
+
+    def test_hit_and_miss(self):
+        '''Тестируем, что повторный разбор того же файла берётся из кэша'''
+        cache = WorkbookCache(self.cache_folder)
+        first = parse_workbook(self.path, "xml", cache)
+        second = parse_workbook(self.path, "xml", cache)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(first[:2], second[:2])
+        self.assertEqual(first[2].to_marks(), second[2].to_marks())
+        self.assertEqual(second[2].to_marks(), extract_marks(xlsx_reader.load_workbook(self.path).active, second[1]))
+
+    def test_key_depends_on_content(self):
+        '''Тестируем, что ключ зависит от содержимого, а не от имени файла'''
+        copy_path = os.path.join(self.folder, "Копия.xlsx")
+        with open(self.path, "rb") as src, open(copy_path, "wb") as dst:
+            dst.write(src.read())
+        self.assertEqual(WorkbookCache.key(self.path), WorkbookCache.key(copy_path))
+        with open(copy_path, "ab") as dst:
+            dst.write(b"\0")
+        self.assertNotEqual(WorkbookCache.key(self.path), WorkbookCache.key(copy_path))
+
+    def test_lru_eviction_by_count(self):
+        '''Тестируем вытеснение давно не использованных записей'''
+        cache = WorkbookCache(self.cache_folder, max_entries=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        os.utime(os.path.join(self.cache_folder, "a.pkl"), ns=(1, 1))
+        os.utime(os.path.join(self.cache_folder, "b.pkl"), ns=(2, 2))
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual((cache.get("a"), cache.get("c")), (1, 3))
+
+    def test_eviction_by_size(self):
+        '''Тестируем ограничение на суммарный размер'''
+        cache = WorkbookCache(self.cache_folder, max_bytes=3000)
+        for i in range(5):
+            cache.put(str(i), b"x" * 1000)
+        self.assertLessEqual(cache.stats()["bytes"], 3000)
+        self.assertEqual(cache.get("4"), b"x" * 1000)
+
+    def test_corrupted_entry(self):
+        '''Тестируем, что повреждённая запись считается промахом'''
+        cache = WorkbookCache(self.cache_folder)
+        with open(os.path.join(self.cache_folder, "bad.pkl"), "wb") as file:
+            file.write(b"garbage")
+        self.assertIsNone(cache.get("bad"))
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_concurrent_processes(self):
+        '''Тестируем одновременную работу нескольких процессов с одним кэшем'''
+        with ProcessPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(_cache_worker, [(self.cache_folder, self.path)] * 16))
+        self.assertTrue(all(count == 4 for _, _, count in results))
+        self.assertGreater(sum(hits for hits, _, _ in results), 0)
+        self.assertEqual(WorkbookCache(self.cache_folder).stats()["entries"], 1)
+
+@pytest.mark.usefixtures("diary")
+class TestArchive(unittest.TestCase):
+    def setUp(self):
+        self.archive = os.path.join(self.folder, "Отметки" + ARCHIVE_SUFFIX)
+        self.parsed = parse_workbook(self.path, "xml")
+
+    def test_round_trip(self):
+        '''Тестируем, что архив возвращает те же шапку, предметы и отметки, с отображением в память и без'''
+        info, subjects, table = self.parsed
+        save_archive(self.archive, info, subjects, table)
+        for mmap in (True, False):
+            loaded_info, loaded_subjects, loaded = load_archive(self.archive, mmap=mmap)
+            self.assertEqual((loaded_info, loaded_subjects), (info, subjects))
+            self.assertEqual(loaded.to_marks(), table.to_marks())
+            self.assertEqual(loaded.coeff.tolist(), table.coeff.tolist())
+        self.assertFalse(load_archive(self.archive)[2].date.flags.writeable)
+
+    def test_labels_and_dict(self):
+        '''Тестируем словарь отметок и подписи дат не в формате dd.mm.yyyy'''
+        marks = {"Алгебра": [{"Дата": "6.11.2024", "Отметка": 5, "Тип работы": "Тест", "Коэффициент": 1},
+                             {"Дата": "07.11.2024", "Отметка": 4, "Тип работы": "Зачёт", "Коэффициент": 1.5}],
+                 "Химия": []}
+        save_archive(self.archive, {"Период": "Год"}, {1: "Алгебра", 2: "Химия"}, marks)
+        _, subjects, table = load_archive(self.archive)
+        self.assertEqual(subjects, {1: "Алгебра", 2: "Химия"})
+        self.assertEqual(table.to_marks(), marks)
+
+    def test_atomic_write_error(self):
+        '''Тестируем, что при ошибке записи прежний файл остаётся целым, а временный удаляется'''
+        with self.assertRaises(RuntimeError):
+            with atomic_write(self.path) as file:
+                file.write(b"half")
+                raise RuntimeError("обрыв")
+        self.assertEqual(parse_workbook(self.path, "xml")[1], self.parsed[1])
+        self.assertEqual([name for name in os.listdir(self.folder) if name.endswith(".tmp")], [])
+
+    def test_not_an_archive(self):
+        '''Тестируем понятную ошибку для файла, который не является архивом'''
+        with self.assertRaises(ValueError):
+            load_archive(self.path)
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
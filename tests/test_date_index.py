@@ -0,0 +1,70 @@
+import unittest
+import os
+import random
+import tempfile
+
+import numpy as np
+
+import data_processing as d
+from date_index import DateIndex
+from marks_table import date_to_ordinal
+from stats import weighted_mean
+from synthetic import generate_diary
+
+
+class TestDateIndex(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "diary.xlsx")
+            generate_diary(path, subjects=10, days=120, period="I полугодие", seed=7)
+            _, cls.subjects, cls.marks = d.scan_sheet(d.open_workbook(path, "xml").active, table=False)
+        cls.index = DateIndex.from_marks(cls.marks)
+        cls.ordinals = sorted({date_to_ordinal(m["Дата"]) for rows in cls.marks.values() for m in rows})
+
+    def expected(self, subject, start, end):
+        '''Средний балл перебором отметок, как в countMean'''
+        rows = [m for name in ([subject] if subject else self.marks) for m in self.marks[name]
+                if start <= date_to_ordinal(m["Дата"]) <= end]
+        if not rows:
+            return 0, None
+        return len(rows), weighted_mean([m["Отметка"] for m in rows], [m["Коэффициент"] for m in rows])
+
+    def test_random_periods(self):
+        '''Тестируем средний балл за случайные периоды по предмету и по всем предметам'''
+        rnd = random.Random(1)
+        first, last = self.ordinals[0] - 3, self.ordinals[-1] + 3
+        for _ in range(300):
+            start, end = sorted(rnd.randint(first, last) for _ in range(2))
+            subject = rnd.choice([None, *self.subjects.values()])
+            count, mean = self.expected(subject, start, end)
+            result = self.index.query(subject, start, end)
+            self.assertEqual((result.count, result.mean), (count, mean))
+            if count:
+                self.assertEqual(result.grade, round(mean + 0.01))
+
+    def test_as_of_and_dates(self):
+        '''Тестируем средний балл на дату и границы периода строками'''
+        subject = next(iter(self.marks))
+        day = self.marks[subject][len(self.marks[subject]) // 2]["Дата"]
+        self.assertEqual(self.index.as_of(day, subject), self.expected(subject, 0, date_to_ordinal(day))[1])
+        self.assertEqual(self.index.mean(subject), weighted_mean(*d.refactor_marks(self.marks, subject)[1:]))
+        self.assertEqual(self.index.query(subject, "01.01.2000", "01.01.2001"), (0, None, None))
+        self.assertEqual(self.index.query(subject, day, day).count,
+                         sum(m["Дата"] == day for m in self.marks[subject]))
+
+    def test_all_subjects(self):
+        '''Тестируем запрос сразу по всем предметам'''
+        start, end = self.ordinals[10], self.ordinals[40]
+        counts, means = self.index.means(start, end)
+        for idx, subject in enumerate(self.index.subjects):
+            count, mean = self.expected(subject, start, end)
+            self.assertEqual(int(counts[idx]), count)
+            if count:
+                self.assertEqual(float(means[idx]), mean)
+            else:
+                self.assertTrue(np.isnan(means[idx]))
+
+
+if __name__ == "__main__":
+    unittest.main()
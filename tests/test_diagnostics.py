@@ -0,0 +1,116 @@
+import unittest
+import os
+import openpyxl as xl
+from openpyxl.comments import Comment
+import pytest
+
+import batch
+import data_processing as d
+from comment_tokenizer import CommentTokenizer
+from marks_table import MarksTable
+from diagnostics import Diagnostics
+
+
+class _FailingSheet:
+    '''Лист, чтение которого обрывается на строке `fail_at`'''
+    def __init__(self, sheet, fail_at: int):
+        self.sheet, self.fail_at = sheet, fail_at
+
+    def iter_rows(self, min_row=1):
+        for row_number, row in enumerate(self.sheet.iter_rows(min_row=min_row), start=min_row):
+            if row_number == self.fail_at:
+                raise OSError("обрыв чтения")
+            yield row
+
+
+@pytest.mark.usefixtures("diary")
+class TestDiagnostics(unittest.TestCase):
+    def setUp(self):
+        self.build_broken_diary(self.path)
+
+    def test_tolerant_scan(self):
+        '''Тестируем, что мягкий режим записывает проблемы ячеек и возвращает все отметки'''
+        sheet = d.open_workbook(self.path, "xml").active
+        self.assertEqual(d.scan_sheet(sheet)[2], "")
+        diagnostics = Diagnostics()
+        _, subjects, marks = d.scan_sheet(d.open_workbook(self.path, "xml").active, diagnostics=diagnostics)
+        self.assertEqual(dict(diagnostics.counts), {"missing_comment": 1, "unknown_work_type": 1, "mismatch": 1})
+        self.assertEqual((diagnostics.cells, diagnostics.bad_cells, diagnostics.quality), (6, 3, 0.5))
+        self.assertEqual([(p.subject, p.date) for p in diagnostics.problems],
+                         [("Алгебра", "08.11.2024"), ("Биология", "06.11.2024"), ("Биология", "08.11.2024")])
+        self.assertEqual(len(marks), 7)
+        # Отметка без комментария - с пустым типом работы и коэффициентом по умолчанию
+        self.assertEqual(marks.to_marks()["Алгебра"][-1]["Тип работы"], "")
+
+    def test_unreadable_and_cached(self):
+        '''Тестируем файл, который не открывается, и повторный разбор из кэша вместе с проблемами'''
+        garbage = os.path.join(self.folder, "Битый.xlsx")
+        with open(garbage, "wb") as file:
+            file.write(b"not a zip")
+        diagnostics = Diagnostics()
+        info, subjects, marks = d.parse_workbook(garbage, "xml", diagnostics=diagnostics)
+        self.assertEqual((info, subjects, len(marks)), ({}, {}, 0))
+        self.assertEqual((diagnostics.complete, diagnostics.quality, diagnostics.problems[0].kind), (False, 0.0, "file"))
+
+        cache = d.WorkbookCache(os.path.join(self.folder, "cache"))
+        first, second = Diagnostics(), Diagnostics()
+        d.parse_workbook(self.path, "xml", cache, first)
+        result = d.parse_workbook(self.path, "xml", cache, second)
+        self.assertEqual((cache.hits, second.to_dict()), (1, first.to_dict()))
+        self.assertEqual(len(result[2]), 7)
+        # Обычный режим по тому же файлу не берёт запись мягкого режима
+        self.assertEqual(d.parse_workbook(self.path, "xml", cache)[2], "")
+
+    def test_partial_read(self):
+        '''Тестируем, что при обрыве чтения остаются отметки, разобранные до ошибки'''
+        self.build_diary(self.path)
+        diagnostics = Diagnostics()
+        sheet = _FailingSheet(d.open_workbook(self.path, "xml").active, fail_at=12)
+        _, subjects, marks = d.scan_sheet(sheet, diagnostics=diagnostics)
+        self.assertEqual((list(subjects.values()), len(marks)), (["Алгебра"], 3))
+        self.assertEqual((diagnostics.complete, diagnostics.quality), (False, 0.0))
+        self.assertIn("обрыв чтения", diagnostics.format())
+
+    def test_numeric_and_failing_cells(self):
+        '''Тестируем, что число в ячейке разбирается, а ошибка в одной ячейке не обрывает разбор листа'''
+        self.build_diary(self.path)
+        expected = d.scan_sheet(d.open_workbook(self.path, "xml").active)[2].to_marks()
+        workbook = xl.load_workbook(self.path)
+        workbook.active["C13"] = 5
+        workbook.active["C13"].comment = Comment("5 - Лабораторная работа - 07.11.2024", "ЭлЖур")
+        workbook.save(self.path)
+        for engine in ("xml", "openpyxl"):
+            diagnostics = Diagnostics()
+            _, _, marks = d.scan_sheet(d.open_workbook(self.path, engine).active, diagnostics=diagnostics)
+            self.assertEqual(marks.to_marks(), expected)
+            self.assertEqual((diagnostics.ok, diagnostics.quality), (True, 1.0))
+
+        class FailingTokenizer(CommentTokenizer):
+            def tokenize(self, marks, text):
+                if marks == "3":
+                    raise RuntimeError("сбой ячейки")
+                return super().tokenize(marks, text)
+
+        diagnostics = Diagnostics()
+        sheet = d.open_workbook(self.path, "xml").active
+        _, _, marks = d.scan_sheet(sheet, tokenizer=FailingTokenizer(d.coeffs, d.default_coeff), diagnostics=diagnostics)
+        self.assertEqual(len(marks), len(MarksTable.from_marks(expected)) - 1)
+        self.assertEqual(dict(diagnostics.counts), {"bad_cell": 1})
+        problem = diagnostics.problems[0]
+        self.assertEqual((problem.subject, problem.date, problem.cell), ("Алгебра", "08.11.2024", "D11"))
+        self.assertEqual((diagnostics.complete, diagnostics.cells, diagnostics.bad_cells), (True, 5, 1))
+
+    def test_batch_tolerant(self):
+        '''Тестируем пакетный мягкий режим: файл с проблемами не ошибочный, битый - ошибочный'''
+        garbage = os.path.join(self.folder, "Битый.xlsx")
+        with open(garbage, "wb") as file:
+            file.write(b"not a zip")
+        strict, tolerant = (batch.run_batch([self.path, garbage], workers=1, tolerant=mode) for mode in (False, True))
+        self.assertEqual([r["status"] for r in strict], ["error", "error"])
+        self.assertEqual([r["status"] for r in tolerant], ["ok", "error"])
+        self.assertEqual((tolerant[0]["quality"], tolerant[0]["diagnostics"]["bad_cells"]), (0.5, 3))
+        self.assertEqual(batch.summarize(tolerant, 1)["with_problems"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
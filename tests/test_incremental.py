@@ -0,0 +1,144 @@
+import unittest
+import os
+import random
+from datetime import date as Date, timedelta
+import openpyxl as xl
+from openpyxl.comments import Comment
+from unittest.mock import patch
+import pytest
+
+import data_processing as d
+from analysis import analyze
+from incremental import IncrementalAnalyzer, StateStore
+
+WORK_TYPES = ["Работа на уроке", "Самостоятельная работа", "Контрольная работа", "Словарный диктант", "Тест"]
+
+
+def random_diary(path, seed, dates=30, subjects=6):
+    '''Выгрузка со случайными отметками: одинаковый `seed` даёт одинаковые первые столбцы при любом `dates`'''
+    rnd = random.Random(seed)
+    workbook = xl.Workbook()
+    sheet = workbook.active
+    for row, (key, value) in enumerate([("Организация:", "Хогвардс"), ("Обучающийся:", f"Ученик {seed}"),
+                                        ("Класс:", "9 б"), ("Период:", "II четверть")]):
+        sheet.cell(row * 2 + 1, 1, key)
+        sheet.cell(row * 2 + 2, 1, value)
+    for idx in range(subjects):
+        sheet.cell(11 + idx, 1, f"Предмет {idx}")
+    for col in range(dates):
+        date = (Date(2024, 11, 1) + timedelta(days=col)).strftime("%d.%m.%Y")
+        sheet.cell(10, 2 + col, date)
+        for row in range(subjects):
+            if rnd.random() < 0.4:
+                marks = "".join(rnd.choice("2345") for _ in range(rnd.choice([1, 1, 1, 2])))
+                comment = "; ".join(f"{mark} - {rnd.choice(WORK_TYPES)} - {date}" for mark in marks)
+                sheet.cell(11 + row, 2 + col, marks).comment = Comment(comment, "ЭлЖур")
+    sheet.cell(10, 2 + dates, "Итог:")
+    workbook.save(path)
+
+
+@pytest.mark.usefixtures("diary")
+class TestIncrementalAnalyzer(unittest.TestCase):
+    def sheet(self):
+        return d.read_excel(self.path, "xml").active
+
+    def test_first_update_matches_analyze(self):
+        '''Тестируем, что первый разбор даёт тот же отчёт, что и analyze'''
+        update = IncrementalAnalyzer().update(self.sheet())
+        self.assertEqual(update.report, analyze(self.sheet()))
+        self.assertEqual((update.columns, update.parsed, update.recomputed), (3, 3, 4))
+
+    def test_unchanged_export(self):
+        '''Тестируем, что повторная та же выгрузка ничего не разбирает и не пересчитывает'''
+        analyzer = IncrementalAnalyzer()
+        first = analyzer.update(self.sheet())
+        second = analyzer.update(self.sheet())
+        self.assertEqual((second.parsed, second.recomputed), (0, 0))
+        self.assertEqual(second.report, first.report)
+
+    def test_growing_exports(self):
+        '''Тестируем выгрузки, в которых появляются новые даты и меняются старые отметки'''
+        for seed in range(5):
+            analyzer = IncrementalAnalyzer()
+            for dates in (10, 18, 18, 25):
+                random_diary(self.path, seed, dates=dates)
+                workbook = xl.load_workbook(self.path)
+                if dates == 18 and seed % 2:
+                    # Исправленная отметка в середине четверти
+                    workbook.active.cell(11, 6, "5").comment = Comment("5 - Тест - 05.11.2024", "ЭлЖур")
+                    workbook.save(self.path)
+                update = analyzer.update(self.sheet())
+                self.assertEqual(update.report, analyze(self.sheet()))
+                self.assertEqual(update.columns, dates)
+            # 7 новых дат, а у нечётных - ещё и вернувшийся к прежнему виду столбец
+            self.assertEqual(update.parsed, 7 + seed % 2)
+
+    def test_series(self):
+        '''Тестируем, что ряд среднего балла совпадает с extractScoreMass'''
+        import visualization as v
+        random_diary(self.path, 7, dates=12)
+        analyzer = IncrementalAnalyzer()
+        analyzer.update(self.sheet())
+        random_diary(self.path, 7, dates=20)
+        sheet = self.sheet()
+        info = d.extract_info(sheet)
+        analyzer.update(sheet)
+        marks = d.extract_marks(sheet, d.extract_subjects(sheet))
+        for subject in marks:
+            dates, running = analyzer.state(info).series(subject)
+            self.assertEqual(dates, d.refactor_marks(marks, subject)[0])
+            self.assertEqual(running, v.extractScoreMass(subject, marks))
+
+    def test_state_on_disk(self):
+        '''Тестируем, что состояние переживает перезапуск'''
+        folder = os.path.join(self.folder, "state")
+        random_diary(self.path, 3, dates=15)
+        IncrementalAnalyzer(folder).update(self.sheet())
+        random_diary(self.path, 3, dates=16)
+        update = IncrementalAnalyzer(folder).update(self.sheet())
+        self.assertEqual(update.parsed, 1)
+        self.assertEqual(update.report, analyze(self.sheet()))
+
+    def test_state_store_keeps_everyone(self):
+        '''Тестируем, что состояния не вытесняются, сколько бы учеников ни было'''
+        folder = os.path.join(self.folder, "state")
+        analyzer = IncrementalAnalyzer(folder)
+        with patch.object(d.WorkbookCache, "__init__", side_effect=AssertionError("WorkbookCache")):
+            for seed in range(5):
+                random_diary(self.path, seed, dates=3, subjects=2)
+                analyzer.update(self.sheet())
+        self.assertEqual(len(os.listdir(folder)), 5)
+        self.assertIsNotNone(StateStore(folder).get(analyzer.key(d.extract_info(self.sheet()))))
+
+    def test_subjects_not_reextracted(self):
+        '''Тестируем, что повторная выгрузка сверяет предметы по ячейкам, а не перебирает весь лист'''
+        random_diary(self.path, 4, dates=10)
+        analyzer = IncrementalAnalyzer()
+        analyzer.update(self.sheet())
+        random_diary(self.path, 4, dates=12)
+        with patch.object(d, "extract_subjects", wraps=d.extract_subjects) as extract:
+            update = analyzer.update(self.sheet())
+            self.assertFalse(extract.called)
+            workbook = xl.load_workbook(self.path)
+            workbook.active.cell(17, 1, "Предмет 6")
+            workbook.save(self.path)
+            changed = analyzer.update(self.sheet())
+            self.assertTrue(extract.called)
+        self.assertEqual(update.parsed, 2)
+        self.assertEqual(changed.report, analyze(self.sheet()))
+
+    def test_missing_comment(self):
+        '''Тестируем, что отметка без комментария даёт ValueError, а состояние не портится'''
+        analyzer = IncrementalAnalyzer()
+        first = analyzer.update(self.sheet())
+        workbook = xl.load_workbook(self.path)
+        workbook.active["D13"] = "4"
+        workbook.save(self.path)
+        with self.assertRaises(ValueError):
+            analyzer.update(self.sheet())
+        self.build_diary(self.path)
+        self.assertEqual(analyzer.update(self.sheet()).report, first.report)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+import io
+import json
+import os
+import subprocess
+import sys
+from contextlib import redirect_stdout
+from unittest.mock import patch
+
+import pytest
+
+import analysis as a
+import data_processing as d
+import main
+import resample
+
+src_root = os.path.dirname(os.path.abspath(main.__file__))
+
+
+@pytest.mark.usefixtures("diary")
+class TestMainCli(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(d, "folder_root", self.folder)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def call(self, *argv):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            code = main.main([*argv, "--no-cache"])
+        return code, output.getvalue()
+
+    def test_json_means(self):
+        '''Тестируем вывод средних баллов в JSON без вопросов через input()'''
+        with patch("builtins.input", side_effect=AssertionError("input() не должен вызываться")):
+            code, output = self.call("Отметки.xlsx", "--format", "json", "--no-graph")
+        self.assertEqual(code, 0)
+        data = json.loads(output)
+        self.assertEqual([subject["name"] for subject in data["subjects"]], ["Алгебра", "Биология", "Химия"])
+        self.assertEqual(data["subjects"][0], {"name": "Алгебра", "count": 3, "mean": 3.95, "grade": 4, "missing": 0})
+        self.assertEqual((data["total_score"], data["incomplete"]), (4.22, 2))
+        self.assertEqual(data["info"]["Период"], "II четверть")
+        self.assertEqual(data["graphs"], {})
+        # Средние баллы считаются потоком, без таблицы отметок, и совпадают с отчётом по таблице
+        info, _, marks = d.parse_workbook(self.path, "xml")
+        self.assertEqual(main.streamReport(self.path)[2], a.analyze_marks(info, marks))
+
+    def test_subject_and_graph(self):
+        '''Тестируем выбор предмета и сохранение его графика'''
+        code, output = self.call(self.path, "-s", "Алгебра", "--format", "json")
+        data = json.loads(output)
+        self.assertEqual([subject["name"] for subject in data["subjects"]], ["Алгебра"])
+        with open(data["graphs"]["Алгебра"], "rb") as file:
+            self.assertEqual(file.read(8), b"\x89PNG\r\n\x1a\n")
+
+    def test_target(self):
+        '''Тестируем варианты отметок для выхода на оценку в JSON'''
+        code, output = self.call(self.path, "-s", "Алгебра", "--no-graph", "--format", "json", "--target", "5")
+        targets = json.loads(output)["targets"]
+        self.assertEqual([(r["name"], r["grade"], r["reached"]) for r in targets], [("Алгебра", 4, False)])
+        self.assertEqual(targets[0]["plans"][0]["mark"], 5)
+
+    def test_date_range(self):
+        '''Тестируем средний балл за период из аргументов --from и --to'''
+        code, output = self.call(self.path, "--format", "json", "--no-graph", "--from", "01.01.2000", "--to", "31.12.2099")
+        data = json.loads(output)
+        self.assertEqual(data["range"]["subjects"][0], {"name": "Алгебра", "count": 3, "mean": 3.95, "grade": 4, "missing": 0})
+        self.assertEqual(data["range"]["total_score"], data["total_score"])
+
+    def test_archive(self):
+        '''Тестируем сохранение архива и отчёт по нему вместо .xlsx'''
+        archive = os.path.join(self.folder, "Отметки.marks")
+        _, from_xlsx = self.call(self.path, "--format", "json", "--no-graph", "--archive", archive)
+        _, from_archive = self.call(archive, "--format", "json", "--no-graph")
+        self.assertEqual({**json.loads(from_archive), "file": None}, {**json.loads(from_xlsx), "file": None})
+
+    def test_dashboard(self):
+        '''Тестируем сохранение сводки графиков в SVG без matplotlib'''
+        path = os.path.join(self.folder, "сводка.svg")
+        code, output = self.call(self.path, "--format", "json", "--no-graph", "--dashboard", path)
+        self.assertEqual((code, json.loads(output)["dashboard"]), (0, path))
+        with open(path, encoding="utf-8") as file:
+            self.assertIn("Алгебра", file.read())
+
+    def test_tolerant(self):
+        '''Тестируем мягкий режим и ошибки чтения без выхода через exit()'''
+        self.build_broken_diary(self.path)
+        code, output = self.call(self.path, "--format", "json", "--no-graph")
+        self.assertEqual((code, "отсутствуют комментарии" in json.loads(output)["error"]), (1, True))
+        code, output = self.call(self.path, "--format", "json", "--no-graph", "--tolerant")
+        self.assertEqual((code, json.loads(output)["diagnostics"]["quality"]), (0, 0.5))
+        code, output = self.call("нету.xlsx", "--format", "json")
+        self.assertEqual((code, "не найден" in json.loads(output)["error"]), (1, True))
+        with open(os.path.join(self.folder, "Битый.xlsx"), "wb") as file:
+            file.write(b"not a zip")
+        code, output = self.call("Битый.xlsx", "--format", "json", "--tolerant")
+        self.assertEqual(code, 1)
+
+    def test_unknown_subject(self):
+        '''Тестируем код завершения для несуществующего предмета'''
+        with patch("sys.stderr", io.StringIO()) as stderr:
+            code, output = self.call(self.path, "-s", "Физика")
+        self.assertEqual((code, output), (2, ""))
+        self.assertIn("Физика", stderr.getvalue())
+
+    def test_lazy_imports(self):
+        '''Тестируем, что вывод средних баллов не импортирует openpyxl, matplotlib, NumPy и datetime'''
+        code = ("import sys, main; main.main([sys.argv[1], '--format', 'json', '--no-graph', '--no-cache']); "
+                "print(sorted(m for m in ('openpyxl', 'matplotlib', 'numpy', 'datetime') if m in sys.modules))")
+        run = subprocess.run([sys.executable, "-c", code, self.path], cwd=src_root,
+                             capture_output=True, text=True, check=True)
+        self.assertEqual(run.stdout.splitlines()[-1], "[]")
+        self.assertEqual(main.PERIODS, resample.FREQUENCIES)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+import numpy as np
+import pytest
+
+import data_processing as d
+from marks_table import MarksTable, date_to_ordinal
+
+
+class TestMarksTable(unittest.TestCase):
+    def setUp(self):
+        self.marks = {
+            "Алгебра": [
+                {"Дата": "06.11.2024", "Отметка": 5, "Тип работы": "Работа на уроке", "Коэффициент": 1},
+                {"Дата": "06.11.2024", "Отметка": 4, "Тип работы": "Контрольная работа", "Коэффициент": 1.5},
+                {"Дата": "08.11.2024", "Отметка": 3, "Тип работы": "Самостоятельная работа", "Коэффициент": 1.2},
+            ],
+            "Биология": [],
+            "Химия": [
+                {"Дата": "07.11.2024", "Отметка": 5, "Тип работы": "Работа на уроке", "Коэффициент": 1},
+            ],
+        }
+        self.table = MarksTable.from_marks(self.marks)
+
+    def test_roundtrip(self):
+        '''Тестируем, что адаптер возвращает исходный словарь'''
+        self.assertEqual(self.table.to_marks(), self.marks)
+
+    def test_columns(self):
+        '''Тестируем содержимое колонок и интернирование типов работ'''
+        self.assertEqual(len(self.table), 4)
+        self.assertEqual(self.table.subject_id.tolist(), [0, 0, 0, 2])
+        self.assertEqual(self.table.work_types, ["Работа на уроке", "Контрольная работа", "Самостоятельная работа"])
+        self.assertEqual(self.table.work_type_id.tolist(), [0, 1, 2, 0])
+        self.assertEqual(self.table.date[0], date_to_ordinal("06.11.2024"))
+        self.assertEqual(self.table.offsets.tolist(), [0, 3, 3, 4])
+
+    def test_view_is_zero_copy(self):
+        '''Тестируем, что срез предмета не копирует данные'''
+        view = self.table.view("Алгебра")
+        self.assertTrue(np.shares_memory(view.marks, self.table.mark))
+        self.assertEqual(view.marks.tolist(), [5, 4, 3])
+        self.assertEqual(len(self.table.view("Биология").marks), 0)
+
+    def test_refactor_marks(self):
+        '''Тестируем, что `refactor_marks` одинаково работает со словарём и таблицей'''
+        for subject in self.marks:
+            self.assertEqual(d.refactor_marks(self.table, subject), d.refactor_marks(self.marks, subject))
+        with self.assertRaises(KeyError):
+            d.refactor_marks(self.table, "Физика")
+
+    @pytest.mark.usefixtures("diary")
+    def test_extract_marks_table(self):
+        '''Тестируем сбор таблицы напрямую из листа'''
+        sheet = d.read_excel(self.path, "xml").active
+        subjects = d.extract_subjects(sheet)
+        table = d.extract_marks_table(sheet, subjects)
+        self.assertEqual(table.to_marks(), d.extract_marks(sheet, subjects))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+
+import data_processing as d
+import main
+import profiling
+
+
+@pytest.mark.usefixtures("diary")
+class TestProfiling(unittest.TestCase):
+    def tearDown(self):
+        profiling.disable()
+        profiling.reset()
+
+    def test_disabled_by_default(self):
+        '''Тестируем, что без enable() ничего не копится'''
+        d.parse_workbook(self.path, "xml")
+        report = profiling.report()
+        self.assertEqual((report["stages"], report["counters"]), ({}, {}))
+
+    def test_stages_and_counters(self):
+        '''Тестируем этапы разбора и счётчики ячеек, отметок, предметов и кэша'''
+        profiling.enable()
+        cache = d.WorkbookCache(os.path.join(self.folder, "cache"))
+        d.parse_workbook(self.path, "xml", cache)
+        d.parse_workbook(self.path, "xml", cache)
+        report = profiling.report()
+        self.assertEqual(report["stages"]["parse_workbook"]["calls"], 2)
+        for stage in ("load_workbook", "scan_sheet"):
+            self.assertEqual(report["stages"][stage]["calls"], 1)
+        self.assertGreater(report["stages"]["load_workbook"]["peak_kb"], 0)
+        self.assertGreaterEqual(report["stages"]["parse_workbook"]["peak_kb"], report["stages"]["load_workbook"]["peak_kb"])
+        self.assertEqual(report["counters"], {"subjects": 3, "date_columns": 3, "cells": 5, "comment_warnings": 0,
+                                              "marks": 4, "cache_misses": 1, "cache_hits": 1})
+
+    def test_separate_marks_stages(self):
+        '''Тестируем, что словарь и таблица отметок замеряются как разные этапы'''
+        sheet = d.read_excel(self.path, "xml").active
+        subjects = d.extract_subjects(sheet)
+        profiling.enable()
+        d.extract_marks(sheet, subjects)
+        d.extract_marks_table(sheet, subjects)
+        d.extract_marks_table(sheet, subjects)
+        stages = profiling.report()["stages"]
+        self.assertEqual((stages["extract_marks"]["calls"], stages["extract_marks_table"]["calls"]), (1, 2))
+
+    def test_nested_stages(self):
+        '''Тестируем, что пик памяти внешнего этапа учитывает вложенный'''
+        profiling.enable()
+        with profiling.stage("outer"):
+            with profiling.stage("inner"):
+                data = bytearray(2 * 2**20)
+            del data
+        stages = profiling.report()["stages"]
+        self.assertGreaterEqual(stages["inner"]["peak_kb"], 2048)
+        self.assertGreaterEqual(stages["outer"]["peak_kb"], stages["inner"]["peak_kb"])
+        self.assertGreaterEqual(stages["outer"]["total_ms"], stages["inner"]["total_ms"])
+
+    def test_emit_json_and_cprofile(self):
+        '''Тестируем запись отчёта строкой JSON и дамп cProfile'''
+        log_path = os.path.join(self.folder, "profile.jsonl")
+        prof_path = os.path.join(self.folder, "run.prof")
+        profiling.enable(cprofile_path=prof_path)
+        d.parse_workbook(self.path, "openpyxl")
+        profiling.emit(log_path)
+        profiling.emit(log_path)
+        with open(log_path, encoding="utf-8") as file:
+            lines = [json.loads(line) for line in file]
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(lines[0]["event"], "profile")
+        self.assertIn("load_workbook", lines[0]["stages"])
+        self.assertFalse(profiling.enabled())
+        self.assertTrue(os.path.getsize(prof_path) > 0)
+
+    def test_main_profile_flag(self):
+        '''Тестируем ключ --profile у main.py'''
+        log_path = os.path.join(self.folder, "profile.jsonl")
+        answers = iter([self.path, ""])
+        with patch("builtins.input", lambda *args: next(answers)), patch("builtins.print"), \
+                patch.object(d, "folder_root", self.folder):
+            main.main(["--profile", log_path])
+        with open(log_path, encoding="utf-8") as file:
+            report = json.loads(file.readline())
+        self.assertIn("statistics", report["stages"])
+        self.assertEqual(report["counters"]["marks"], 4)
+        # Кэш разобранных книг создаётся в подменённой папке данных, а не в рабочем дереве проекта
+        self.assertTrue(os.listdir(os.path.join(self.folder, ".cache")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+import threading
+
+import render
+from marks_table import MarksTable
+
+
+class TestRender(unittest.TestCase):
+    def setUp(self):
+        self.scores = [4.0, 4.5, 4.33, 3.9]
+        self.dates = ["06.11.2024", "07.11.2024", "08.11.2024", "11.11.2024"]
+
+    def test_png(self):
+        '''Тестируем отрисовку PNG в память'''
+        image = render.render_graph("Алгебра", self.scores, self.dates)
+        self.assertTrue(image.startswith(b"\x89PNG"))
+
+    def test_svg(self):
+        '''Тестируем отрисовку SVG в память'''
+        image = render.render_graph("Алгебра", self.scores, self.dates, fmt="svg")
+        self.assertIn(b"<svg", image)
+
+    def test_template_reuse(self):
+        '''Тестируем, что фигура одного размера создаётся один раз'''
+        render.render_graph("Алгебра", self.scores, self.dates)
+        template = render._template(render.figure_size(len(self.dates)))
+        render.render_graph("Химия", [3.0, 2.5], self.dates[:2])
+        self.assertIs(render._template(render.figure_size(2)), template)
+        self.assertEqual(len(template.axes.lines), 5)
+        self.assertEqual([label.get_text() for label in template.axes.get_xticklabels()], ["06.11", "07.11"])
+
+    def test_threads(self):
+        '''Тестируем, что потоки не делят фигуры между собой'''
+        errors = []
+
+        def work():
+            try:
+                for _ in range(3):
+                    render.render_graph("Алгебра", self.scores, self.dates)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_render_subjects(self):
+        '''Тестируем пакетную отрисовку всех предметов в пуле процессов'''
+        records = lambda dates: [{"Дата": date, "Отметка": 5 - i % 2, "Тип работы": "Тест", "Коэффициент": 1}
+                                 for i, date in enumerate(dates)]
+        marks = {"Алгебра": records(self.dates), "Химия": records(self.dates[:2]), "Биология": records(self.dates[:1])}
+        images = render.render_subjects(MarksTable.from_marks(marks), workers=2)
+        self.assertEqual(sorted(images), ["Алгебра", "Химия"])
+        self.assertTrue(all(image.startswith(b"\x89PNG") for image in images.values()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import unittest
+import os
+import tempfile
+from collections import defaultdict
+from datetime import date, timedelta
+
+import numpy as np
+
+import data_processing as d
+import resample as r
+import visualization as v
+from main import process_grades
+from marks_table import MarksTable
+from synthetic import generate_diary
+
+
+def naive_groups(dates, values, key):
+    '''Группировка словарём, как в прежнем process_grades'''
+    groups = defaultdict(list)
+    for day, value in zip(dates, values):
+        groups[key(day)].append(value)
+    return {k: sum(vals) / len(vals) for k, vals in sorted(groups.items())}
+
+
+class TestResample(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(cls.tmp.name, "diary.xlsx")
+        generate_diary(path, subjects=8, days=150, period="I полугодие", seed=3)
+        _, cls.subjects, cls.marks = d.scan_sheet(d.open_workbook(path, "xml").active, table=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_process_grades_matches_dict_grouping(self):
+        '''Тестируем, что средние по дням совпадают с группировкой словарём'''
+        for subject in self.subjects.values():
+            scores = v.extractScoreMass(subject, self.marks)
+            dates = d.refactor_marks(self.marks, subject)[0]
+            expected = naive_groups(dates, scores, lambda s: date(*map(int, reversed(s.split(".")))))
+            values, labels = process_grades(scores, dates)
+            self.assertEqual(labels, [day.strftime("%d.%m.%Y") for day in expected])
+            np.testing.assert_allclose(values, list(expected.values()), rtol=0, atol=1e-12)
+
+    def test_process_grades_keeps_first_appearance(self):
+        '''Тестируем, что process_grades, как и раньше, отдаёт даты в порядке первого появления и в исходном виде'''
+        dates = ["08.11.2024", "6.11.2024", "08.11.2024", date(2024, 11, 7), "6.11.2024"]
+        values, labels = process_grades([5, 4, 3, 2, 2], dates)
+        self.assertEqual(labels, ["08.11.2024", "6.11.2024", date(2024, 11, 7)])
+        self.assertEqual(values, [4.0, 3.0, 2.0])
+
+    def test_periods_match_calendar(self):
+        '''Тестируем недели, месяцы и кварталы на произвольных датах, включая неотсортированные'''
+        rnd = np.random.default_rng(0)
+        days = [date(2023, 12, 20) + timedelta(days=int(x)) for x in rnd.integers(0, 200, 400)]
+        values = rnd.integers(1, 6, 400).astype(float)
+        keys = {
+            "day": lambda day: day,
+            "week": lambda day: day - timedelta(days=day.weekday()),
+            "month": lambda day: day.replace(day=1),
+            "quarter": lambda day: date(day.year, (day.month - 1) // 3 * 3 + 1, 1),
+        }
+        for freq, key in keys.items():
+            series = r.resample(r.to_ordinals(days), values, freq)
+            expected = naive_groups(days, values, key)
+            self.assertEqual([date.fromordinal(x) for x in series.starts.tolist()], list(expected))
+            np.testing.assert_allclose(series.values, list(expected.values()), rtol=0, atol=1e-12)
+            self.assertEqual(series.counts.sum(), len(days))
+
+    def test_weighted_and_running(self):
+        '''Тестируем средневзвешенный балл за период и накопленный средний балл на конец периода'''
+        subject = max(self.marks, key=lambda name: len(self.marks[name]))
+        dates, marks, coeffs = d.refactor_marks(self.marks, subject)
+        ordinals = r.to_ordinals(dates)
+        weighted = r.resample(ordinals, marks, "month", weights=coeffs)
+        for start, value in zip(weighted.starts.tolist(), weighted.values.tolist()):
+            month = date.fromordinal(start)
+            rows = [(m, c) for s, m, c in zip(dates, marks, coeffs) if s.endswith(month.strftime(".%m.%Y"))]
+            self.assertAlmostEqual(value, sum(m * c for m, c in rows) / sum(c for _, c in rows))
+        running = r.running(ordinals, marks, coeffs, "week")
+        scores = v.extractScoreMass(subject, self.marks)
+        ends = np.cumsum(running.counts) - 1
+        self.assertEqual(running.values.tolist(), [scores[i] for i in ends.tolist()])
+
+    def test_table_and_dict_series(self):
+        '''Тестируем, что ряд по таблице (даты уже порядковые номера) совпадает с рядом по словарю'''
+        table = MarksTable.from_marks(self.marks)
+        for subject in self.subjects.values():
+            for freq in r.FREQUENCIES:
+                by_table = r.subject_series(table, subject, freq)
+                by_dict = r.subject_series(self.marks, subject, freq)
+                self.assertEqual(by_table.starts.tolist(), by_dict.starts.tolist())
+                self.assertEqual(by_table.values.tolist(), by_dict.values.tolist())
+                values, labels = r.graph_series(table, subject, freq)
+                self.assertEqual((values, labels), (by_dict.values.tolist(), r.labels(by_dict.starts, freq)))
+
+    def test_labels(self):
+        '''Тестируем подписи периодов и дат без strptime'''
+        start = date(2024, 11, 6).toordinal()
+        self.assertEqual(r.labels([start], "day"), ["06.11"])
+        self.assertEqual(r.labels(r.period_starts(r.period_keys([start], "week"), "week"), "week"), ["04.11"])
+        self.assertEqual(r.labels(r.period_starts(r.period_keys([start], "month"), "month"), "month"), ["11.2024"])
+        self.assertEqual(r.labels(r.period_starts(r.period_keys([start], "quarter"), "quarter"), "quarter"),
+                         ["IV кв. 2024"])
+        self.assertEqual([r.short_date(x) for x in ("6.11.2024", date(2024, 11, 6), start, "11.2024")],
+                         ["06.11", "06.11", "06.11", "11.2024"])
+        with self.assertRaises(ValueError):
+            r.resample([start], [5], "year")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import unittest
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import service
+
+
+def slow_job(data, delay=0.2):
+    time.sleep(delay)
+    return {"size": len(data)}
+
+
+@pytest.mark.usefixtures("diary")
+class TestAnalysisService(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        with open(self.path, "rb") as file:
+            self.data = file.read()
+
+    async def test_process_pool(self):
+        '''Тестируем обработку файла в пуле процессов'''
+        async with service.AnalysisService(workers=2) as svc:
+            reports = await asyncio.gather(*(svc.submit(self.data) for _ in range(4)))
+            metrics = svc.metrics()
+        self.assertEqual(reports[0]["subjects"][0]["name"], "Алгебра")
+        self.assertEqual(list(reports[0]["histogram"]), [0, 1, 0, 0, 0])
+        self.assertEqual((metrics["completed"], metrics["queue_depth"]), (4, 0))
+        self.assertIsNotNone(metrics["latency"]["p95"])
+
+    async def test_bad_file(self):
+        '''Тестируем, что ошибка в файле возвращается вызывающему, а сервис продолжает работу'''
+        async with service.AnalysisService(workers=1) as svc:
+            with self.assertRaises(Exception):
+                await svc.submit(b"not a zip")
+            self.assertEqual((await svc.submit(self.data))["info"]["Класс"], "9 б")
+            self.assertEqual(svc.metrics()["failed"], 1)
+
+    async def test_backpressure(self):
+        '''Тестируем отказ при заполненной очереди'''
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            svc = service.AnalysisService(workers=1, max_pending=1, job=slow_job, executor=pool)
+            svc.start()
+            first = asyncio.ensure_future(svc.submit(b"1"))
+            second = asyncio.ensure_future(svc.submit(b"22"))
+            await asyncio.sleep(0.05)
+            self.assertEqual(svc.metrics()["queue_depth"], 1)
+            with self.assertRaises(service.ServiceBusy):
+                await svc.submit(b"333")
+            self.assertEqual([(await first)["size"], (await second)["size"]], [1, 2])
+            self.assertEqual(svc.metrics()["rejected"], 1)
+
+    async def test_timeout(self):
+        '''Тестируем таймаут запроса'''
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            svc = service.AnalysisService(workers=1, timeout=0.05, job=slow_job, executor=pool)
+            svc.start()
+            with self.assertRaises(asyncio.TimeoutError):
+                await svc.submit(b"1")
+            self.assertEqual(svc.metrics()["timeouts"], 1)
+
+    async def test_abandoned_job_holds_slot(self):
+        '''Тестируем, что задача, брошенная по таймауту, занимает место в пуле, пока не доработает'''
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            svc = service.AnalysisService(workers=1, max_pending=1, timeout=0.1, job=slow_job, executor=pool)
+            svc.start()
+            with self.assertRaises(asyncio.TimeoutError):
+                await svc.submit(b"1", 0.5)
+            metrics = svc.metrics()
+            self.assertEqual((metrics["running"], metrics["abandoned_running"], metrics["abandoned"]), (1, 1, 1))
+            waiting = asyncio.ensure_future(svc.submit(b"22", 0))
+            await asyncio.sleep(0.02)
+            self.assertEqual(svc.metrics()["queue_depth"], 1)
+            with self.assertRaises(service.ServiceBusy):
+                await svc.submit(b"333", 0)
+            with self.assertRaises(asyncio.TimeoutError):
+                await waiting
+            await asyncio.sleep(0.5)
+            metrics = svc.metrics()
+            self.assertEqual((metrics["running"], metrics["abandoned_running"]), (0, 0))
+            self.assertEqual((await svc.submit(b"4444", 0))["size"], 4)
+
+    def test_charts(self):
+        '''Тестируем отрисовку графиков в задаче пула'''
+        report = service.process_upload(self.data, charts="svg")
+        self.assertEqual(list(report["charts"]), ["Алгебра"])
+        self.assertTrue(report["charts"]["Алгебра"].lstrip().startswith("<?xml"))
+
+    async def test_http(self):
+        '''Тестируем HTTP-обёртку'''
+        async def request(port, raw):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(raw)
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            head, _, body = response.partition(b"\r\n\r\n")
+            return int(head.split()[1]), json.loads(body)
+
+        async with service.AnalysisService(workers=1) as svc:
+            server = await asyncio.start_server(lambda r, w: service.handle_http(svc, r, w), "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                status, report = await request(port, b"POST /analyze HTTP/1.1\r\nContent-Length: %d\r\n\r\n" % len(self.data) + self.data)
+                self.assertEqual(status, 200)
+                self.assertEqual(report["info"]["Обучающийся"], "Гарри Поттер")
+                status, metrics = await request(port, b"GET /metrics HTTP/1.1\r\n\r\n")
+                self.assertEqual((status, metrics["completed"]), (200, 1))
+                status, _ = await request(port, b"POST /analyze HTTP/1.1\r\nContent-Length: 3\r\n\r\nbad")
+                self.assertEqual(status, 422)
+                status, _ = await request(port, b"GET /nothing HTTP/1.1\r\n\r\n")
+                self.assertEqual(status, 404)
+                status, report = await request(port, b"POST /analyze?target=5 HTTP/1.1\r\nContent-Length: %d\r\n\r\n" % len(self.data) + self.data)
+                self.assertEqual((status, report["targets"][0]["name"], report["targets"][0]["reached"]), (200, "Алгебра", False))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+import io
+import os
+import subprocess
+import sys
+import xml.etree.ElementTree as ET
+
+from PIL import Image
+
+import sparkline as s
+from marks_table import MarksTable
+
+SVG = "{http://www.w3.org/2000/svg}"
+
+
+class TestSparkline(unittest.TestCase):
+    def setUp(self):
+        self.scores = [4.0, 4.5, 4.33, 3.9]
+        self.dates = ["06.11.2024", "07.11.2024", "08.11.2024", "11.11.2024"]
+
+    def test_svg(self):
+        '''Тестируем SVG: ряд из всех точек, пороговые линии в пределах оси и подписи дат'''
+        root = ET.fromstring(s.render_sparkline("Алгебра & геометрия", self.scores, self.dates))
+        lines = root.findall(f"{SVG}polyline")
+        self.assertEqual(len(lines[-1].get("points").split()), 4)
+        # Пределы оси 3.33-5.07: линии 3.5 и 4.5
+        self.assertEqual(len([line for line in lines if line.get("stroke-dasharray")]), 2)
+        texts = [text.text for text in root.findall(f"{SVG}text")]
+        self.assertEqual(texts[0], "Алгебра & геометрия")
+        self.assertIn("06.11", texts)
+        self.assertIn("11.11", texts)
+
+    def test_ticks(self):
+        '''Тестируем, что подписи дат не налезают друг на друга и крайние даты подписаны'''
+        positions = [i * 7.5 for i in range(40)]
+        ticks = s._ticks(positions)
+        self.assertEqual((ticks[0], ticks[-1]), (0, 39))
+        self.assertTrue(all(positions[b] - positions[a] >= 38 for a, b in zip(ticks, ticks[1:])))
+        self.assertEqual(s._ticks([0.0, 10.0]), [0, 1])
+
+    def test_dashboard(self):
+        '''Тестируем раскладку всех предметов плитками в одну картинку'''
+        records = lambda dates: [{"Дата": date, "Отметка": 5 - i % 2, "Тип работы": "Тест", "Коэффициент": 1}
+                                 for i, date in enumerate(dates)]
+        marks = {"Алгебра": records(self.dates), "Химия": records(self.dates[:2]), "Биология": records(self.dates[:1])}
+        image = Image.open(io.BytesIO(s.dashboard(MarksTable.from_marks(marks), columns=2, width=200, height=100)))
+        self.assertEqual((image.format, image.size), ("PNG", (400, 200)))
+        svg = s.dashboard(marks, fmt="svg", columns=3)
+        self.assertEqual(svg.count("мало отметок"), 1)
+
+    def test_empty_dashboard(self):
+        '''Тестируем панель без предметов: одна плитка с надписью вместо картинки высотой 0'''
+        image = Image.open(io.BytesIO(s.dashboard({}, width=200, height=100)))
+        self.assertEqual(image.size, (200, 100))
+        root = ET.fromstring(s.dashboard(MarksTable.from_marks({}), fmt="svg"))
+        self.assertEqual([text.text for text in root.findall(f"{SVG}text")], ["нет оценок"])
+        self.assertEqual((root.get("width"), root.get("height")), ("320", "120"))
+
+    def test_no_matplotlib(self):
+        '''Тестируем, что модуль не импортирует matplotlib'''
+        code = ("import sys, sparkline; sparkline.render_sparkline('Алгебра', [4, 5], ['06.11.2024', '07.11.2024'], 'png'); "
+                "print('matplotlib' in sys.modules)")
+        run = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(s.__file__)),
+                             capture_output=True, text=True, check=True)
+        self.assertEqual(run.stdout.strip(), "False")
+
+
+if __name__ == "__main__":
+    unittest.main()
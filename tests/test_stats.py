@@ -0,0 +1,89 @@
+import unittest
+import random
+import numpy as np
+
+from marks_table import MarksTable
+from stats import compute_stats, min_marks, running_means, weighted_mean
+
+WORK_TYPES = [("Работа на уроке", 1), ("Самостоятельная работа", 1.2), ("Срезовая работа", 1.3),
+              ("Словарный диктант", 1.4), ("Контрольная работа", 1.5)]
+
+
+def old_mean(marks, coeffs):
+    '''Средний балл так, как его считал `countMean` до векторизации'''
+    marks = [m * c for m, c in zip(marks, coeffs)]
+    return round(sum(marks) / sum(coeffs), 2)
+
+def old_running(marks, coeffs):
+    '''Ряд среднего балла так, как его считал `extractScoreMass` до векторизации'''
+    marks = [m * c for m, c in zip(marks, coeffs)]
+    return [round(sum(marks[:i + 1]) / sum(coeffs[:i + 1]), 2) for i in range(len(marks))]
+
+
+def random_marks(seed, subjects=40, max_marks=60):
+    rnd = random.Random(seed)
+    marks = {}
+    for idx in range(subjects):
+        records = []
+        for _ in range(rnd.randint(0, max_marks)):
+            work_type, coeff = rnd.choice(WORK_TYPES)
+            records.append({"Дата": f"{rnd.randint(1, 28):02}.11.2024", "Отметка": rnd.choice([2, 3, 4, 4, 5, 5]),
+                            "Тип работы": work_type, "Коэффициент": coeff})
+        marks[f"Предмет {idx}"] = records
+    return marks
+
+
+class TestStats(unittest.TestCase):
+    def test_parity_with_old_functions(self):
+        '''Тестируем совпадение со старым подсчётом, включая правила округления'''
+        for seed in range(20):
+            marks = random_marks(seed)
+            table = MarksTable.from_marks(marks)
+            stats = compute_stats(table, "II четверть")
+            histogram = [0, 0, 0, 0, 0]
+            for idx, subject in enumerate(table.subjects):
+                grades = [m["Отметка"] for m in marks[subject]]
+                coeffs = [m["Коэффициент"] for m in marks[subject]]
+                start, stop = table.bounds(subject)
+                self.assertEqual(stats.running[start:stop].tolist(), old_running(grades, coeffs))
+                if not grades:
+                    self.assertEqual(stats.grades[idx], 0)
+                    continue
+                score = old_mean(grades, coeffs)
+                self.assertEqual(stats.means[idx], score)
+                self.assertEqual(stats.grades[idx], round(score + 0.01))
+                if len(grades) >= 3:
+                    histogram[-round(score + 0.01) + 5] += 1
+            self.assertEqual(stats.histogram.tolist(), histogram)
+            everything = [m for subject in marks.values() for m in subject]
+            self.assertEqual(stats.total_score, old_mean([m["Отметка"] for m in everything],
+                                                         [m["Коэффициент"] for m in everything]))
+
+    def test_ties(self):
+        '''Тестируем значения точно на середине между сотыми'''
+        self.assertEqual(weighted_mean([5, 4, 4, 4, 4, 4, 4, 4], [1] * 8), round(33 / 8, 2))
+        self.assertEqual(running_means([5, 4, 4, 4, 4, 4, 4, 4], [1] * 8).tolist(),
+                         old_running([5, 4, 4, 4, 4, 4, 4, 4], [1] * 8))
+
+    def test_missing(self):
+        '''Тестируем подсчёт нехватки отметок'''
+        marks = random_marks(0, subjects=5, max_marks=8)
+        stats = compute_stats(MarksTable.from_marks(marks), "Год")
+        expected = [max(12 - len(records), 0) for records in marks.values()]
+        self.assertEqual(stats.missing.tolist(), expected)
+        self.assertEqual(stats.histogram.sum(), 0)
+
+    def test_min_marks(self):
+        self.assertEqual(min_marks("II четверть"), 3)
+        self.assertEqual(min_marks("1 полугодие"), 6)
+        self.assertEqual(min_marks("Год"), 12)
+        self.assertEqual(min_marks("Расцвет римской империи"), 0)
+
+    def test_empty_table(self):
+        stats = compute_stats(MarksTable.from_marks({"Алгебра": []}))
+        self.assertEqual(stats.counts.tolist(), [0])
+        self.assertTrue(np.isnan(stats.total_score))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+import os
+import random
+import tracemalloc
+
+import openpyxl as xl
+import pytest
+
+import data_processing as d
+import visualization as v
+from analysis import analyze_marks
+from comment_tokenizer import CommentTokenizer
+from streaming import ExactSum, Means, Counts, Histogram, consume, running_series, build_report
+from synthetic import generate_diary
+
+
+class TestExactSum(unittest.TestCase):
+    def test_matches_builtin_sum(self):
+        '''Тестируем, что сумма совпадает со встроенным sum вплоть до типа и последнего бита'''
+        rnd = random.Random(0)
+        pool = [1, 2, 5, 1.5, 1.4, 1.3, 1.2, 5 * 1.5, 4 * 1.3, 3 * 1.4, 0.1, 1e16, -1e16]
+        for _ in range(2000):
+            values = [rnd.choice(pool) for _ in range(rnd.randint(0, 30))]
+            total = ExactSum()
+            for value in values:
+                total.add(value)
+            self.assertEqual((total.value, type(total.value)), (sum(values), type(sum(values))))
+
+
+@pytest.fixture(scope="class")
+def sample(request, tmp_path_factory):
+    '''Синтетическая выгрузка на полугодие - общая для всех тестов класса'''
+    request.cls.sample = str(tmp_path_factory.mktemp("streaming") / "diary.xlsx")
+    generate_diary(request.cls.sample, subjects=12, days=80, period="I полугодие", seed=5)
+
+
+@pytest.mark.usefixtures("sample")
+class TestStreaming(unittest.TestCase):
+
+    def test_report_matches_analysis(self):
+        '''Тестируем, что потоковый отчёт совпадает с analyze_marks на обоих способах чтения'''
+        for engine in ("xml", "openpyxl"):
+            worksheet = d.open_workbook(self.sample, engine).active
+            info, subjects = {}, {}
+            means, = consume(d.stream_marks(worksheet, info, subjects), Means())
+            self.assertEqual(build_report(info, subjects, means), analyze_marks(*d.scan_sheet(worksheet)[::2]))
+
+    def test_aggregators_match_dict(self):
+        '''Тестируем количество, распределение отметок и ряд среднего балла по словарю extract_marks'''
+        worksheet = d.open_workbook(self.sample, "xml").active
+        marks = d.scan_sheet(worksheet, table=False)[2]
+        counts, histogram = consume(d.stream_marks(worksheet), Counts(), Histogram())
+        series = {}
+        for record, mean in running_series(d.stream_marks(worksheet)):
+            series.setdefault(record.subject, []).append(mean)
+        for subject, subject_marks in marks.items():
+            values = [mark["Отметка"] for mark in subject_marks]
+            self.assertEqual(counts.subjects[subject], len(values))
+            self.assertEqual(histogram.subjects.get(subject, [0] * 5), [values.count(mark) for mark in (5, 4, 3, 2, 1)])
+            self.assertEqual(series.get(subject, []), v.extractScoreMass(subject, marks))
+        self.assertEqual(counts.total, sum(len(x) for x in marks.values()))
+        self.assertEqual(sum(histogram.total()), counts.total)
+
+    @pytest.mark.usefixtures("diary")
+    def test_missing_comment(self):
+        '''Тестируем ячейку без комментария: по умолчанию отметки идут с пустым типом, при strict - ошибка'''
+        workbook = xl.load_workbook(self.path)
+        workbook.active["D11"].comment = None
+        tokenizer = CommentTokenizer(d.coeffs, d.default_coeff)
+        records = list(d.stream_marks(workbook.active, tokenizer=tokenizer))
+        self.assertEqual(records[-2], d.MarkRecord("Алгебра", "08.11.2024", 3, "", d.default_coeff))
+        self.assertEqual(tokenizer.missing, 1)
+        with self.assertRaises(ValueError):
+            list(d.stream_marks(workbook.active, strict=True))
+
+    @pytest.mark.usefixtures("tmp_folder")
+    def test_memory_bounded_by_subjects(self):
+        '''Тестируем, что поток с агрегаторами занимает в разы меньше памяти, чем словарь отметок'''
+        path = os.path.join(self.folder, "long.xlsx")
+        generate_diary(path, subjects=20, days=400, seed=1)
+        worksheet = d.open_workbook(path, "xml").active
+        peaks = []
+        for run in (lambda: consume(d.stream_marks(worksheet), Means(), Counts(), Histogram()),
+                    lambda: d.scan_sheet(worksheet, table=False)):
+            tracemalloc.start()
+            result = run()
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            del result
+        self.assertLess(peaks[0] * 4, peaks[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
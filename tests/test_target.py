@@ -0,0 +1,65 @@
+import unittest
+import random
+
+import pytest
+
+import data_processing as d
+import target as t
+from stats import min_marks, weighted_mean
+
+
+def brute_force(marks, coeffs, mark, coeff, grade, required, limit=200):
+    '''Перебор: добавляем по одной отметке и считаем оценку как countMean'''
+    for n in range(limit):
+        new_marks, new_coeffs = marks + [mark] * n, coeffs + [coeff] * n
+        if len(new_marks) >= required and new_marks and round(weighted_mean(new_marks, new_coeffs) + 0.01) >= grade:
+            return n
+    return None
+
+
+class TestTarget(unittest.TestCase):
+    def test_thresholds(self):
+        '''Тестируем пороги с учётом банковского округления round(score + 0.01)'''
+        self.assertEqual(t.THRESHOLDS, {1: 50, 2: 149, 3: 250, 4: 349, 5: 450})
+        for grade, hundredths in t.THRESHOLDS.items():
+            self.assertGreaterEqual(round(hundredths / 100 + 0.01), grade)
+            self.assertLess(round((hundredths - 1) / 100 + 0.01), grade)
+
+    def test_matches_brute_force(self):
+        '''Тестируем, что формула с проверкой даёт то же число отметок, что и перебор'''
+        rnd = random.Random(0)
+        coeff_values = sorted(set(d.coeffs.values()))
+        for _ in range(300):
+            count = rnd.randint(0, 12)
+            marks = [rnd.randint(2, 5) for _ in range(count)]
+            coeffs = [rnd.choice(coeff_values) for _ in range(count)]
+            required = rnd.choice([0, 3, 6])
+            grade, mark, coeff = rnd.randint(2, 5), rnd.randint(2, 5), rnd.choice(coeff_values)
+            products = [m * c for m, c in zip(marks, coeffs)]
+            expected = brute_force(marks, coeffs, mark, coeff, grade, required)
+            needed = t.marks_needed(sum(products), sum(coeffs), count, mark, coeff, grade, required)
+            self.assertEqual(needed, expected, (marks, coeffs, mark, coeff, grade, required))
+
+    @pytest.mark.usefixtures("diary")
+    def test_solve_report(self):
+        '''Тестируем варианты по всем предметам выгрузки'''
+        info, subjects, marks = d.scan_sheet(d.open_workbook(self.path, "xml").active)
+        period = info["Период"]
+        results = t.solve(marks, period, 5)
+        self.assertEqual([r.name for r in results], list(subjects.values()))
+        algebra = results[0]
+        self.assertEqual((algebra.mean, algebra.grade, algebra.reached), (3.95, 4, False))
+        _, subject_marks, subject_coeffs = d.refactor_marks(marks, "Алгебра")
+        for plan in algebra.plans:
+            self.assertEqual(plan.count, brute_force(subject_marks, subject_coeffs, plan.mark, plan.coeff, 5, min_marks(period)))
+            self.assertTrue(all(d.coeffs[work_type] == plan.coeff for work_type in plan.work_types))
+        counts = [plan.count for plan in algebra.plans]
+        self.assertEqual(counts, sorted(counts))
+        self.assertTrue(all(r.reached == (not r.plans) for r in t.solve(marks, period, 2)))
+        self.assertIn("до 5 нужно", t.format_target(algebra))
+        with self.assertRaises(ValueError):
+            t.solve(marks, period, 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+import math
+import os
+import tempfile
+from datetime import date, timedelta
+
+import numpy as np
+
+import data_processing as d
+import trends
+from synthetic import generate_diary
+from visualization import extractScoreMass
+
+
+def mark(day: int, value: int, work_type: str = "Работа на уроке") -> dict:
+    day = (date(2024, 9, 2) + timedelta(days=day)).strftime("%d.%m.%Y")
+    return {"Дата": day, "Отметка": value, "Тип работы": work_type, "Коэффициент": d.coeffs[work_type]}
+
+
+class TestTrends(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.files = []
+        for idx in range(3):
+            path = os.path.join(cls.tmp.name, f"Отметки_{idx}.xlsx")
+            generate_diary(path, subjects=6, days=60, fill=0.2, period="I полугодие", student=f"Ученик {idx}", seed=idx)
+            cls.files.append(path)
+        cls.tables = [d.parse_workbook(path, "xml")[2] for path in cls.files]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_matches_loop(self):
+        '''Тестируем величины по каждому предмету против расчёта циклом по extractScoreMass'''
+        result = trends.scan(self.tables, halflife=10, window=4, span=21, chunk=5)
+        self.assertEqual(result, trends.scan(self.tables, halflife=10, window=4, span=21))
+        expected = iter(result)
+        for table in self.tables:
+            for subject in table.subjects:
+                dates, marks, coeffs = table.refactor(subject)
+                if not marks:
+                    continue
+                trend = next(expected)
+                scores = extractScoreMass(subject, table)
+                days = [d.date_to_ordinal(x) for x in dates]
+                self.assertEqual((trend.subject, trend.count, trend.mean), (subject, len(marks), scores[-1]))
+                self.assertEqual(trend.grade, round(scores[-1] + 0.01))
+                weights = [2 ** (-(days[-1] - day) / 10) * c for day, c in zip(days, coeffs)]
+                self.assertAlmostEqual(trend.ewma, sum(w * m for w, m in zip(weights, marks)) / sum(weights), places=2)
+                self.assertAlmostEqual(trend.rolling, sum(m * c for m, c in zip(marks[-4:], coeffs[-4:])) / sum(coeffs[-4:]),
+                                       places=2)
+                inside = [(day - days[-1], score) for day, score in zip(days, scores) if days[-1] - day <= 21]
+                if len({x for x, _ in inside}) < 2:
+                    self.assertIsNone(trend.slope)
+                    continue
+                slope = np.polyfit([x for x, _ in inside], [y for _, y in inside], 1)[0]
+                self.assertAlmostEqual(trend.slope, round(slope * 7, 3), places=3)
+                if slope < 0 and trend.boundary is not None:
+                    self.assertAlmostEqual(trend.days_to_boundary, (trend.mean - trend.boundary) / -slope, places=0)
+        self.assertIsNone(next(expected, None))
+
+    def test_flags(self):
+        '''Тестируем сползание к границе, падение после контрольной и ранжирование'''
+        sliding = [mark(day, value) for day, value in enumerate([5, 5, 5, 5, 4, 4, 4, 4])]
+        dropped = [mark(0, 5), mark(1, 5), mark(2, 5), mark(9, 2, "Контрольная работа")]
+        steady = [mark(day, 5) for day in range(6)]
+        result = trends.scan([{"Алгебра": sliding, "Физика": dropped, "Химия": steady, "Музыка": [mark(0, 2)]}],
+                             names=["Ученик"])
+        trend = {t.subject: t for t in result}
+        self.assertEqual(set(trend), {"Алгебра", "Физика", "Химия", "Музыка"})
+        self.assertEqual(trend["Алгебра"].mean, 4.5)
+        self.assertEqual(trend["Алгебра"].boundary, 4.49)
+        self.assertLess(trend["Алгебра"].slope, 0)
+        self.assertIn("slide", trend["Алгебра"].flags)
+        self.assertEqual(trend["Физика"].drop, trends.Drop("11.09.2024", 2, "Контрольная работа", -1.0))
+        self.assertIn("drop", trend["Физика"].flags)
+        self.assertEqual((trend["Химия"].flags, trend["Химия"].score), ((), 0.0))
+        # Одной отметки мало для флагов
+        self.assertEqual(trend["Музыка"].flags, ())
+        ranked = trends.rank(result)
+        self.assertEqual([t.subject for t in ranked], sorted(["Алгебра", "Физика"], key=lambda s: -trend[s].score))
+        self.assertTrue(all(0 < t.score <= len(trends.FLAGS) for t in ranked))
+        self.assertTrue(math.isfinite(trend["Алгебра"].days_to_boundary))
+
+    def test_scan_files(self):
+        '''Тестируем разбор папки: имена из выгрузок, битый файл в ошибках'''
+        broken = os.path.join(self.tmp.name, "Битый.xlsx")
+        with open(broken, "wb") as file:
+            file.write(b"not a zip")
+        result, errors = trends.scan_files(self.files + [broken], workers=1)
+        self.assertEqual(list(errors), [broken])
+        self.assertEqual(result, trends.scan(self.tables, [f"Ученик {idx}" for idx in range(3)]))
+        self.assertEqual(trends.rank(result, top=2), trends.rank(result)[:2])
+
+
+if __name__ == '__main__':
+    unittest.main()
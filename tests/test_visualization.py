@@ -0,0 +1,88 @@
+import unittest
+import os
+import tempfile
+from unittest.mock import patch
+
+import matplotlib
+matplotlib.use("Agg")
+
+import data_processing as d
+import visualization as v
+from analysis import analyze_marks
+from synthetic import generate_diary
+
+
+class TestVisualization(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        worksheet = generate_diary(subjects=8, days=40, period="II четверть", seed=3).active
+        cls.info = d.extract_info(worksheet)
+        cls.subjects = d.extract_subjects(worksheet)
+        cls.marks = d.extract_marks(worksheet, cls.subjects)
+        cls.table = d.extract_marks_table(worksheet, cls.subjects)
+
+    def setUp(self):
+        self.total_est = list(v.totalEst)
+
+    def tearDown(self):
+        v.totalEst[:] = self.total_est
+
+    def test_set_color_of_score(self):
+        '''Тестируем цвет оценки по границам 1.5/2.5/3.5/4.5'''
+        self.assertEqual(v.setColorOfScore(5), '\033[1;92m')
+        self.assertEqual(v.setColorOfScore(4.49), '\033[1;93m')
+        self.assertEqual(v.setColorOfScore(3), '\033[1;33m')
+        self.assertEqual(v.setColorOfScore(2), '\033[1;91m')
+        self.assertEqual(v.setColorOfScore(1), '\033[1;90m')
+
+    def test_count_mean_matches_report(self):
+        '''Тестируем, что countMean выводит то же, что formatSubject по отчёту analysis'''
+        report = analyze_marks(self.info, self.table)
+        for result in report.subjects:
+            self.assertEqual(v.countMean(result.name, self.marks, self.info['Период']), v.formatSubject(result))
+            self.assertEqual(v.countMean(result.name, self.table, self.info['Период']), v.formatSubject(result))
+
+    def test_count_mean_not_enough_marks(self):
+        '''Тестируем сообщение о нехватке отметок и пустой предмет'''
+        marks = {"Химия": [{"Дата": "06.11.2024", "Отметка": 5, "Тип работы": "Тест", "Коэффициент": 1}], "Музыка": []}
+        self.assertEqual(v.countMean("Химия", marks, "Год"), "Химия - 5.0 ~ 5 (не хватает 11 оценок)")
+        self.assertEqual(v.countMean("Музыка", marks, "Год"), "Музыка - нет оценок")
+
+    def test_total_score(self):
+        '''Тестируем, что общий средний балл не зависит от представления отметок'''
+        self.assertEqual(v.countTotalScore(self.marks), v.countTotalScore(self.table))
+        self.assertEqual(v.countTotalScore(self.table), analyze_marks(self.info, self.table).total_score)
+
+    def test_extract_score_mass(self):
+        '''Тестируем, что ряд среднего балла заканчивается средним баллом предмета'''
+        for subject in self.marks:
+            scores = v.extractScoreMass(subject, self.marks)
+            self.assertEqual(len(scores), len(self.marks[subject]))
+            if scores:
+                _, marks, coeffs = d.refactor_marks(self.marks, subject)
+                self.assertEqual(scores[-1], round(sum(m * c for m, c in zip(marks, coeffs)) / sum(coeffs), 2))
+
+    def test_format_report(self):
+        '''Тестируем сводный вывод отчёта'''
+        report = analyze_marks(self.info, self.table)
+        text = v.formatReport(report)
+        self.assertIn(f"Обучающийся: {self.info['Обучающийся']}", text)
+        self.assertIn(f"не хватает оценок у {report.incomplete} предметов", text)
+        self.assertEqual(text.count(" ~ "), sum(result.count > 0 for result in report.subjects))
+
+    def test_draw_graph(self):
+        '''Тестируем сохранение графика по указанному пути'''
+        from matplotlib import pyplot as plt
+        subject = next(iter(self.marks))
+        dates = d.refactor_marks(self.marks, subject)[0]
+        scores = v.extractScoreMass(subject, self.marks)
+        with tempfile.TemporaryDirectory() as tmp, patch.object(plt, "show"):
+            path = os.path.join(tmp, "graph.png")
+            v.drawGraph(subject, scores, dates, path)
+            plt.close("all")
+            with open(path, "rb") as file:
+                self.assertEqual(file.read(8), b"\x89PNG\r\n\x1a\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
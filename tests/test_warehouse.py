@@ -0,0 +1,123 @@
+import unittest
+import os
+import shutil
+from collections import Counter
+from datetime import date as Date
+
+import pytest
+
+import batch
+import data_processing as d
+import visualization as v
+from analysis import analyze_marks
+from date_index import DateIndex
+from synthetic import generate_diary
+from warehouse import Warehouse
+
+
+@pytest.fixture(scope="class")
+def exports(request, tmp_path_factory):
+    '''Выгрузки четырёх учеников, копия одной из них и битый файл - общие для всех тестов класса'''
+    cls = request.cls
+    folder = str(tmp_path_factory.mktemp("exports"))
+    for idx in range(4):
+        generate_diary(os.path.join(folder, f"Отметки_{idx}.xlsx"), subjects=6, days=40,
+                       period="II четверть", student=f"Ученик {idx}", seed=idx)
+    shutil.copyfile(os.path.join(folder, "Отметки_0.xlsx"), os.path.join(folder, "Копия.xlsx"))
+    with open(os.path.join(folder, "Битый.xlsx"), "wb") as file:
+        file.write(b"not a zip")
+    cls.files = batch.collect_files(folder)
+    cls.parsed = {f"Ученик {idx}": d.parse_workbook(os.path.join(folder, f"Отметки_{idx}.xlsx"), "xml")
+                  for idx in range(4)}
+
+
+@pytest.mark.usefixtures("exports", "tmp_folder")
+class TestWarehouse(unittest.TestCase):
+    def setUp(self):
+        self.warehouse = Warehouse(os.path.join(self.folder, "marks.sqlite"))
+        self.summary = self.warehouse.ingest(self.files, workers=1)
+
+    def tearDown(self):
+        self.warehouse.close()
+
+    def test_ingest(self):
+        '''Тестируем загрузку: копии и уже загруженные файлы пропускаются, битый файл попадает в ошибки'''
+        self.assertEqual((self.summary["added"], self.summary["skipped"], self.summary["failed"]), (4, 1, 1))
+        total = sum(len(table) for _, _, table in self.parsed.values())
+        self.assertEqual(self.warehouse.counts(), {"students": 4, "exports": 4, "marks": total})
+        again = self.warehouse.ingest(self.files, workers=1)
+        self.assertEqual((again["added"], again["skipped"]), (0, 5))
+
+    def test_means_match_analysis(self):
+        '''Тестируем средние баллы из SQL против analyze_marks и ряд среднего балла против extractScoreMass'''
+        for student, (info, _, table) in self.parsed.items():
+            rows = {row.subject: row for row in self.warehouse.subject_means(student=student)}
+            for result in analyze_marks(info, table).subjects:
+                if result.count:
+                    self.assertEqual((rows[result.name].count, rows[result.name].mean, rows[result.name].grade),
+                                     (result.count, result.mean, result.grade))
+            subject = table.subjects[0]
+            running = self.warehouse.running_means(student, subject)
+            self.assertEqual([row.mean for row in running], v.extractScoreMass(subject, table))
+            self.assertEqual([row.date for row in running], table.refactor(subject)[0])
+
+    def test_period_and_work_types(self):
+        '''Тестируем запрос за период и средние по типам работ'''
+        student, (_, _, table) = next(iter(self.parsed.items()))
+        dates = sorted(set(table.date.tolist()))
+        start, end = dates[len(dates) // 4], dates[len(dates) // 2]
+        index = DateIndex(table)
+        for row in self.warehouse.subject_means(student=student, start=start, end=end):
+            self.assertEqual((row.count, row.mean), tuple(index.query(row.subject, start, end)[:2]))
+        counts = Counter(table.work_types[x] for x in table.work_type_id.tolist())
+        by_type = {row.subject: row.count for row in self.warehouse.work_type_means(student=student)}
+        self.assertEqual(by_type, dict(counts))
+
+    def test_newer_export_replaces_period(self):
+        '''Тестируем, что остаётся более новая выгрузка ученика за период, в каком бы порядке они ни загружались'''
+        info, subjects, table = self.parsed["Ученик 1"]
+        marks = table.to_marks()
+        first = next(iter(marks))
+        older = {**marks, first: marks[first][:2]}
+        later = Date.fromordinal(int(table.date.max()) + 1).strftime("%d.%m.%Y")
+        newer = {**marks, first: marks[first] + [{**marks[first][0], "Дата": later}]}
+        self.assertEqual(self.warehouse.add_export(info, subjects, older, digest="older"), 0)
+        rows = {row.subject: row.count for row in self.warehouse.subject_means(student="Ученик 1")}
+        self.assertEqual(rows[first], len(marks[first]))
+        self.assertEqual(self.warehouse.add_export(info, subjects, newer, digest="newer"), len(table) + 1)
+        rows = {row.subject: row.count for row in self.warehouse.subject_means(student="Ученик 1")}
+        self.assertEqual(rows[first], len(marks[first]) + 1)
+        self.assertEqual(self.warehouse.counts()["exports"], 4)
+        # Вытесненные выгрузки остаются известными
+        self.assertTrue(self.warehouse.has_export("older"))
+        self.assertEqual(self.warehouse.add_export(*self.parsed["Ученик 1"], digest="again"), 0)
+
+    def test_reingest_is_idempotent(self):
+        '''Тестируем, что папка со старой и новой выгрузкой ученика при повторной загрузке не меняет базу'''
+        folder = os.path.join(self.folder, "periods")
+        os.makedirs(folder, exist_ok=True)
+        generate_diary(os.path.join(folder, "Новая.xlsx"), subjects=4, days=30, period="I четверть", student="Тёзка", seed=7)
+        generate_diary(os.path.join(folder, "Старая.xlsx"), subjects=4, days=15, period="I четверть", student="Тёзка", seed=7)
+        newer = d.parse_workbook(os.path.join(folder, "Новая.xlsx"), "xml")[2]
+        files = batch.collect_files(folder)
+        for order in (files, files[::-1]):
+            with Warehouse(":memory:") as warehouse:
+                summary = warehouse.ingest(order, workers=1)
+                self.assertEqual(summary["added"] + summary["superseded"], 2)
+                for _ in range(2):
+                    self.assertEqual(warehouse.counts()["marks"], len(newer))
+                    self.assertEqual(warehouse.ingest(order, workers=1)["skipped"], 2)
+
+    def test_running_means_namesakes(self):
+        '''Тестируем ряд среднего балла, когда у двух учеников одинаковые ФИО: значения на середине между сотыми'''
+        def marks(values):
+            return {"Алгебра": [{"Дата": f"{day + 1:02}.09.2024", "Отметка": value, "Тип работы": "Тест", "Коэффициент": 1}
+                                for day, value in enumerate(values)]}
+        first, second = marks([2, 3, 2]), marks([4, 4, 5, 4, 5, 4, 4, 5])
+        self.warehouse.add_export({"Обучающийся": "Тёзка", "Класс": "9 а"}, {}, first)
+        self.warehouse.add_export({"Обучающийся": "Тёзка", "Класс": "9 б"}, {}, second)
+        running = [row.mean for row in self.warehouse.running_means("Тёзка", "Алгебра")]
+        self.assertEqual(running, v.extractScoreMass("Алгебра", first) + v.extractScoreMass("Алгебра", second))
+
+if __name__ == "__main__":
+    unittest.main()
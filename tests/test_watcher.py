@@ -0,0 +1,137 @@
+import unittest
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from unittest.mock import patch
+
+import pytest
+
+import watcher as w
+
+
+@pytest.mark.usefixtures("tmp_folder", "diary_builders")
+class TestWatcher(unittest.TestCase):
+    def setUp(self):
+        for idx in range(2):
+            self.build_diary(os.path.join(self.folder, f"Отметки_{idx}.xlsx"))
+        with open(os.path.join(self.folder, "Битый.xlsx"), "wb") as file:
+            file.write(b"not a zip")
+        self.executor = ThreadPoolExecutor(4)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def watcher(self, **kwargs):
+        results = []
+        options = {"settle": 0.05, "poll": 0.05, "inotify": False, "executor": self.executor, "on_result": results.append}
+        return w.FolderWatcher(self.folder, **{**options, **kwargs}), results
+
+    def test_process_and_skip_unchanged(self):
+        '''Тестируем обработку всех выгрузок, файлы рядом с ними и пропуск неизменённых после перезапуска'''
+        watcher, results = self.watcher()
+        watcher.run(once=True, idle=0.05)
+        statuses = {os.path.basename(r["file"]): r["status"] for r in results}
+        self.assertEqual(statuses, {"Отметки_0.xlsx": "ok", "Отметки_1.xlsx": "ok", "Битый.xlsx": "error"})
+        with open(os.path.join(self.folder, "Отметки_0" + w.REPORT_SUFFIX), encoding="utf-8") as file:
+            report = json.load(file)
+        self.assertEqual((report["total_score"], report["diagnostics"]["quality"]), (4.22, 1.0))
+        self.assertTrue(os.path.exists(os.path.join(self.folder, "Отметки_0" + w.DASHBOARD_SUFFIX)))
+
+        # После перезапуска те же файлы (и битый) не разбираются заново, изменённый - разбирается
+        with open(os.path.join(self.folder, "Отметки_1.xlsx"), "ab") as file:
+            file.write(b"\0")
+        watcher, results = self.watcher()
+        watcher.run(once=True, idle=0.05)
+        self.assertEqual([os.path.basename(r["file"]) for r in results], ["Отметки_1.xlsx"])
+        self.assertEqual(watcher.counters["skipped"], 2)
+
+    def test_debounce(self):
+        '''Тестируем, что файл, который ещё дописывается, не берётся в работу'''
+        watcher, _ = self.watcher(settle=1)
+        name = "Отметки_0.xlsx"
+        watcher.notice(name, now=0)
+        with open(os.path.join(self.folder, name), "ab") as file:
+            file.write(b"\0")
+        watcher._settle(now=5)
+        self.assertIn(name, watcher._pending)
+        watcher._settle(now=10)
+        self.assertEqual((list(watcher._pending), list(watcher._ready)), ([], [name]))
+        watcher.close()
+
+    def test_bounded_pool(self):
+        '''Тестируем, что пулу одновременно отдаётся не больше `workers` файлов'''
+        for idx in range(2, 8):
+            self.build_diary(os.path.join(self.folder, f"Отметки_{idx}.xlsx"))
+        lock, state = threading.Lock(), {"now": 0, "max": 0}
+
+        def job(path, engine, period):
+            with lock:
+                state["now"] += 1
+                state["max"] = max(state["max"], state["now"])
+            time.sleep(0.02)
+            with lock:
+                state["now"] -= 1
+            return {"file": path, "status": "ok"}
+
+        watcher, results = self.watcher(workers=2, job=job)
+        watcher.run(once=True, idle=0.05)
+        self.assertEqual((len(results), state["max"]), (9, 2))
+
+    def test_broken_injected_pool(self):
+        '''Тестируем, что после поломки переданного пула наблюдатель продолжает работу со своим пулом'''
+        class BrokenExecutor:
+            def submit(self, *args):
+                future = Future()
+                future.set_exception(BrokenProcessPool("пул сломан"))
+                return future
+
+        def job(path, engine, period):
+            return {"file": path, "status": "ok"}
+
+        with patch.object(w, "ProcessPoolExecutor", lambda max_workers: ThreadPoolExecutor(max_workers)):
+            watcher, results = self.watcher(workers=2, job=job, executor=BrokenExecutor())
+            watcher.run(once=True, idle=0.05)
+        errors = [r for r in results if r["status"] == "error"]
+        self.assertEqual((len(results), len(errors)), (3, 2))
+        self.assertTrue(all("BrokenProcessPool" in r["error"] for r in errors))
+        # Файлы, не обработанные из-за поломки пула, не запоминаются и будут разобраны снова
+        with open(watcher.state_path, encoding="utf-8") as file:
+            self.assertEqual(len(json.load(file)["files"]), 1)
+
+    def test_state_forgets_deleted_files(self):
+        '''Тестируем, что хэши удалённых выгрузок удаляются из состояния'''
+        watcher, _ = self.watcher()
+        watcher.run(once=True, idle=0.05)
+        os.remove(os.path.join(self.folder, "Битый.xlsx"))
+        watcher, _ = self.watcher()
+        watcher.run(once=True, idle=0.05)
+        with open(watcher.state_path, encoding="utf-8") as file:
+            self.assertEqual(sorted(json.load(file)["files"]), ["Отметки_0.xlsx", "Отметки_1.xlsx"])
+
+        # Файл удалён, пока ждал окончания записи
+        watcher, _ = self.watcher()
+        watcher.notice("Отметки_0.xlsx", now=0)
+        os.remove(os.path.join(self.folder, "Отметки_0.xlsx"))
+        watcher._settle(now=10)
+        watcher.close()
+        with open(watcher.state_path, encoding="utf-8") as file:
+            self.assertEqual(list(json.load(file)["files"]), ["Отметки_1.xlsx"])
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "inotify есть только в Linux")
+    def test_inotify(self):
+        '''Тестируем события inotify о новом файле'''
+        source = w.InotifySource(self.folder)
+        try:
+            self.assertEqual(source.wait(0), [])
+            self.build_diary(os.path.join(self.folder, "Новая.xlsx"))
+            self.assertIn("Новая.xlsx", source.wait(1))
+        finally:
+            source.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import io
+from unittest.mock import patch
+import pytest
+
+import data_processing as d
+import xlsx_reader
+
+
+@pytest.mark.usefixtures("diary")
+class TestStreamedReader(unittest.TestCase):
+    def test_parity_with_openpyxl(self):
+        '''Тестируем, что XML-ридер даёт те же данные, что и openpyxl'''
+        results = []
+        for engine in ("openpyxl", "xml"):
+            sheet = d.read_excel(self.path, engine).active
+            subjects = d.extract_subjects(sheet)
+            results.append((d.extract_info(sheet), subjects, d.extract_marks(sheet, subjects)))
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(len(results[1][2]["Алгебра"]), 3)
+
+    def test_cell_access(self):
+        '''Тестируем доступ к ячейкам и комментариям'''
+        sheet = xlsx_reader.load_workbook(self.path).active
+        self.assertEqual(sheet["A4"].value, "Гарри Поттер")
+        self.assertEqual(sheet["C13"].comment.text, "5 - Лабораторная работа - 07.11.2024")
+        self.assertIsNone(sheet["Z99"].value)
+        self.assertIsNone(sheet["A11"].comment)
+
+    def test_load_from_bytes(self):
+        '''Тестируем чтение книги из содержимого файла'''
+        with open(self.path, "rb") as file:
+            workbook = xlsx_reader.load_workbook(file.read())
+        self.assertEqual(workbook.sheetnames, ["Sheet"])
+        self.assertEqual(workbook.active["A10"].value, "Предметы")
+
+    def test_cells_without_reference(self):
+        '''Тестируем ячейки и строки без атрибута r: столбцы считаются заново в каждой строке'''
+        sheet = (b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                 b'<row r="1"><c t="inlineStr"><is><t>a</t></is></c><c><v>2</v></c></row>'
+                 b'<row r="3"><c><v>3</v></c><c r="C3"><v>4</v></c><c><v>5</v></c></row>'
+                 b'<row><c><v>6</v></c></row>'
+                 b'</sheetData></worksheet>')
+        self.assertEqual(list(xlsx_reader.iter_cells(io.BytesIO(sheet), [])),
+                         [(1, 1, "a"), (1, 2, 2), (3, 1, 3), (3, 3, 4), (3, 4, 5), (4, 1, 6)])
+
+    def test_close(self):
+        '''Тестируем, что книга закрывает архив в with и что parse_workbook её закрывает'''
+        with xlsx_reader.load_workbook(self.path) as workbook:
+            sheet = workbook.active
+        self.assertIsNone(workbook._zip.fp)
+        self.assertEqual(sheet["A4"].value, "Гарри Поттер")
+        close = xlsx_reader.StreamedWorkbook.close
+        with patch.object(xlsx_reader.StreamedWorkbook, "close", autospec=True, side_effect=close) as closed:
+            d.parse_workbook(self.path, "xml")
+            d.parse_workbook(self.path, "xml", diagnostics=d.Diagnostics())
+        self.assertEqual(closed.call_count, 2)
+
+    def test_split_reference(self):
+        self.assertEqual(xlsx_reader.split_reference("B11"), (11, 2))
+        self.assertEqual(xlsx_reader.split_reference("AB3"), (3, 28))
+
+
+if __name__ == "__main__":
+    unittest.main()